@@ -0,0 +1,42 @@
+"""activity daily stats
+
+Revision ID: 20261019_0002
+Revises: 20260225_0001
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0002"
+down_revision: Union[str, Sequence[str], None] = "20260225_0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app also runs create_all at startup, so the table may already exist.
+    if sa.inspect(op.get_bind()).has_table("activity_daily_stats"):
+        return
+    op.create_table(
+        "activity_daily_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("activity_type", sa.String(length=120), nullable=False),
+        sa.Column("staff_id", sa.Integer(), nullable=True),
+        sa.Column("created", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("status_pending", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("status_done", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("done", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_activity_daily_stats_day_type_staff", "activity_daily_stats", ["day", "activity_type", "staff_id"])
+    op.create_index("ix_activity_daily_stats_staff_id", "activity_daily_stats", ["staff_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_activity_daily_stats_staff_id", table_name="activity_daily_stats")
+    op.drop_index("ix_activity_daily_stats_day_type_staff", table_name="activity_daily_stats")
+    op.drop_table("activity_daily_stats")
@@ -0,0 +1,32 @@
+"""index activities.done_at for completion range filters
+
+Revision ID: 20261019_0004
+Revises: 20261019_0003
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0004"
+down_revision: Union[str, Sequence[str], None] = "20261019_0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "ix_activities_done_at"
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds the table with its indexes.
+    if not inspector.has_table("activities"):
+        return
+    if INDEX not in {ix["name"] for ix in inspector.get_indexes("activities")}:
+        op.create_index(INDEX, "activities", ["done_at"])
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="activities")
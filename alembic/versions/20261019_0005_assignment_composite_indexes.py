@@ -0,0 +1,38 @@
+"""composite indexes on activity_assignments
+
+Revision ID: 20261019_0005
+Revises: 20261019_0004
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0005"
+down_revision: Union[str, Sequence[str], None] = "20261019_0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_activity_assignments_activity_current_staff": ["activity_id", "is_current", "staff_id"],
+    "ix_activity_assignments_staff_current_activity": ["staff_id", "is_current", "activity_id"],
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds the table with its indexes.
+    if not inspector.has_table("activity_assignments"):
+        return
+    existing = {ix["name"] for ix in inspector.get_indexes("activity_assignments")}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "activity_assignments", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="activity_assignments")
@@ -0,0 +1,46 @@
+"""store broadcast notifications once with per-user read markers
+
+Revision ID: 20261019_0007
+Revises: 20261019_0006
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0007"
+down_revision: Union[str, Sequence[str], None] = "20261019_0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds both tables.
+    if not inspector.has_table("notifications"):
+        return
+    user_id = next(x for x in inspector.get_columns("notifications") if x["name"] == "user_id")
+    if not user_id["nullable"]:
+        with op.batch_alter_table("notifications") as batch:
+            batch.alter_column("user_id", existing_type=sa.Integer(), nullable=True)
+    if not inspector.has_table("notification_reads"):
+        op.create_table(
+            "notification_reads",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("notification_id", sa.Integer(), sa.ForeignKey("notifications.id"), nullable=False),
+            sa.Column("read_at", sa.DateTime(), nullable=False),
+            sa.UniqueConstraint("user_id", "notification_id", name="uq_notification_read_user_notification"),
+        )
+        op.create_index("ix_notification_reads_id", "notification_reads", ["id"])
+        op.create_index("ix_notification_reads_notification_id", "notification_reads", ["notification_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("notification_reads")
+    op.execute("DELETE FROM notifications WHERE user_id IS NULL")
+    with op.batch_alter_table("notifications") as batch:
+        batch.alter_column("user_id", existing_type=sa.Integer(), nullable=False)
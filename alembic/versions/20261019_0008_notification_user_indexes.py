@@ -0,0 +1,38 @@
+"""composite indexes for per-user notification reads
+
+Revision ID: 20261019_0008
+Revises: 20261019_0007
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0008"
+down_revision: Union[str, Sequence[str], None] = "20261019_0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("notifications", "ix_notifications_user_read", ["user_id", "read_at"]),
+    ("notifications", "ix_notifications_user_created", ["user_id", "created_at"]),
+    ("notification_reads", "ix_notification_reads_user_read", ["user_id", "read_at"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in INDEXES:
+        # The baseline revision is empty; on a fresh database create_all builds the tables with their indexes.
+        if not inspector.has_table(table):
+            continue
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+"""per-user broadcast read watermark for mark-all-read
+
+Revision ID: 20261019_0009
+Revises: 20261019_0008
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0009"
+down_revision: Union[str, Sequence[str], None] = "20261019_0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds the table with these columns.
+    if not inspector.has_table("users"):
+        return
+    columns = {x["name"] for x in inspector.get_columns("users")}
+    with op.batch_alter_table("users") as batch:
+        if "notifications_read_through" not in columns:
+            batch.add_column(sa.Column("notifications_read_through", sa.Integer(), nullable=False, server_default="0"))
+        if "notifications_read_at" not in columns:
+            batch.add_column(sa.Column("notifications_read_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("notifications_read_at")
+        batch.drop_column("notifications_read_through")
@@ -0,0 +1,38 @@
+"""unique upsert key for activity daily stats
+
+Revision ID: 20261019_0010
+Revises: 20261019_0009
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0010"
+down_revision: Union[str, Sequence[str], None] = "20261019_0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds the table with this index.
+    if not inspector.has_table("activity_daily_stats"):
+        return
+    if "uq_activity_daily_stats_key" in {ix["name"] for ix in inspector.get_indexes("activity_daily_stats")}:
+        return
+    # Concurrent day rebuilds could leave duplicate keys behind; the app rebuilds an empty table at startup.
+    op.execute("DELETE FROM activity_daily_stats")
+    op.create_index(
+        "uq_activity_daily_stats_key",
+        "activity_daily_stats",
+        ["day", "activity_type", sa.text("coalesce(staff_id, 0)")],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_activity_daily_stats_key", table_name="activity_daily_stats")
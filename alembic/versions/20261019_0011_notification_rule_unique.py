@@ -0,0 +1,47 @@
+"""one rule notification per user, activity, rule and day
+
+Revision ID: 20261019_0011
+Revises: 20261019_0010
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "20261019_0011"
+down_revision: Union[str, Sequence[str], None] = "20261019_0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "uq_notifications_rule_daily"
+RULE_TYPES_SQL = "type IN ('rule_overdue', 'rule_unassigned', 'rule_high_priority')"
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The baseline revision is empty; on a fresh database create_all builds the table with this index.
+    if not inspector.has_table("notifications"):
+        return
+    if INDEX in {ix["name"] for ix in inspector.get_indexes("notifications")}:
+        return
+    # Schedulers in several workers could already have inserted the same rule twice; keep the first of each.
+    op.execute(
+        f"DELETE FROM notifications WHERE {RULE_TYPES_SQL} AND id NOT IN ("
+        f"SELECT MIN(id) FROM notifications WHERE {RULE_TYPES_SQL} "
+        "GROUP BY user_id, activity_id, type, date(created_at))"
+    )
+    op.create_index(
+        INDEX,
+        "notifications",
+        ["user_id", "activity_id", "type", sa.text("date(created_at)")],
+        unique=True,
+        sqlite_where=sa.text(RULE_TYPES_SQL),
+        postgresql_where=sa.text(RULE_TYPES_SQL),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="notifications")
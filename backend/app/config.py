@@ -42,18 +42,49 @@ class Settings(BaseModel):
     refresh_token_days: int = _env_int("REFRESH_TOKEN_DAYS", 7)
 
     database_url: str = _env("DATABASE_URL", "sqlite:///./tt_altyn_aay.db") or "sqlite:///./tt_altyn_aay.db"
+    read_database_url: str | None = _env("READ_DATABASE_URL", None) or None
+    db_read_pool_size: int = _env_int("DB_READ_POOL_SIZE", 10)
+    db_pool_size: int = _env_int("DB_POOL_SIZE", 5)
+    db_max_overflow: int = _env_int("DB_MAX_OVERFLOW", 10)
+    db_pool_recycle: int = _env_int("DB_POOL_RECYCLE", 1800)
+    db_pool_pre_ping: bool = _env_bool("DB_POOL_PRE_PING", True)
+    sqlite_journal_mode: str = (_env("SQLITE_JOURNAL_MODE", "WAL") or "WAL").upper()
+    sqlite_synchronous: str = (_env("SQLITE_SYNCHRONOUS", "NORMAL") or "NORMAL").upper()
+    sqlite_busy_timeout_ms: int = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    # Negative values are KiB (SQLite convention): -20000 is roughly a 20 MB page cache per connection.
+    sqlite_cache_size: int = _env_int("SQLITE_CACHE_SIZE", -20000)
+    sqlite_mmap_size: int = _env_int("SQLITE_MMAP_SIZE", 268435456)
+    sqlite_temp_store: str = (_env("SQLITE_TEMP_STORE", "MEMORY") or "MEMORY").upper()
+    sqlite_foreign_keys: bool = _env_bool("SQLITE_FOREIGN_KEYS", False)
     excel_file: Path = Path(_env("EXCEL_FILE", "activities.xlsx") or "activities.xlsx")
 
     default_admin_username: str = _env("DEFAULT_ADMIN_USERNAME", "admin") or "admin"
     default_admin_password: str = _env("DEFAULT_ADMIN_PASSWORD", "Admin@12345") or "Admin@12345"
     disable_default_seeding: bool = _env_bool("DISABLE_DEFAULT_SEEDING", False)
 
+    blocking_pool_size: int = _env_int("BLOCKING_POOL_SIZE", 8)
+
     log_level: str = _env("LOG_LEVEL", "INFO") or "INFO"
     error_tracking_webhook: str | None = _env("ERROR_TRACKING_WEBHOOK", None)
+    sql_repeat_warning_threshold: int = _env_int("SQL_REPEAT_WARNING_THRESHOLD", 10)
+    slow_query_threshold_ms: int = _env_int("SLOW_QUERY_THRESHOLD_MS", 200)
+    slow_query_buffer_size: int = _env_int("SLOW_QUERY_BUFFER_SIZE", 100)
+    slow_query_explain_interval_seconds: int = _env_int("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300)
+    profiling_enabled: bool = _env_bool("PROFILING_ENABLED", True)
+    profile_sample_interval_ms: int = _env_int("PROFILE_SAMPLE_INTERVAL_MS", 5)
+    profile_store_size: int = _env_int("PROFILE_STORE_SIZE", 20)
+    preset_cache_size: int = _env_int("PRESET_CACHE_SIZE", 128)
+    metrics_access: str = (_env("METRICS_ACCESS", "admin") or "admin").strip().lower()
 
     notification_rules_interval_seconds: int = _env_int("NOTIFICATION_RULES_INTERVAL_SECONDS", 600)
     notification_high_priority_threshold: int = _env_int("NOTIFICATION_HIGH_PRIORITY_THRESHOLD", 5)
     notification_overdue_days: int = _env_int("NOTIFICATION_OVERDUE_DAYS", 0)
+    ws_send_queue_size: int = _env_int("WS_SEND_QUEUE_SIZE", 100)
+    ws_send_timeout_seconds: int = _env_int("WS_SEND_TIMEOUT_SECONDS", 10)
+    ws_replay_buffer_size: int = _env_int("WS_REPLAY_BUFFER_SIZE", 500)
+    notification_broker_url: str = _env("NOTIFICATION_BROKER_URL", "memory://") or "memory://"
+    notification_broker_channel: str = _env("NOTIFICATION_BROKER_CHANNEL", "tt_altyn_aay:notifications") or "tt_altyn_aay:notifications"
+    notification_broker_poll_ms: int = _env_int("NOTIFICATION_BROKER_POLL_MS", 200)
 
     backup_dir: Path = Path(_env("BACKUP_DIR", "backups") or "backups")
     backup_interval_seconds: int = _env_int("BACKUP_INTERVAL_SECONDS", 86400)
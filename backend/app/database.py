@@ -1,13 +1,109 @@
-from sqlalchemy import create_engine
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False},
-)
+
+def sqlite_pragmas() -> dict[str, Any]:
+    # busy_timeout goes first so switching journal_mode waits for other connections instead of failing.
+    return {
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "temp_store": settings.sqlite_temp_store,
+        "foreign_keys": "ON" if settings.sqlite_foreign_keys else "OFF",
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict[str, Any] | None = None) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas if pragmas is not None else sqlite_pragmas()).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def sqlite_pragma_report(bind=None) -> dict[str, Any]:
+    bind = bind or engine
+    if bind.dialect.name != "sqlite":
+        return {}
+    report: dict[str, Any] = {}
+    with bind.connect() as conn:
+        for name in sqlite_pragmas():
+            report[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return report
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str, pool_size: int | None = None) -> dict[str, Any]:
+    parsed = make_url(url)
+    pool_size = settings.db_pool_size if pool_size is None else pool_size
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+        return {
+            "connect_args": {"check_same_thread": False},
+            "pool_size": pool_size,
+            "max_overflow": settings.db_max_overflow,
+        }
+    return {
+        "pool_size": pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def make_engine(url: str) -> Engine:
+    new_engine = create_engine(url, **engine_options(url))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", _on_sqlite_connect)
+    return new_engine
+
+
+def make_read_engine(url: str, primary: Engine) -> Engine:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # A second in-memory engine would be a different, empty database.
+        return primary
+    new_engine = create_engine(url, **engine_options(url, pool_size=settings.db_read_pool_size))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", _on_sqlite_read_connect)
+    elif new_engine.dialect.name == "postgresql":
+        event.listen(new_engine, "connect", _on_postgresql_read_connect)
+    return new_engine
+
+
+def _on_sqlite_connect(dbapi_connection, connection_record) -> None:
+    apply_sqlite_pragmas(dbapi_connection)
+
+
+def _on_sqlite_read_connect(dbapi_connection, connection_record) -> None:
+    apply_sqlite_pragmas(dbapi_connection, {**sqlite_pragmas(), "query_only": "ON"})
+
+
+def _on_postgresql_read_connect(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+    finally:
+        cursor.close()
+
+
+engine = make_engine(settings.database_url)
+read_engine = make_read_engine(settings.read_database_url or settings.database_url, engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 
@@ -17,3 +113,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -3,10 +3,11 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
 from .auth import decode_token
-from .database import get_db
+from .database import get_read_db
 from .models import User
 
 bearer = HTTPBearer(auto_error=True)
+optional_bearer = HTTPBearer(auto_error=False)
 
 ROLE_ADMIN = "admin"
 ROLE_MANAGER = "manager"
@@ -26,7 +27,7 @@ def normalize_role(role: str | None) -> str:
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> User:
     token = credentials.credentials
     try:
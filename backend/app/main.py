@@ -11,32 +11,47 @@ from fastapi.responses import JSONResponse
 
 from .api_utils import ok
 from .config import settings
-from .database import Base, SessionLocal, engine
+from .database import Base, SessionLocal, engine, read_engine, sqlite_pragma_report
 from .models import Activity
-from .routers import activities, audit, auth, dashboard, exports, master_data, notifications, permissions, staff, suggestions, system, users
+from .routers import activities, audit, auth, dashboard, exports, master_data, metrics, notifications, permissions, staff, suggestions, system, users
+from .services import activity_change_service, activity_stats_service, metrics_service, profiling_service, slow_query_service
 from .services.address_service import backfill_activity_addresses
-from .services.backup_service import apply_retention, create_backup, run_backup_scheduler
-from .services.excel_service import ensure_excel_exists, sync_activity
+from .services.backup_service import apply_retention, backups_supported, create_backup, run_backup_scheduler
+from .services.excel_service import ensure_excel_exists, sync_activities
 from .services.monitoring_service import log_event, report_exception, setup_logging
+from .services.notification_broker_service import create_broker
 from .services.notification_rules_service import run_rule_scheduler
+from .services.notification_service import notification_hub
+from .services.offload_service import run_blocking
+from .services.query_stats_service import instrument_engine, track_queries, warn_repeated_statements
 from .services.seed_service import seed_defaults
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    log_event("sqlite_pragmas", **sqlite_pragma_report())
     db = SessionLocal()
     try:
         seed_defaults(db)
         backfill_activity_addresses(db)
         ensure_excel_exists()
-        create_backup()
-        apply_retention()
-        ids = [x[0] for x in db.query(Activity.id).all()]
-        for act_id in ids:
-            sync_activity(db, act_id)
+        if backups_supported():
+            create_backup()
+            apply_retention()
+        sync_activities(db, [x[0] for x in db.query(Activity.id).all()])
+        if activity_stats_service.stats_table_empty(db):
+            rows = activity_stats_service.rebuild_daily_stats(db)
+            log_event("activity_daily_stats_rebuilt", rows=rows)
     finally:
         db.close()
 
+    await notification_hub.start(
+        create_broker(
+            settings.notification_broker_url,
+            settings.notification_broker_channel,
+            settings.notification_broker_poll_ms / 1000,
+        )
+    )
     rule_scheduler_task = asyncio.create_task(run_rule_scheduler(SessionLocal))
     backup_scheduler_task = asyncio.create_task(run_backup_scheduler())
 
@@ -50,11 +65,18 @@ async def lifespan(app: FastAPI):
                 await task
             except asyncio.CancelledError:
                 pass
+        await notification_hub.stop()
 
 
 app = FastAPI(title="TT Altyn Aay App", lifespan=lifespan)
 
 setup_logging()
+activity_stats_service.install(SessionLocal)
+activity_change_service.install(SessionLocal)
+instrument_engine(engine)
+instrument_engine(read_engine)
+slow_query_service.instrument_engine(engine)
+slow_query_service.instrument_engine(read_engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -70,30 +92,64 @@ app.add_middleware(TrustedHostMiddleware, allowed_hosts=settings.trusted_hosts)
 async def request_logging_middleware(request: Request, call_next):
     started = time.perf_counter()
     request_id = request.headers.get("x-request-id") or uuid4().hex
-    try:
-        response = await call_next(request)
-        took_ms = round((time.perf_counter() - started) * 1000, 2)
-        response.headers["x-request-id"] = request_id
-        log_event(
-            "http_request",
-            request_id=request_id,
-            method=request.method,
-            path=request.url.path,
-            status=response.status_code,
-            duration_ms=took_ms,
-        )
-        return response
-    except Exception as exc:
-        took_ms = round((time.perf_counter() - started) * 1000, 2)
-        log_event(
-            "http_request_failed",
-            request_id=request_id,
-            method=request.method,
-            path=request.url.path,
-            duration_ms=took_ms,
-            error=str(exc),
-        )
-        raise
+    status_code = 500
+    profiler = None
+    if (
+        settings.profiling_enabled
+        and request.headers.get("x-profile") == "1"
+        and await run_blocking(profiling_service.is_admin_token, request.headers.get("authorization"))
+    ):
+        profiler = profiling_service.start_profiler()
+    metrics_service.http_requests_in_flight.inc()
+    with track_queries() as stats:
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            took_ms = round((time.perf_counter() - started) * 1000, 2)
+            response.headers["x-request-id"] = request_id
+            if profiler is not None:
+                response.headers["x-profile-id"] = profiling_service.finish_profiler(
+                    profiler,
+                    getattr(request.scope.get("route"), "endpoint", None),
+                    method=request.method,
+                    path=request.url.path,
+                    status=status_code,
+                    duration_ms=took_ms,
+                )
+                profiler = None
+            log_event(
+                "http_request",
+                request_id=request_id,
+                method=request.method,
+                path=request.url.path,
+                status=response.status_code,
+                duration_ms=took_ms,
+                db_queries=stats.count,
+                db_ms=round(stats.total_ms, 2),
+            )
+            return response
+        except Exception as exc:
+            took_ms = round((time.perf_counter() - started) * 1000, 2)
+            log_event(
+                "http_request_failed",
+                request_id=request_id,
+                method=request.method,
+                path=request.url.path,
+                duration_ms=took_ms,
+                db_queries=stats.count,
+                db_ms=round(stats.total_ms, 2),
+                error=str(exc),
+            )
+            raise
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            metrics_service.http_requests_in_flight.dec()
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            metrics_service.http_request_duration.observe(time.perf_counter() - started, method=request.method, route=route_path)
+            metrics_service.http_requests_total.inc(method=request.method, route=route_path, status=str(status_code))
+            warn_repeated_statements(stats, request_id=request_id, method=request.method, path=request.url.path)
 
 
 @app.exception_handler(HTTPException)
@@ -140,6 +196,7 @@ app.include_router(audit.router)
 app.include_router(system.router)
 app.include_router(users.router)
 app.include_router(permissions.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def home():
@@ -149,3 +206,4 @@ def home():
 @app.get("/api/health")
 def health():
     return ok({"status": "ok"})
+
@@ -0,0 +1,30 @@
+"""Maintenance commands: ``python -m backend.app.manage <command>``."""
+
+import argparse
+
+from .database import Base, SessionLocal, engine
+from .services.activity_stats_service import rebuild_daily_stats
+
+
+def rebuild_stats() -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rows = rebuild_daily_stats(db)
+    finally:
+        db.close()
+    print(f"activity_daily_stats rebuilt: {rows} rows")
+
+
+COMMANDS = {"rebuild-stats": rebuild_stats}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.app.manage")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
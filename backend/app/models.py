@@ -6,10 +6,12 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -24,6 +26,9 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     role: Mapped[str] = mapped_column(String(20), nullable=False, default="user")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # "Mark all read" watermark: broadcast notifications with ids up to this count as read at the stored time.
+    notifications_read_through: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    notifications_read_at: Mapped[datetime | None] = mapped_column(DateTime)
 
 
 class Staff(Base):
@@ -40,11 +45,11 @@ class Activity(Base):
     __tablename__ = "activities"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     done_by_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
-    done_at: Mapped[datetime | None] = mapped_column(DateTime)
+    done_at: Mapped[datetime | None] = mapped_column(DateTime, index=True)
 
     date: Mapped[dt_date] = mapped_column(Date, nullable=False, index=True)
     activity_type: Mapped[str] = mapped_column(String(120), nullable=False, index=True)
@@ -62,6 +67,10 @@ class Activity(Base):
 
 class ActivityAssignment(Base):
     __tablename__ = "activity_assignments"
+    __table_args__ = (
+        Index("ix_activity_assignments_activity_current_staff", "activity_id", "is_current", "staff_id"),
+        Index("ix_activity_assignments_staff_current_activity", "staff_id", "is_current", "activity_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     activity_id: Mapped[int] = mapped_column(ForeignKey("activities.id"), nullable=False)
@@ -74,11 +83,51 @@ class ActivityAssignment(Base):
     staff = relationship("Staff")
 
 
+class ActivityDailyStats(Base):
+    """Per-day activity counters; rows with staff_id NULL count activities, the rest count current assignments."""
+
+    __tablename__ = "activity_daily_stats"
+    __table_args__ = (
+        Index("ix_activity_daily_stats_day_type_staff", "day", "activity_type", "staff_id"),
+        # Upsert target; staff_id NULL would never conflict, so the key folds it to 0.
+        Index("uq_activity_daily_stats_key", "day", "activity_type", text("coalesce(staff_id, 0)"), unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[dt_date] = mapped_column(Date, nullable=False)
+    activity_type: Mapped[str] = mapped_column(String(120), nullable=False)
+    staff_id: Mapped[int | None] = mapped_column(Integer, index=True)
+    created: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    status_pending: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    status_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+RULE_TYPES_SQL = "type IN ('rule_overdue', 'rule_unassigned', 'rule_high_priority')"
+
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_activity_type_created", "activity_id", "type", "created_at"),
+        Index("ix_notifications_user_read", "user_id", "read_at"),
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        # At most one rule notification per user, activity, rule and day, however many workers run the scheduler.
+        Index(
+            "uq_notifications_rule_daily",
+            "user_id",
+            "activity_id",
+            "type",
+            text("date(created_at)"),
+            unique=True,
+            sqlite_where=text(RULE_TYPES_SQL),
+            postgresql_where=text(RULE_TYPES_SQL),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    # NULL user_id marks a broadcast row; per-user read state for those lives in NotificationRead.
+    user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
     activity_id: Mapped[int | None] = mapped_column(ForeignKey("activities.id"))
     type: Mapped[str] = mapped_column(String(50), nullable=False)
     text: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -86,6 +135,19 @@ class Notification(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class NotificationRead(Base):
+    __tablename__ = "notification_reads"
+    __table_args__ = (
+        UniqueConstraint("user_id", "notification_id", name="uq_notification_read_user_notification"),
+        Index("ix_notification_reads_user_read", "user_id", "read_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    notification_id: Mapped[int] = mapped_column(ForeignKey("notifications.id"), nullable=False, index=True)
+    read_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class MasterData(Base):
     __tablename__ = "master_data"
     __table_args__ = (UniqueConstraint("category", "value", name="uq_master_category_value"),)
@@ -1,73 +1,35 @@
 ﻿import json
-from datetime import date
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import and_, case, desc, func, or_
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session, joinedload
 
 from ..api_utils import fail, loads_json, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import get_current_user, normalize_role, require_editor, require_manager_or_admin
-from ..models import Activity, ActivityAssignment, AuditLog, Notification, Staff, SystemSetting, User
-from ..schemas import ActivityCreate, ActivityUpdate
+from ..models import Activity, ActivityAssignment, AuditLog, SystemSetting, User
+from ..schemas import ActivityBatchCreate, ActivityCreate, ActivityReorderRequest, ActivityUpdate
+from ..services.activity_change_service import mark_activities_changed
+from ..services.activity_query_service import (
+    ACTIVITY_LIST_ORDER,
+    ActivityFilters,
+    activity_to_dict,
+    apply_activity_filters,
+    attach_usernames,
+)
+from ..services.activity_stats_service import mark_activities
 from ..services.address_service import normalize_address, normalize_location
-from ..services.audit_service import add_audit_log
+from ..services.assignment_service import replace_assignments, set_assignments, valid_staff_ids
+from ..services.audit_service import add_audit_log, add_audit_logs
 from ..services.email_service import send_new_activity_email
-from ..services.excel_service import sync_activity
-from ..services.notification_service import notification_hub
-from ..services.search_service import normalize_sql_expr, normalize_text
+from ..services.excel_service import sync_activities, sync_activity
+from ..services.notification_service import PendingPush, deliver, store_for_all_users
+from ..services.offload_service import run_blocking
 
 router = APIRouter(prefix="/api/activities", tags=["activities"])
 
 
-def _activity_to_dict(a: Activity) -> dict:
-    current_assignments = [x for x in a.assignments if x.is_current]
-    return {
-        "id": a.id,
-        "created_at": a.created_at.isoformat(),
-        "updated_at": a.updated_at.isoformat() if a.updated_at else None,
-        "created_by_user_id": a.created_by_user_id,
-        "created_by_username": None,
-        "done_by_user_id": a.done_by_user_id,
-        "done_by_username": None,
-        "done_at": a.done_at.isoformat() if a.done_at else None,
-        "date": a.date.isoformat(),
-        "activity_type": a.activity_type,
-        "customer_name": a.customer_name,
-        "location": (a.address or a.location or "-"),
-        "address": (a.address or a.location or None),
-        "status": a.status,
-        "priority": a.priority,
-        "report_text": a.report_text,
-        "device_info": a.device_info,
-        "extra_fields": loads_json(a.extra_fields_json),
-        "assigned_staff": [
-            {"id": item.staff.id, "name": item.staff.name, "phone": item.staff.phone, "active": item.staff.active}
-            for item in current_assignments
-            if item.staff
-        ],
-    }
-
-
-def _attach_usernames(items: list[dict], db: Session) -> list[dict]:
-    user_ids: set[int] = set()
-    for item in items:
-        if item.get("created_by_user_id"):
-            user_ids.add(int(item["created_by_user_id"]))
-        if item.get("done_by_user_id"):
-            user_ids.add(int(item["done_by_user_id"]))
-
-    if user_ids:
-        user_map = {u.id: u.username for u in db.query(User).filter(User.id.in_(list(user_ids))).all()}
-        for item in items:
-            created_id = item.get("created_by_user_id")
-            done_id = item.get("done_by_user_id")
-            item["created_by_username"] = user_map.get(created_id)
-            item["done_by_username"] = user_map.get(done_id)
-    return items
-
-
 def _activity_snapshot(a: Activity) -> dict:
     current_assignments = [x for x in a.assignments if x.is_current]
     return {
@@ -138,36 +100,10 @@ def _changed_fields(before: dict, after: dict) -> list[str]:
     return [k for k in keys if before.get(k) != after.get(k)]
 
 
-def _set_assignments(db: Session, activity: Activity, staff_ids: list[int], by_user_id: int) -> None:
-    db.query(ActivityAssignment).filter(
-        ActivityAssignment.activity_id == activity.id,
-        ActivityAssignment.is_current.is_(True),
-    ).update({"is_current": False})
-    for sid in staff_ids:
-        staff = db.query(Staff).filter(Staff.id == sid, Staff.active.is_(True)).first()
-        if not staff:
-            continue
-        db.add(
-            ActivityAssignment(
-                activity_id=activity.id,
-                staff_id=sid,
-                assigned_by_user_id=by_user_id,
-                is_current=True,
-            )
-        )
-
-
-async def _notify_all_users(db: Session, text: str, activity_id: int | None, event_type: str) -> None:
-    users = db.query(User).all()
-    for u in users:
-        note = Notification(user_id=u.id, activity_id=activity_id, type=event_type, text=text)
-        db.add(note)
-    db.commit()
-    for u in users:
-        await notification_hub.push(
-            u.id,
-            {"type": event_type, "text": text, "activity_id": activity_id, "created_at": datetime.utcnow().isoformat()},
-        )
+async def _run_and_notify(func, *args):
+    data, note = await run_blocking(func, *args)
+    await deliver(note)
+    return ok(data)
 
 
 def _send_create_email(db: Session, text: str) -> None:
@@ -179,10 +115,9 @@ def _send_create_email(db: Session, text: str) -> None:
     )
 
 
-@router.post("")
-async def create_activity(payload: ActivityCreate, db: Session = Depends(get_db), user: User = Depends(require_editor)):
+def _new_activity(payload: ActivityCreate, user: User) -> Activity:
     normalized_address = normalize_address(payload.address, payload.location)
-    activity = Activity(
+    return Activity(
         created_by_user_id=user.id,
         date=payload.date,
         activity_type=payload.activity_type.strip(),
@@ -195,9 +130,18 @@ async def create_activity(payload: ActivityCreate, db: Session = Depends(get_db)
         device_info=payload.device_info,
         extra_fields_json=json.dumps(payload.extra_fields, ensure_ascii=False),
     )
+
+
+@router.post("")
+async def create_activity(payload: ActivityCreate, db: Session = Depends(get_db), user: User = Depends(require_editor)):
+    return await _run_and_notify(_create_activity, payload, db, user)
+
+
+def _create_activity(payload: ActivityCreate, db: Session, user: User) -> tuple[dict, PendingPush | None]:
+    activity = _new_activity(payload, user)
     db.add(activity)
     db.flush()
-    _set_assignments(db, activity, payload.assigned_staff_ids, user.id)
+    set_assignments(db, activity, payload.assigned_staff_ids, user.id)
 
     after = _activity_snapshot(activity)
     add_audit_log(db, user=user, action="create", entity="activity", entity_id=str(activity.id), details={"after": after, "changed_fields": list(after.keys())})
@@ -207,7 +151,7 @@ async def create_activity(payload: ActivityCreate, db: Session = Depends(get_db)
     sync_activity(db, activity.id)
 
     message = f"{user.username} created activity #{activity.id} ({activity.customer_name})"
-    await _notify_all_users(db, message, activity.id, "activity_created")
+    note = store_for_all_users(db, message, activity.id, "activity_created")
     _send_create_email(db, message)
 
     fresh = (
@@ -216,14 +160,60 @@ async def create_activity(payload: ActivityCreate, db: Session = Depends(get_db)
         .filter(Activity.id == activity.id)
         .first()
     )
-    payload = _activity_to_dict(fresh)
-    _attach_usernames([payload], db)
-    return ok(payload)
+    payload = activity_to_dict(fresh)
+    attach_usernames([payload], db)
+    return payload, note
+
+
+@router.post("/batch")
+async def create_activities_batch(payload: ActivityBatchCreate, db: Session = Depends(get_db), user: User = Depends(require_editor)):
+    return await _run_and_notify(_create_activities_batch, payload, db, user)
+
+
+def _create_activities_batch(payload: ActivityBatchCreate, db: Session, user: User) -> tuple[dict, PendingPush | None]:
+    active_staff_ids = valid_staff_ids(db, (sid for item in payload.items for sid in item.assigned_staff_ids))
+
+    activities: list[Activity] = []
+    for item in payload.items:
+        activity = _new_activity(item, user)
+        # Assigning the collection up front lets the flush batch the assignment
+        # inserts and keeps the snapshots below from lazy-loading per row.
+        activity.assignments = [
+            ActivityAssignment(staff_id=sid, assigned_by_user_id=user.id, is_current=True)
+            for sid in item.assigned_staff_ids
+            if sid in active_staff_ids
+        ]
+        activities.append(activity)
+    db.add_all(activities)
+    db.flush()
+
+    for activity in activities:
+        after = _activity_snapshot(activity)
+        add_audit_log(db, user=user, action="create", entity="activity", entity_id=str(activity.id), details={"after": after, "changed_fields": list(after.keys())})
+
+    db.commit()
+    activity_ids = [x.id for x in activities]
+    sync_activities(db, activity_ids)
+
+    message = f"{user.username} created {len(activity_ids)} activities (#{activity_ids[0]}..#{activity_ids[-1]})"
+    note = store_for_all_users(db, message, None, "activity_batch_created")
+    _send_create_email(db, message)
+
+    fresh = (
+        db.query(Activity)
+        .options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff))
+        .filter(Activity.id.in_(activity_ids))
+        .order_by(Activity.id.asc())
+        .all()
+    )
+    items = [activity_to_dict(x) for x in fresh]
+    attach_usernames(items, db)
+    return {"created": len(items), "items": items}, note
 
 
 @router.get("")
 def list_activities(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10, ge=1, le=100),
@@ -237,68 +227,39 @@ def list_activities(
     date_from: str | None = None,
     date_to: str | None = None,
 ):
-    q = db.query(Activity).options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff))
-    filters = []
-    if search:
-        query = search.strip()
-        s = f"%{query}%"
-        normalized = normalize_text(query)
-        use_normalized = normalized != query.replace(" ", "").lower()
-
-        base_search = or_(
-            Activity.customer_name.ilike(s),
-            Activity.address.ilike(s),
-            Activity.location.ilike(s),
-            Activity.report_text.ilike(s),
-            Activity.activity_type.ilike(s),
-        )
-        if use_normalized and len(normalized) >= 2:
-            normalized_like = f"%{normalized}%"
-            normalized_search = or_(
-                normalize_sql_expr(Activity.customer_name).like(normalized_like),
-                normalize_sql_expr(Activity.address).like(normalized_like),
-                normalize_sql_expr(Activity.location).like(normalized_like),
-            )
-            filters.append(or_(base_search, normalized_search))
-        else:
-            filters.append(base_search)
-    if status in {"pending", "done"}:
-        filters.append(Activity.status == status)
-    if customer:
-        filters.append(Activity.customer_name.ilike(f"%{customer}%"))
-    if location:
-        like = f"%{location}%"
-        filters.append(or_(Activity.address.ilike(like), Activity.location.ilike(like)))
-    if created_by_user_id:
-        filters.append(Activity.created_by_user_id == created_by_user_id)
-    if done_by_user_id:
-        filters.append(Activity.done_by_user_id == done_by_user_id)
     try:
-        if date_from:
-            filters.append(Activity.date >= date.fromisoformat(date_from))
-        if date_to:
-            filters.append(Activity.date <= date.fromisoformat(date_to))
+        filters = ActivityFilters.from_mapping(
+            {
+                "search": search,
+                "status": status,
+                "staff_id": staff_id,
+                "customer": customer,
+                "location": location,
+                "created_by_user_id": created_by_user_id,
+                "done_by_user_id": done_by_user_id,
+                "date_from": date_from,
+                "date_to": date_to,
+            }
+        )
     except ValueError as exc:
         raise fail("BAD_REQUEST", "فرمت تاریخ درست نیست", status_code=400) from exc
-    if staff_id:
-        q = q.join(ActivityAssignment, ActivityAssignment.activity_id == Activity.id)
-        filters.append(and_(ActivityAssignment.staff_id == staff_id, ActivityAssignment.is_current.is_(True)))
-    if filters:
-        q = q.filter(*filters)
+    q = apply_activity_filters(
+        db.query(Activity).options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff)), filters
+    )
     total = q.with_entities(func.count(Activity.id)).scalar()
     rows = (
-        q.order_by(case((Activity.status == "pending", 0), else_=1), desc(Activity.priority), desc(Activity.created_at))
+        q.order_by(*ACTIVITY_LIST_ORDER)
         .offset((page - 1) * page_size)
         .limit(page_size)
         .all()
     )
-    items = [_activity_to_dict(r) for r in rows]
-    _attach_usernames(items, db)
+    items = [activity_to_dict(r) for r in rows]
+    attach_usernames(items, db)
     return ok({"items": items, "page": page, "page_size": page_size, "total": total})
 
 
 @router.get("/{activity_id}")
-def get_activity(activity_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_activity(activity_id: int, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     row = (
         db.query(Activity)
         .options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff))
@@ -307,13 +268,13 @@ def get_activity(activity_id: int, db: Session = Depends(get_db), user: User = D
     )
     if not row:
         raise fail("NOT_FOUND", "فعالیت یافت نشد", status_code=404)
-    payload = _activity_to_dict(row)
-    _attach_usernames([payload], db)
+    payload = activity_to_dict(row)
+    attach_usernames([payload], db)
     return ok(payload)
 
 
 @router.get("/{activity_id}/timeline")
-def get_activity_timeline(activity_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_activity_timeline(activity_id: int, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     logs = (
         db.query(AuditLog)
         .filter(AuditLog.entity == "activity", AuditLog.entity_id == str(activity_id))
@@ -351,6 +312,10 @@ def get_activity_timeline(activity_id: int, db: Session = Depends(get_db), user:
 
 @router.put("/{activity_id}")
 async def update_activity(activity_id: int, payload: ActivityUpdate, db: Session = Depends(get_db), user: User = Depends(require_editor)):
+    return await _run_and_notify(_update_activity, activity_id, payload, db, user)
+
+
+def _update_activity(activity_id: int, payload: ActivityUpdate, db: Session, user: User) -> tuple[dict, PendingPush | None]:
     row = db.query(Activity).filter(Activity.id == activity_id).first()
     if not row:
         raise fail("NOT_FOUND", "فعالیت یافت نشد", status_code=404)
@@ -388,7 +353,7 @@ async def update_activity(activity_id: int, payload: ActivityUpdate, db: Session
             row.done_at = None
             row.done_by_user_id = None
     if payload.assigned_staff_ids is not None:
-        _set_assignments(db, row, payload.assigned_staff_ids, user.id)
+        set_assignments(db, row, payload.assigned_staff_ids, user.id)
 
     after = _activity_snapshot(row)
     add_audit_log(
@@ -402,7 +367,7 @@ async def update_activity(activity_id: int, payload: ActivityUpdate, db: Session
 
     db.commit()
     sync_activity(db, row.id)
-    await _notify_all_users(db, f"{user.username} updated activity #{row.id}", row.id, "activity_updated")
+    note = store_for_all_users(db, f"{user.username} updated activity #{row.id}", row.id, "activity_updated")
 
     fresh = (
         db.query(Activity)
@@ -410,13 +375,17 @@ async def update_activity(activity_id: int, payload: ActivityUpdate, db: Session
         .filter(Activity.id == activity_id)
         .first()
     )
-    payload = _activity_to_dict(fresh)
-    _attach_usernames([payload], db)
-    return ok(payload)
+    payload = activity_to_dict(fresh)
+    attach_usernames([payload], db)
+    return payload, note
 
 
 @router.delete("/{activity_id}")
 async def delete_activity(activity_id: int, db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+    return await _run_and_notify(_delete_activity, activity_id, db, user)
+
+
+def _delete_activity(activity_id: int, db: Session, user: User) -> tuple[dict, PendingPush | None]:
     row = db.query(Activity).filter(Activity.id == activity_id).first()
     if not row:
         raise fail("NOT_FOUND", "فعالیت یافت نشد", status_code=404)
@@ -424,12 +393,16 @@ async def delete_activity(activity_id: int, db: Session = Depends(get_db), user:
     db.delete(row)
     add_audit_log(db, user=user, action="delete", entity="activity", entity_id=str(activity_id), details={"before": before})
     db.commit()
-    await _notify_all_users(db, f"{user.username} deleted activity #{activity_id}", activity_id, "activity_deleted")
-    return ok({"deleted_id": activity_id})
+    note = store_for_all_users(db, f"{user.username} deleted activity #{activity_id}", activity_id, "activity_deleted")
+    return {"deleted_id": activity_id}, note
 
 
 @router.post("/{activity_id}/mark-done")
 async def mark_done(activity_id: int, db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+    return await _run_and_notify(_mark_done, activity_id, db, user)
+
+
+def _mark_done(activity_id: int, db: Session, user: User) -> tuple[dict, PendingPush | None]:
     row = db.query(Activity).filter(Activity.id == activity_id).first()
     if not row:
         raise fail("NOT_FOUND", "فعالیت یافت نشد", status_code=404)
@@ -441,12 +414,16 @@ async def mark_done(activity_id: int, db: Session = Depends(get_db), user: User
     add_audit_log(db, user=user, action="mark_done", entity="activity", entity_id=str(activity_id), details={"before": before, "after": after})
     db.commit()
     sync_activity(db, row.id)
-    await _notify_all_users(db, f"{user.username} marked activity #{activity_id} done", activity_id, "activity_done")
-    return ok({"id": row.id, "status": "done"})
+    note = store_for_all_users(db, f"{user.username} marked activity #{activity_id} done", activity_id, "activity_done")
+    return {"id": row.id, "status": "done"}, note
 
 
 @router.post("/{activity_id}/reorder")
 async def reorder_activity(activity_id: int, payload: dict, db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+    return await _run_and_notify(_reorder_activity, activity_id, payload, db, user)
+
+
+def _reorder_activity(activity_id: int, payload: dict, db: Session, user: User) -> tuple[dict, PendingPush | None]:
     priority = int(payload.get("priority", 0))
     row = db.query(Activity).filter(Activity.id == activity_id).first()
     if not row:
@@ -456,12 +433,59 @@ async def reorder_activity(activity_id: int, payload: dict, db: Session = Depend
     after = _activity_snapshot(row)
     add_audit_log(db, user=user, action="reorder", entity="activity", entity_id=str(activity_id), details={"before": before, "after": after})
     db.commit()
-    await _notify_all_users(db, f"{user.username} changed priority for activity #{activity_id} to {priority}", activity_id, "activity_reordered")
-    return ok({"id": row.id, "priority": row.priority})
+    note = store_for_all_users(db, f"{user.username} changed priority for activity #{activity_id} to {priority}", activity_id, "activity_reordered")
+    return {"id": row.id, "priority": row.priority}, note
+
+
+@router.post("/reorder")
+async def reorder_activities(payload: ActivityReorderRequest, db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+    return await _run_and_notify(_reorder_activities, payload, db, user)
+
+
+def _reorder_activities(payload: ActivityReorderRequest, db: Session, user: User) -> tuple[dict, PendingPush | None]:
+    requested = [x.id for x in payload.items] if payload.items else (payload.ids or [])
+    if not requested:
+        raise fail("BAD_REQUEST", "ids یا items ضروری است", status_code=400)
+    if len(set(requested)) != len(requested):
+        raise fail("BAD_REQUEST", "ids تکراری است", status_code=400)
+    priorities = payload.priorities()
+
+    before_rows = db.query(Activity.id, Activity.priority).filter(Activity.id.in_(requested)).all()
+    before = {x[0]: x[1] for x in before_rows}
+    missing = [x for x in requested if x not in before]
+    if missing:
+        raise fail("NOT_FOUND", "فعالیت یافت نشد", details={"missing_ids": missing}, status_code=404)
+
+    changed = {act_id: prio for act_id, prio in priorities.items() if before[act_id] != prio}
+    note = None
+    if changed:
+        mark_activities_changed(db, changed)
+        db.query(Activity).filter(Activity.id.in_(list(changed))).update(
+            {"priority": case(changed, value=Activity.id)},
+            synchronize_session=False,
+        )
+        add_audit_log(
+            db,
+            user=user,
+            action="bulk_reorder",
+            entity="activity",
+            entity_id="batch",
+            details={
+                "action": "reorder",
+                "items": [{"id": act_id, "before": before[act_id], "after": prio} for act_id, prio in changed.items()],
+            },
+        )
+        db.commit()
+        note = store_for_all_users(db, f"{user.username} reordered {len(changed)} activities", None, "activity_reordered")
+    return {"items": [{"id": act_id, "priority": priorities[act_id]} for act_id in requested], "changed": len(changed)}, note
 
 
 @router.post("/bulk")
 async def bulk_activity_action(payload: dict, db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+    return await _run_and_notify(_bulk_activity_action, payload, db, user)
+
+
+def _bulk_activity_action(payload: dict, db: Session, user: User) -> tuple[dict, PendingPush | None]:
     action = str(payload.get("action") or "").strip()
     ids = payload.get("ids") or []
     if action not in {"set_status", "assign_staff", "set_priority", "delete"}:
@@ -472,56 +496,73 @@ async def bulk_activity_action(payload: dict, db: Session = Depends(get_db), use
     if not activity_ids:
         raise fail("BAD_REQUEST", "ids معتبر نیست", status_code=400)
 
-    rows = db.query(Activity).filter(Activity.id.in_(activity_ids)).all()
+    values: dict = {}
+    staff_ids: list[int] = []
+    if action == "set_status":
+        status_value = str(payload.get("status") or "").strip()
+        if status_value not in {"pending", "done"}:
+            raise fail("BAD_REQUEST", "status معتبر نیست", status_code=400)
+        done = status_value == "done"
+        values = {
+            "status": status_value,
+            "done_at": datetime.utcnow() if done else None,
+            "done_by_user_id": user.id if done else None,
+        }
+    elif action == "set_priority":
+        values = {"priority": int(payload.get("priority", 0))}
+    elif action == "assign_staff":
+        raw_staff_ids = payload.get("staff_ids") or []
+        if not isinstance(raw_staff_ids, list):
+            raise fail("BAD_REQUEST", "staff_ids باید list باشد", status_code=400)
+        staff_ids = [int(x) for x in raw_staff_ids if str(x).isdigit()]
+
+    rows = (
+        db.query(Activity)
+        .options(joinedload(Activity.assignments))
+        .filter(Activity.id.in_(activity_ids))
+        .all()
+    )
     if not rows:
         raise fail("NOT_FOUND", "فعالیتی پیدا نشد", status_code=404)
+    befores = {row.id: _activity_snapshot(row) for row in rows}
+    target_ids = list(befores)
+    id_filter = Activity.id.in_(target_ids)
 
-    updated = 0
-    deleted = 0
-    touched_ids: list[int] = []
-    for row in rows:
-        before = _activity_snapshot(row)
-        if action == "set_status":
-            status_value = str(payload.get("status") or "").strip()
-            if status_value not in {"pending", "done"}:
-                raise fail("BAD_REQUEST", "status معتبر نیست", status_code=400)
-            row.status = status_value
-            if status_value == "done":
-                row.done_at = datetime.utcnow()
-                row.done_by_user_id = user.id
-            else:
-                row.done_at = None
-                row.done_by_user_id = None
-            updated += 1
-            touched_ids.append(row.id)
-        elif action == "assign_staff":
-            staff_ids = payload.get("staff_ids") or []
-            if not isinstance(staff_ids, list):
-                raise fail("BAD_REQUEST", "staff_ids باید list باشد", status_code=400)
-            _set_assignments(db, row, [int(x) for x in staff_ids if str(x).isdigit()], user.id)
-            updated += 1
-            touched_ids.append(row.id)
-        elif action == "set_priority":
-            priority = int(payload.get("priority", 0))
-            row.priority = priority
-            updated += 1
-            touched_ids.append(row.id)
-        elif action == "delete":
-            db.delete(row)
-            deleted += 1
-
-        after = _activity_snapshot(row) if action != "delete" else {}
-        add_audit_log(
-            db,
-            user=user,
-            action=f"bulk_{action}",
-            entity="activity",
-            entity_id=str(row.id),
-            details={"before": before, "after": after, "action": action},
-        )
+    mark_activities_changed(db, target_ids)
+    if action != "set_priority":
+        mark_activities(db, rows)
+    if action == "delete":
+        db.query(ActivityAssignment).filter(ActivityAssignment.activity_id.in_(target_ids)).delete(synchronize_session=False)
+        db.query(Activity).filter(id_filter).delete(synchronize_session=False)
+        afters = {act_id: {} for act_id in target_ids}
+    elif action == "assign_staff":
+        applied = replace_assignments(db, {act_id: staff_ids for act_id in target_ids}, user.id)
+        afters = {act_id: {**before, "assigned_staff_ids": applied[act_id]} for act_id, before in befores.items()}
+    else:
+        db.query(Activity).filter(id_filter).update(values, synchronize_session=False)
+        snapshot_values = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in values.items()}
+        afters = {act_id: {**before, **snapshot_values} for act_id, before in befores.items()}
+
+    add_audit_logs(
+        db,
+        user=user,
+        action=f"bulk_{action}",
+        entity="activity",
+        entries=[
+            (str(act_id), {"before": befores[act_id], "after": afters[act_id], "action": action})
+            for act_id in target_ids
+        ],
+    )
 
     db.commit()
-    for act_id in touched_ids:
-        sync_activity(db, act_id)
-    await _notify_all_users(db, f"{user.username} ran bulk action '{action}' on {len(rows)} activities", None, "activity_bulk")
-    return ok({"action": action, "total": len(rows), "updated": updated, "deleted": deleted, "touched_ids": touched_ids})
+    touched_ids = [] if action == "delete" else target_ids
+    sync_activities(db, touched_ids)
+    note = store_for_all_users(db, f"{user.username} ran bulk action '{action}' on {len(rows)} activities", None, "activity_bulk")
+    data = {
+        "action": action,
+        "total": len(rows),
+        "updated": len(touched_ids),
+        "deleted": len(target_ids) if action == "delete" else 0,
+        "touched_ids": touched_ids,
+    }
+    return data, note
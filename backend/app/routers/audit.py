@@ -5,13 +5,15 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session, joinedload
 
 from ..api_utils import fail, loads_json, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import require_admin
-from ..models import Activity, ActivityAssignment, AuditLog, Notification, Staff, User
+from ..models import Activity, AuditLog, User
 from ..services.address_service import normalize_address, normalize_location
+from ..services.assignment_service import set_assignments
 from ..services.audit_service import add_audit_log
 from ..services.excel_service import sync_activity
-from ..services.notification_service import notification_hub
+from ..services.notification_service import PendingPush, deliver, store_for_all_users
+from ..services.offload_service import run_blocking
 
 router = APIRouter(prefix="/api/audit", tags=["audit"])
 
@@ -96,37 +98,6 @@ def _activity_snapshot(a: Activity) -> dict:
     }
 
 
-async def _notify_all_users(db: Session, text: str, activity_id: int | None, event_type: str) -> None:
-    users = db.query(User).all()
-    for u in users:
-        db.add(Notification(user_id=u.id, activity_id=activity_id, type=event_type, text=text))
-    db.commit()
-    for u in users:
-        await notification_hub.push(
-            u.id,
-            {"type": event_type, "text": text, "activity_id": activity_id, "created_at": datetime.utcnow().isoformat()},
-        )
-
-
-def _set_assignments(db: Session, activity: Activity, staff_ids: list[int], by_user_id: int) -> None:
-    db.query(ActivityAssignment).filter(
-        ActivityAssignment.activity_id == activity.id,
-        ActivityAssignment.is_current.is_(True),
-    ).update({"is_current": False})
-    for sid in staff_ids:
-        staff = db.query(Staff).filter(Staff.id == sid).first()
-        if not staff:
-            continue
-        db.add(
-            ActivityAssignment(
-                activity_id=activity.id,
-                staff_id=sid,
-                assigned_by_user_id=by_user_id,
-                is_current=True,
-            )
-        )
-
-
 def _apply_snapshot(db: Session, row: Activity, snapshot: dict, by_user_id: int) -> None:
     row.date = date.fromisoformat(snapshot["date"])
     row.activity_type = snapshot.get("activity_type") or row.activity_type
@@ -143,14 +114,14 @@ def _apply_snapshot(db: Session, row: Activity, snapshot: dict, by_user_id: int)
     row.done_at = datetime.fromisoformat(done_at) if done_at else None
     row.done_by_user_id = snapshot.get("done_by_user_id")
 
-    _set_assignments(db, row, [int(x) for x in snapshot.get("assigned_staff_ids") or []], by_user_id)
+    set_assignments(db, row, [int(x) for x in snapshot.get("assigned_staff_ids") or []], by_user_id, include_inactive=True)
 
 
 @router.get("")
 def list_audit_logs(
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(require_admin),
 ):
     q = db.query(AuditLog).order_by(AuditLog.created_at.desc())
@@ -186,6 +157,12 @@ def list_audit_logs(
 
 @router.post("/{audit_id}/undo")
 async def undo_audit(audit_id: int, db: Session = Depends(get_db), user: User = Depends(require_admin)):
+    data, note = await run_blocking(_undo_audit, audit_id, db, user)
+    await deliver(note)
+    return ok(data)
+
+
+def _undo_audit(audit_id: int, db: Session, user: User) -> tuple[dict, PendingPush]:
     log = db.query(AuditLog).filter(AuditLog.id == audit_id).first()
     if not log:
         raise fail("NOT_FOUND", "audit log not found", status_code=404)
@@ -210,8 +187,8 @@ async def undo_audit(audit_id: int, db: Session = Depends(get_db), user: User =
         db.delete(row)
         add_audit_log(db, user=user, action="undo_create", entity="activity", entity_id=str(activity_id), details={"target_audit_id": audit_id, "before": before})
         db.commit()
-        await _notify_all_users(db, f"{user.username} undid create for activity #{activity_id}", activity_id, "audit_undo")
-        return ok({"undone": True, "action": log.action, "activity_id": activity_id})
+        note = store_for_all_users(db, f"{user.username} undid create for activity #{activity_id}", activity_id, "audit_undo")
+        return {"undone": True, "action": log.action, "activity_id": activity_id}, note
 
     if log.action == "delete":
         snap = details.get("before")
@@ -240,12 +217,12 @@ async def undo_audit(audit_id: int, db: Session = Depends(get_db), user: User =
         )
         db.add(restored)
         db.flush()
-        _set_assignments(db, restored, [int(x) for x in snap.get("assigned_staff_ids") or []], user.id)
+        set_assignments(db, restored, [int(x) for x in snap.get("assigned_staff_ids") or []], user.id, include_inactive=True)
         add_audit_log(db, user=user, action="undo_delete", entity="activity", entity_id=str(activity_id), details={"target_audit_id": audit_id, "after": snap})
         db.commit()
         sync_activity(db, restored.id)
-        await _notify_all_users(db, f"{user.username} restored deleted activity #{activity_id}", activity_id, "audit_undo")
-        return ok({"undone": True, "action": log.action, "activity_id": activity_id})
+        note = store_for_all_users(db, f"{user.username} restored deleted activity #{activity_id}", activity_id, "audit_undo")
+        return {"undone": True, "action": log.action, "activity_id": activity_id}, note
 
     snap = details.get("before")
     if not isinstance(snap, dict):
@@ -259,5 +236,5 @@ async def undo_audit(audit_id: int, db: Session = Depends(get_db), user: User =
     add_audit_log(db, user=user, action=f"undo_{log.action}", entity="activity", entity_id=str(activity_id), details={"target_audit_id": audit_id, "after": snap})
     db.commit()
     sync_activity(db, row.id)
-    await _notify_all_users(db, f"{user.username} undid {log.action} for activity #{activity_id}", activity_id, "audit_undo")
-    return ok({"undone": True, "action": log.action, "activity_id": activity_id})
+    note = store_for_all_users(db, f"{user.username} undid {log.action} for activity #{activity_id}", activity_id, "audit_undo")
+    return {"undone": True, "action": log.action, "activity_id": activity_id}, note
@@ -84,7 +84,9 @@ def change_password(payload: ChangePasswordRequest, db: Session = Depends(get_db
     if payload.current_password == payload.new_password:
         raise fail("BAD_REQUEST", "رمز جدید باید متفاوت باشد", status_code=400)
 
-    user.password_hash = hash_password(payload.new_password)
-    add_audit_log(db, user=user, action="change_password", entity="user", entity_id=str(user.id), details={})
+    # The authenticated user comes from the read-only session; write through this one.
+    row = db.query(User).filter(User.id == user.id).first()
+    row.password_hash = hash_password(payload.new_password)
+    add_audit_log(db, user=row, action="change_password", entity="user", entity_id=str(user.id), details={})
     db.commit()
     return ok({"changed": True})
@@ -1,96 +1,156 @@
 import json
 from datetime import date, timedelta
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, or_
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func, or_
 from sqlalchemy.orm import Session
 
 from ..api_utils import fail, loads_json, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import get_current_user, normalize_role
-from ..models import Activity, ActivityAssignment, ReportPreset, Staff, User
+from ..models import Activity, ActivityDailyStats, ReportPreset, Staff, User
+from ..services.activity_query_service import ActivityFilters
+from ..services.activity_stats_service import bucket_start, month_start, next_bucket, week_start
+from ..services.preset_results_service import preset_results
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
-@router.get("/stats")
-def stats(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    today = date.today()
+STATS_SECTIONS = ("counters", "by_type", "by_staff", "recent")
+
+
+def _stats_counters(db: Session, today: date) -> dict:
     week_start = today - timedelta(days=today.weekday())
+    total_today, total_week, pending, done = (
+        db.query(
+            func.coalesce(func.sum(case((ActivityDailyStats.day == today, ActivityDailyStats.created), else_=0)), 0),
+            func.coalesce(func.sum(case((ActivityDailyStats.day >= week_start, ActivityDailyStats.created), else_=0)), 0),
+            func.coalesce(func.sum(ActivityDailyStats.status_pending), 0),
+            func.coalesce(func.sum(ActivityDailyStats.status_done), 0),
+        )
+        .filter(ActivityDailyStats.staff_id.is_(None))
+        .one()
+    )
+    return {"total_today": int(total_today), "total_week": int(total_week), "pending": int(pending), "done": int(done)}
 
-    total_today = db.query(func.count(Activity.id)).filter(Activity.date == today).scalar()
-    total_week = db.query(func.count(Activity.id)).filter(Activity.date >= week_start).scalar()
-    pending = db.query(func.count(Activity.id)).filter(Activity.status == "pending").scalar()
-    done = db.query(func.count(Activity.id)).filter(Activity.status == "done").scalar()
 
-    by_type_rows = (
-        db.query(Activity.activity_type, func.count(Activity.id))
-        .group_by(Activity.activity_type)
-        .order_by(func.count(Activity.id).desc())
+def _stats_by_type(db: Session) -> list[dict]:
+    type_count = func.sum(ActivityDailyStats.created)
+    rows = (
+        db.query(ActivityDailyStats.activity_type, type_count)
+        .filter(ActivityDailyStats.staff_id.is_(None))
+        .group_by(ActivityDailyStats.activity_type)
+        .having(type_count > 0)
+        .order_by(type_count.desc())
         .all()
     )
-    by_staff_rows = (
-        db.query(Staff.name, func.count(ActivityAssignment.id))
-        .join(ActivityAssignment, ActivityAssignment.staff_id == Staff.id)
-        .filter(ActivityAssignment.is_current.is_(True))
+    return [{"name": x[0], "count": int(x[1])} for x in rows]
+
+
+def _stats_by_staff(db: Session) -> list[dict]:
+    staff_count = func.sum(ActivityDailyStats.created)
+    rows = (
+        db.query(Staff.name, staff_count)
+        .join(ActivityDailyStats, ActivityDailyStats.staff_id == Staff.id)
         .group_by(Staff.name)
+        .having(staff_count > 0)
         .all()
     )
-    recent = db.query(Activity).order_by(Activity.created_at.desc()).limit(5).all()
-    return ok(
+    return [{"name": x[0], "count": int(x[1])} for x in rows]
+
+
+def _stats_recent(db: Session) -> list[dict]:
+    rows = db.query(Activity).order_by(Activity.created_at.desc()).limit(5).all()
+    return [
         {
-            "total_today": total_today,
-            "total_week": total_week,
-            "pending": pending,
-            "done": done,
-            "by_type": [{"name": x[0], "count": x[1]} for x in by_type_rows],
-            "by_staff": [{"name": x[0], "count": x[1]} for x in by_staff_rows],
-            "recent": [
-                {
-                    "id": x.id,
-                    "customer_name": x.customer_name,
-                    "address": x.address,
-                    "activity_type": x.activity_type,
-                    "status": x.status,
-                    "date": x.date.isoformat(),
-                }
-                for x in recent
-            ],
+            "id": x.id,
+            "customer_name": x.customer_name,
+            "address": x.address,
+            "activity_type": x.activity_type,
+            "status": x.status,
+            "date": x.date.isoformat(),
         }
-    )
+        for x in rows
+    ]
+
+
+@router.get("/stats")
+def stats(
+    include: str | None = None,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    sections = [x.strip() for x in include.split(",") if x.strip()] if include else list(STATS_SECTIONS)
+    unknown = sorted(set(sections) - set(STATS_SECTIONS))
+    if unknown:
+        raise fail("BAD_REQUEST", "بخش درخواست شده معتبر نیست", details={"unknown": unknown, "allowed": STATS_SECTIONS}, status_code=400)
+
+    data: dict = {}
+    if "counters" in sections:
+        data.update(_stats_counters(db, date.today()))
+    if "by_type" in sections:
+        data["by_type"] = _stats_by_type(db)
+    if "by_staff" in sections:
+        data["by_staff"] = _stats_by_staff(db)
+    if "recent" in sections:
+        data["recent"] = _stats_recent(db)
+    return ok(data)
+
+
+TREND_GRANULARITIES = ("day", "week", "month")
+MAX_TREND_DAILY_BUCKETS = 3660
 
 
 @router.get("/trends")
 def trends(
     days: int = 30,
-    db: Session = Depends(get_db),
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
-    safe_days = max(7, min(days, 180))
-    start = date.today() - timedelta(days=safe_days - 1)
-    created_rows = (
-        db.query(Activity.date, func.count(Activity.id))
-        .filter(Activity.date >= start)
-        .group_by(Activity.date)
-        .all()
-    )
-    done_rows = (
-        db.query(func.date(Activity.done_at), func.count(Activity.id))
-        .filter(Activity.done_at.is_not(None), func.date(Activity.done_at) >= start.isoformat())
-        .group_by(func.date(Activity.done_at))
+    end = to_date or date.today()
+    if from_date is None:
+        safe_days = max(7, min(days, 180))
+        start = end - timedelta(days=safe_days - 1)
+    else:
+        start = from_date
+    if start > end:
+        raise fail("BAD_REQUEST", "تاریخ شروع باید قبل از تاریخ پایان باشد", status_code=400)
+    span_days = (end - start).days + 1
+    if granularity == "day" and span_days > MAX_TREND_DAILY_BUCKETS:
+        raise fail("BAD_REQUEST", "بازه روزانه بیش از حد طولانی است؛ از week یا month استفاده کنید", status_code=400)
+
+    if granularity == "week":
+        bucket = week_start(ActivityDailyStats.day)
+    elif granularity == "month":
+        bucket = month_start(ActivityDailyStats.day)
+    else:
+        bucket = ActivityDailyStats.day
+    rows = (
+        db.query(bucket, func.sum(ActivityDailyStats.created), func.sum(ActivityDailyStats.done))
+        .filter(ActivityDailyStats.staff_id.is_(None), ActivityDailyStats.day.between(start, end))
+        .group_by(bucket)
         .all()
     )
-    created_map = {x[0].isoformat(): int(x[1]) for x in created_rows}
-    done_map = {str(x[0]): int(x[1]) for x in done_rows}
+    totals = {x[0]: (int(x[1] or 0), int(x[2] or 0)) for x in rows}
 
     result = []
-    for i in range(safe_days):
-        d = start + timedelta(days=i)
-        key = d.isoformat()
-        created = created_map.get(key, 0)
-        done = done_map.get(key, 0)
-        result.append({"date": key, "created": created, "done": done, "pending_delta": created - done})
-    return ok({"days": safe_days, "items": result})
+    current = bucket_start(start, granularity)
+    while current <= end:
+        created, done = totals.get(current, (0, 0))
+        result.append({"date": current.isoformat(), "created": created, "done": done, "pending_delta": created - done})
+        current = next_bucket(current, granularity)
+    return ok(
+        {
+            "days": span_days,
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "items": result,
+        }
+    )
 
 
 def _preset_to_dict(row: ReportPreset) -> dict:
@@ -106,7 +166,7 @@ def _preset_to_dict(row: ReportPreset) -> dict:
 
 
 @router.get("/presets")
-def list_presets(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_presets(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     rows = (
         db.query(ReportPreset)
         .filter(or_(ReportPreset.created_by_user_id == user.id, ReportPreset.is_shared.is_(True)))
@@ -116,6 +176,25 @@ def list_presets(db: Session = Depends(get_db), user: User = Depends(get_current
     return ok([_preset_to_dict(x) for x in rows])
 
 
+@router.get("/presets/{preset_id}/results")
+def get_preset_results(
+    preset_id: int,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, ge=1, le=100),
+    summary: bool = False,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    row = db.query(ReportPreset).filter(ReportPreset.id == preset_id).first()
+    if not row or (row.created_by_user_id != user.id and not row.is_shared):
+        raise fail("NOT_FOUND", "preset یافت نشد", status_code=404)
+    try:
+        filters = ActivityFilters.from_mapping(loads_json(row.filters_json))
+    except ValueError as exc:
+        raise fail("BAD_REQUEST", "filters ذخیره شده معتبر نیست", details=str(exc), status_code=400) from exc
+    return ok({"preset": _preset_to_dict(row), **preset_results(db, row, filters, page, page_size, summary)})
+
+
 @router.post("/presets")
 def create_preset(payload: dict, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     name = str(payload.get("name") or "").strip()
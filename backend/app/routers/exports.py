@@ -11,10 +11,12 @@ from sqlalchemy import case
 from sqlalchemy.orm import Session
 
 from ..api_utils import fail, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import require_manager_or_admin
 from ..models import Activity, ActivityAssignment, Staff, User
-from ..services.excel_service import sync_activity
+from ..services.assignment_service import replace_assignments
+from ..services.excel_service import sync_activities
+from ..services.offload_service import run_blocking
 
 router = APIRouter(prefix="/api/exports", tags=["exports"])
 
@@ -73,22 +75,6 @@ def _parse_extra_fields(value: Any) -> dict[str, Any]:
         return {}
 
 
-def _set_assignments(db: Session, activity: Activity, staff_ids: list[int], by_user_id: int) -> None:
-    db.query(ActivityAssignment).filter(
-        ActivityAssignment.activity_id == activity.id,
-        ActivityAssignment.is_current.is_(True),
-    ).update({"is_current": False})
-    for sid in staff_ids:
-        db.add(
-            ActivityAssignment(
-                activity_id=activity.id,
-                staff_id=sid,
-                assigned_by_user_id=by_user_id,
-                is_current=True,
-            )
-        )
-
-
 def _rows(db: Session):
     rows = (
         db.query(Activity)
@@ -223,7 +209,7 @@ def _parse_excel_rows(file_bytes: bytes, db: Session) -> tuple[list[dict[str, An
 
 
 @router.get("/csv")
-def export_csv(db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+def export_csv(db: Session = Depends(get_read_db), user: User = Depends(require_manager_or_admin)):
     buffer = StringIO()
     writer = csv.writer(buffer)
     writer.writerow(EXPORT_HEADERS)
@@ -237,7 +223,7 @@ def export_csv(db: Session = Depends(get_db), user: User = Depends(require_manag
 
 
 @router.get("/excel")
-def export_excel(db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+def export_excel(db: Session = Depends(get_read_db), user: User = Depends(require_manager_or_admin)):
     wb = Workbook()
     ws = wb.active
     ws.title = "فعالیت ها"
@@ -280,7 +266,7 @@ async def validate_excel_import(
     if not file.filename or not file.filename.lower().endswith(".xlsx"):
         raise fail("BAD_REQUEST", "فایل باید با پسوند .xlsx باشد", status_code=400)
 
-    rows, errors = _parse_excel_rows(await file.read(), db)
+    rows, errors = await run_blocking(_parse_excel_rows, await file.read(), db)
     preview = [{"row": x["row"], "customer_name": x["customer_name"], "address": x["address"]} for x in rows[:50]]
     return ok(
         {
@@ -304,7 +290,11 @@ async def import_excel(
     if not file.filename or not file.filename.lower().endswith(".xlsx"):
         raise fail("BAD_REQUEST", "فایل باید با پسوند .xlsx باشد", status_code=400)
 
-    rows, errors = _parse_excel_rows(await file.read(), db)
+    return ok(await run_blocking(_import_rows, await file.read(), mode, db, user))
+
+
+def _import_rows(file_bytes: bytes, mode: str, db: Session, user: User) -> dict[str, Any]:
+    rows, errors = _parse_excel_rows(file_bytes, db)
     if errors:
         raise fail(
             "VALIDATION_ERROR",
@@ -316,6 +306,7 @@ async def import_excel(
     created = 0
     updated = 0
     touched_ids: list[int] = []
+    assignment_targets: dict[int, list[int]] = {}
 
     try:
         for item in rows:
@@ -339,7 +330,7 @@ async def import_excel(
                 if existing.status != "done":
                     existing.done_at = None
                     existing.done_by_user_id = None
-                _set_assignments(db, existing, item["staff_ids"], user.id)
+                assignment_targets[existing.id] = item["staff_ids"]
                 updated += 1
                 touched_ids.append(existing.id)
                 continue
@@ -362,16 +353,16 @@ async def import_excel(
             )
             db.add(row)
             db.flush()
-            _set_assignments(db, row, item["staff_ids"], user.id)
+            assignment_targets[row.id] = item["staff_ids"]
             created += 1
             touched_ids.append(row.id)
 
+        replace_assignments(db, assignment_targets, user.id)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise fail("IMPORT_FAILED", "وارد کردن اکسل ناموفق بود", details=str(exc), status_code=500) from exc
 
-    for activity_id in touched_ids:
-        sync_activity(db, activity_id)
+    sync_activities(db, touched_ids)
 
-    return ok({"mode": mode, "created": created, "updated": updated, "imported": len(rows), "activity_ids": touched_ids})
+    return {"mode": mode, "created": created, "updated": updated, "imported": len(rows), "activity_ids": touched_ids}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from ..api_utils import fail, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import get_current_user, require_admin
 from ..models import MasterData, SystemSetting, User
 from ..schemas import MasterDataIn, SettingIn
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/api/master-data", tags=["master-data"])
 
 
 @router.get("")
-def list_master_data(category: str | None = None, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_master_data(category: str | None = None, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     q = db.query(MasterData)
     if category:
         q = q.filter(MasterData.category == category)
@@ -58,7 +58,7 @@ def delete_master_data(item_id: int, db: Session = Depends(get_db), user: User =
 
 
 @router.get("/settings/system")
-def list_settings(db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def list_settings(db: Session = Depends(get_read_db), user: User = Depends(require_admin)):
     rows = db.query(SystemSetting).all()
     return ok([{"key": x.key, "value": x.value} for x in rows])
 
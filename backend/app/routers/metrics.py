@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from ..api_utils import fail
+from ..config import settings
+from ..database import get_read_db
+from ..deps import get_current_user, optional_bearer, require_admin
+from ..services import metrics_service
+from ..services.notification_service import notification_hub
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _metrics_guard(
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+    db: Session = Depends(get_read_db),
+) -> None:
+    if settings.metrics_access == "public":
+        return
+    if settings.metrics_access != "admin":
+        raise fail("NOT_FOUND", "مسیر پیدا نشد", status_code=404)
+    if credentials is None:
+        raise fail("UNAUTHORIZED", "توکن معتبر نیست", status_code=401)
+    require_admin(get_current_user(credentials, db))
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(_metrics_guard)])
+def get_metrics():
+    hub = notification_hub.stats()
+    metrics_service.websocket_connections.set(hub["connections"])
+    metrics_service.websocket_queued_messages.set(hub["queued"])
+    metrics_service.websocket_max_queue_depth.set(hub["max_queue_depth"])
+    return PlainTextResponse(metrics_service.registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
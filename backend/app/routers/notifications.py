@@ -1,16 +1,30 @@
+import base64
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 
-from ..api_utils import ok
+from ..api_utils import fail, ok
 from ..auth import decode_token
 from ..config import settings
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import get_current_user, require_manager_or_admin
 from ..models import Notification, SystemSetting, User
+from ..schemas import NotificationReadRequest
 from ..services.notification_rules_service import run_notification_rules
-from ..services.notification_service import notification_hub
+from ..services.notification_service import (
+    keyset_before,
+    mark_all_notifications_read,
+    mark_notification_read,
+    mark_notifications_read,
+    missed_notifications,
+    notification_etag,
+    notification_hub,
+    notification_page,
+    unread_count,
+    unread_filter,
+)
+from ..services.offload_service import run_blocking
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
@@ -22,13 +36,47 @@ def _to_int(value, default: int) -> int:
         return default
 
 
+def _encode_cursor(created_at: datetime, note_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{note_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, note_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(note_id)
+    except (ValueError, UnicodeDecodeError):
+        raise fail("BAD_REQUEST", "نشانگر صفحه نامعتبر است", status_code=400)
+
+
 @router.get("")
-def list_notifications(db: Session = Depends(get_db), user: User = Depends(get_current_user), unread_only: bool = False):
-    q = db.query(Notification).filter(Notification.user_id == user.id)
+def list_notifications(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    unread_only: bool = False,
+    since: int | None = Query(default=None, ge=0),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=100),
+):
+    etag = notification_etag(db, user, unread_only, since, cursor, limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [x.strip() for x in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    criteria = []
     if unread_only:
-        q = q.filter(Notification.read_at.is_(None))
-    rows = q.order_by(Notification.created_at.desc()).limit(50).all()
-    unread_count = db.query(Notification).filter(Notification.user_id == user.id, Notification.read_at.is_(None)).count()
+        criteria.append(unread_filter(user))
+    if since is not None:
+        criteria.append(Notification.id > since)
+    if cursor:
+        criteria.append(keyset_before(*_decode_cursor(cursor)))
+    rows = notification_page(db, user, limit + 1, *criteria)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    unread = unread_count(db, user)
     return ok(
         {
             "items": [
@@ -37,25 +85,49 @@ def list_notifications(db: Session = Depends(get_db), user: User = Depends(get_c
                     "activity_id": x.activity_id,
                     "type": x.type,
                     "text": x.text,
-                    "read_at": x.read_at.isoformat() if x.read_at else None,
+                    "read_at": read_at.isoformat() if read_at else None,
                     "created_at": x.created_at.isoformat(),
                 }
-                for x in rows
+                for x, read_at in rows
             ],
-            "unread_count": unread_count,
+            "unread_count": unread,
+            "next_cursor": _encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if has_more else None,
         }
     )
 
 
+@router.post("/read-all")
+def mark_all_read(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    return ok({"marked": mark_all_notifications_read(db, user)})
+
+
+@router.post("/read")
+def mark_many_read(payload: NotificationReadRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    return ok({"marked": mark_notifications_read(db, user, payload.ids)})
+
+
 @router.post("/{notification_id}/read")
 def mark_read(notification_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    row = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == user.id).first()
-    if row and not row.read_at:
-        row.read_at = datetime.utcnow()
-        db.commit()
+    mark_notification_read(db, user, notification_id)
     return ok({"id": notification_id})
 
 
+def _find_user(username: str) -> User | None:
+    db = next(get_read_db())
+    try:
+        return db.query(User).filter(User.username == username).first()
+    finally:
+        db.close()
+
+
+def _missed_notifications(user: User, since: int, limit: int) -> list[tuple[int, str]]:
+    db = next(get_read_db())
+    try:
+        return missed_notifications(db, user, since, limit)
+    finally:
+        db.close()
+
+
 @router.websocket("/ws")
 async def notification_ws(websocket: WebSocket):
     token = websocket.query_params.get("token")
@@ -70,25 +142,30 @@ async def notification_ws(websocket: WebSocket):
     except Exception:
         await websocket.close(code=1008)
         return
-    db = next(get_db())
-    try:
-        user = db.query(User).filter(User.username == username).first()
-    finally:
-        db.close()
+    user = await run_blocking(_find_user, username)
     if not user:
         await websocket.close(code=1008)
         return
 
-    await notification_hub.connect(user.id, websocket)
+    since = _to_int(websocket.query_params.get("since"), None)
+    if since is not None and since < 0:
+        since = None
+
+    async def load_missed(after: int, limit: int) -> list[tuple[int, str]]:
+        return await run_blocking(_missed_notifications, user, after, limit)
+
+    await notification_hub.connect(user.id, websocket, since=since, load_missed=load_missed)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         await notification_hub.disconnect(user.id, websocket)
 
 
 @router.get("/rules")
-def get_rules(db: Session = Depends(get_db), user: User = Depends(require_manager_or_admin)):
+def get_rules(db: Session = Depends(get_read_db), user: User = Depends(require_manager_or_admin)):
     keys = {
         "overdue_enabled": "notification_rule_overdue_enabled",
         "unassigned_enabled": "notification_rule_unassigned_enabled",
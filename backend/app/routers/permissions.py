@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from ..api_utils import fail, ok
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import require_admin
 from ..models import User
 from ..services.audit_service import add_audit_log
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/api/permissions", tags=["permissions"])
 
 
 @router.get("")
-def get_permissions(db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def get_permissions(db: Session = Depends(get_read_db), user: User = Depends(require_admin)):
     return ok({"permissions": get_role_permissions(db), "available": sorted({x for v in DEFAULT_ROLE_PERMISSIONS.values() for x in v})})
 
 
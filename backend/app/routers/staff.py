@@ -1,22 +1,39 @@
-from fastapi import APIRouter, Depends
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from ..api_utils import fail, ok
-from ..database import get_db
-from ..deps import get_current_user, require_admin
+from ..database import get_db, get_read_db
+from ..deps import get_current_user, require_admin, require_manager_or_admin
 from ..models import Staff, User
 from ..schemas import StaffCreate, StaffUpdate
 from ..services.audit_service import add_audit_log
+from ..services.staff_workload_service import staff_workload
 
 router = APIRouter(prefix="/api/staff", tags=["staff"])
 
 
 @router.get("")
-def list_staff(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_staff(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     rows = db.query(Staff).order_by(Staff.name.asc()).all()
     return ok([{"id": x.id, "name": x.name, "phone": x.phone, "active": x.active, "created_at": x.created_at.isoformat()} for x in rows])
 
 
+@router.get("/workload")
+def get_staff_workload(
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(require_manager_or_admin),
+):
+    end = to_date or date.today()
+    start = from_date or end - timedelta(days=29)
+    if start > end:
+        raise fail("BAD_REQUEST", "تاریخ شروع باید قبل از تاریخ پایان باشد", status_code=400)
+    return ok({"from": start.isoformat(), "to": end.isoformat(), "items": staff_workload(db, start, end)})
+
+
 @router.post("")
 def create_staff(payload: StaffCreate, db: Session = Depends(get_db), user: User = Depends(require_admin)):
     row = Staff(name=payload.name.strip(), phone=payload.phone, active=payload.active)
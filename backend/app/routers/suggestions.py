@@ -3,7 +3,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from ..api_utils import ok
-from ..database import get_db
+from ..database import get_read_db
 from ..deps import get_current_user
 from ..models import Activity, Staff, User
 
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/api/suggestions", tags=["suggestions"])
 def suggestions(
     field: str = Query(pattern="^(customer_name|address|staff)$"),
     q: str = "",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     like = f"%{q.strip()}%"
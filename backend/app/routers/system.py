@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
 
 from ..api_utils import fail, ok
+from ..config import settings
 from ..deps import require_admin
 from ..models import User
-from ..services.backup_service import apply_retention, create_backup, list_backups, restore_backup
+from ..services.backup_service import BackupNotSupportedError, apply_retention, create_backup, list_backups, restore_backup
+from ..services.profiling_service import get_profile, list_profiles
+from ..services.slow_query_service import clear_slow_queries, recent_slow_queries
 
 router = APIRouter(prefix="/api/system", tags=["system"])
 
@@ -15,7 +19,10 @@ def get_backups(user: User = Depends(require_admin)):
 
 @router.post("/backups")
 def create_backup_now(user: User = Depends(require_admin)):
-    path = create_backup()
+    try:
+        path = create_backup()
+    except BackupNotSupportedError as exc:
+        raise fail("NOT_SUPPORTED", "backup فقط برای پایگاه داده SQLite ممکن است", details=str(exc), status_code=400) from exc
     deleted = apply_retention()
     return ok({"created": path.name, "retention_deleted": deleted})
 
@@ -27,6 +34,38 @@ def restore_backup_now(payload: dict, user: User = Depends(require_admin)):
         raise fail("BAD_REQUEST", "نام فایل backup ضروری است", status_code=400)
     try:
         restore_backup(name)
+    except BackupNotSupportedError as exc:
+        raise fail("NOT_SUPPORTED", "backup فقط برای پایگاه داده SQLite ممکن است", details=str(exc), status_code=400) from exc
     except FileNotFoundError as exc:
         raise fail("NOT_FOUND", "backup پیدا نشد", status_code=404) from exc
     return ok({"restored": name})
+
+
+@router.get("/slow-queries")
+def get_slow_queries(user: User = Depends(require_admin)):
+    return ok({"threshold_ms": settings.slow_query_threshold_ms, "items": recent_slow_queries()})
+
+
+@router.delete("/slow-queries")
+def delete_slow_queries(user: User = Depends(require_admin)):
+    clear_slow_queries()
+    return ok({"cleared": True})
+
+
+@router.get("/profiles")
+def get_profiles(user: User = Depends(require_admin)):
+    return ok(list_profiles())
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile_detail(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    user: User = Depends(require_admin),
+):
+    profile = get_profile(profile_id)
+    if not profile:
+        raise fail("NOT_FOUND", "پروفایل پیدا نشد", status_code=404)
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(profile["collapsed"]) + "\n")
+    return ok(profile)
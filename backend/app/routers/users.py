@@ -3,23 +3,24 @@ from sqlalchemy.orm import Session
 
 from ..api_utils import fail, ok
 from ..auth import hash_password
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..deps import get_current_user, normalize_role, require_admin
 from ..models import User
 from ..schemas import UserCreate, UserUpdate
 from ..services.audit_service import add_audit_log
+from ..services.notification_service import latest_broadcast_id
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/options")
-def list_user_options(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_user_options(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     rows = db.query(User).order_by(User.username.asc()).all()
     return ok([{"id": x.id, "username": x.username} for x in rows])
 
 
 @router.get("")
-def list_users(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def list_users(db: Session = Depends(get_read_db), admin: User = Depends(require_admin)):
     rows = db.query(User).order_by(User.created_at.desc()).all()
     return ok(
         [
@@ -40,7 +41,13 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db), admin: User
     if db.query(User).filter(User.username == username).first():
         raise fail("DUPLICATE", "نام کاربری تکراری است", status_code=400)
 
-    row = User(username=username, password_hash=hash_password(payload.password), role=normalize_role(payload.role))
+    row = User(
+        username=username,
+        password_hash=hash_password(payload.password),
+        role=normalize_role(payload.role),
+        # Broadcasts sent before the account existed are never shown, so its unread count starts above them.
+        notifications_read_through=latest_broadcast_id(db),
+    )
     db.add(row)
     add_audit_log(db, user=admin, action="create", entity="user", entity_id="new", details={"username": username, "role": row.role})
     db.commit()
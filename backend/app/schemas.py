@@ -100,6 +100,26 @@ class ActivityCreate(ActivityBase):
     pass
 
 
+class ActivityBatchCreate(BaseModel):
+    items: list[ActivityCreate] = Field(min_length=1, max_length=500)
+
+
+class ActivityPriorityItem(BaseModel):
+    id: int
+    priority: int = Field(ge=0, le=1000)
+
+
+class ActivityReorderRequest(BaseModel):
+    ids: list[int] | None = Field(default=None, min_length=1, max_length=1000)
+    items: list[ActivityPriorityItem] | None = Field(default=None, min_length=1, max_length=1000)
+
+    def priorities(self) -> dict[int, int]:
+        if self.items:
+            return {x.id: x.priority for x in self.items}
+        ids = self.ids or []
+        return {act_id: len(ids) - 1 - idx for idx, act_id in enumerate(ids)}
+
+
 class ActivityUpdate(BaseModel):
     date: dt_date | None = None
     activity_type: str | None = Field(default=None, min_length=2, max_length=120)
@@ -145,6 +165,10 @@ class NotificationOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class NotificationReadRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=500)
+
+
 class MasterDataIn(BaseModel):
     category: str = Field(min_length=2, max_length=50)
     value: str = Field(min_length=1, max_length=120)
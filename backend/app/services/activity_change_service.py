@@ -0,0 +1,105 @@
+import threading
+from collections.abc import Iterable
+from uuid import uuid4
+
+from sqlalchemy import event, inspect, insert, update
+from sqlalchemy.orm import Session
+
+from ..models import Activity, ActivityAssignment, Staff, SystemSetting, User
+
+DATA_VERSION_KEY = "activity_data_version"
+_CHANGED_KEY = "activities_changed"
+_IDS_KEY = "changed_activity_ids"
+_TRACKED = (Activity, ActivityAssignment)
+# Columns copied into cached activity results (staff on assignments, usernames); editing them is a data change too.
+_DISPLAYED = {Staff: ("name", "phone", "active"), User: ("username",)}
+
+_dirty_lock = threading.Lock()
+_dirty_ids: set[int] = set()
+
+
+def mark_activities_changed(db: Session, activity_ids: Iterable[int] = ()) -> None:
+    """Flag the session so the data version moves forward on commit; ``activity_ids`` become dirty for the rules."""
+    db.info[_CHANGED_KEY] = True
+    db.info.setdefault(_IDS_KEY, set()).update(activity_ids)
+
+
+def _activity_id(obj) -> int | None:
+    if isinstance(obj, Activity):
+        return obj.id
+    return obj.activity_id if obj.activity_id is not None else getattr(obj.activity, "id", None)
+
+
+def _collect_from_flush(session: Session, flush_context) -> None:
+    # after_flush: ids are assigned, while new/dirty/deleted still describe what was flushed.
+    touched = [obj for obj in session.new if isinstance(obj, _TRACKED)]
+    touched += [obj for obj in session.deleted if isinstance(obj, _TRACKED)]
+    touched += [obj for obj in session.dirty if isinstance(obj, _TRACKED) and session.is_modified(obj)]
+    if touched:
+        mark_activities_changed(session, (x for x in map(_activity_id, touched) if x is not None))
+    if any(type(obj) in _DISPLAYED for obj in session.deleted) or any(_display_changed(obj) for obj in session.dirty):
+        mark_activities_changed(session)
+
+
+def _display_changed(obj) -> bool:
+    attrs = _DISPLAYED.get(type(obj), ())
+    return any(inspect(obj).attrs[name].history.has_changes() for name in attrs)
+
+
+def _collect_from_execute(orm_execute_state) -> None:
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _TRACKED:
+        mark_activities_changed(orm_execute_state.session)
+
+
+def _bump_before_commit(session: Session) -> None:
+    session.flush()
+    if not session.info.pop(_CHANGED_KEY, False):
+        return
+    token = uuid4().hex
+    result = session.execute(update(SystemSetting).where(SystemSetting.key == DATA_VERSION_KEY).values(value=token))
+    if not result.rowcount:
+        session.execute(insert(SystemSetting).values(key=DATA_VERSION_KEY, value=token))
+
+
+def _publish_after_commit(session: Session) -> None:
+    ids = session.info.pop(_IDS_KEY, None)
+    if ids:
+        with _dirty_lock:
+            _dirty_ids.update(ids)
+
+
+def _discard(session: Session, *args) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+    session.info.pop(_IDS_KEY, None)
+
+
+def install(session_factory) -> None:
+    """Track activity writes made through ``session_factory`` and publish a new data version on commit."""
+    if event.contains(session_factory, "before_commit", _bump_before_commit):
+        return
+    event.listen(session_factory, "after_flush", _collect_from_flush)
+    event.listen(session_factory, "do_orm_execute", _collect_from_execute)
+    event.listen(session_factory, "before_commit", _bump_before_commit)
+    event.listen(session_factory, "after_commit", _publish_after_commit)
+    event.listen(session_factory, "after_rollback", _discard)
+
+
+def data_version(db: Session) -> str:
+    row = db.query(SystemSetting.value).filter(SystemSetting.key == DATA_VERSION_KEY).first()
+    return row[0] if row else "0"
+
+
+def requeue_dirty_activity_ids(activity_ids: Iterable[int]) -> None:
+    with _dirty_lock:
+        _dirty_ids.update(activity_ids)
+
+
+def drain_dirty_activity_ids() -> set[int]:
+    """Ids of activities committed since the last call (this process only)."""
+    with _dirty_lock:
+        ids = set(_dirty_ids)
+        _dirty_ids.clear()
+    return ids
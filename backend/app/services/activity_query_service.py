@@ -0,0 +1,148 @@
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Any
+
+from sqlalchemy import and_, case, desc, or_
+from sqlalchemy.orm import Query, Session
+
+from ..api_utils import loads_json
+from ..models import Activity, ActivityAssignment, User
+from .search_service import normalize_sql_expr, normalize_text
+
+# Saved presets may carry the React filter names; map them onto the query parameters.
+FILTER_ALIASES = {
+    "dateFrom": "date_from",
+    "dateTo": "date_to",
+    "staffId": "staff_id",
+    "createdByUserId": "created_by_user_id",
+    "doneByUserId": "done_by_user_id",
+}
+
+
+@dataclass
+class ActivityFilters:
+    search: str | None = None
+    status: str | None = None
+    staff_id: int | None = None
+    customer: str | None = None
+    location: str | None = None
+    created_by_user_id: int | None = None
+    done_by_user_id: int | None = None
+    date_from: date | None = None
+    date_to: date | None = None
+
+    @classmethod
+    def from_mapping(cls, raw: dict[str, Any]) -> "ActivityFilters":
+        """Build filters from query-style values; raises ValueError on malformed dates or ids."""
+        values = {FILTER_ALIASES.get(k, k): v for k, v in raw.items()}
+        parsed: dict[str, Any] = {}
+        for item in fields(cls):
+            value = values.get(item.name)
+            if value is None or value == "":
+                continue
+            if item.name in {"date_from", "date_to"}:
+                value = value if isinstance(value, date) else date.fromisoformat(str(value))
+            elif item.name in {"staff_id", "created_by_user_id", "done_by_user_id"}:
+                value = int(value)
+            else:
+                value = str(value)
+            parsed[item.name] = value
+        return cls(**parsed)
+
+
+def apply_activity_filters(q: Query, filters: ActivityFilters) -> Query:
+    conditions = []
+    if filters.search:
+        query = filters.search.strip()
+        s = f"%{query}%"
+        normalized = normalize_text(query)
+        use_normalized = normalized != query.replace(" ", "").lower()
+
+        base_search = or_(
+            Activity.customer_name.ilike(s),
+            Activity.address.ilike(s),
+            Activity.location.ilike(s),
+            Activity.report_text.ilike(s),
+            Activity.activity_type.ilike(s),
+        )
+        if use_normalized and len(normalized) >= 2:
+            normalized_like = f"%{normalized}%"
+            normalized_search = or_(
+                normalize_sql_expr(Activity.customer_name).like(normalized_like),
+                normalize_sql_expr(Activity.address).like(normalized_like),
+                normalize_sql_expr(Activity.location).like(normalized_like),
+            )
+            conditions.append(or_(base_search, normalized_search))
+        else:
+            conditions.append(base_search)
+    if filters.status in {"pending", "done"}:
+        conditions.append(Activity.status == filters.status)
+    if filters.customer:
+        conditions.append(Activity.customer_name.ilike(f"%{filters.customer}%"))
+    if filters.location:
+        like = f"%{filters.location}%"
+        conditions.append(or_(Activity.address.ilike(like), Activity.location.ilike(like)))
+    if filters.created_by_user_id:
+        conditions.append(Activity.created_by_user_id == filters.created_by_user_id)
+    if filters.done_by_user_id:
+        conditions.append(Activity.done_by_user_id == filters.done_by_user_id)
+    if filters.date_from:
+        conditions.append(Activity.date >= filters.date_from)
+    if filters.date_to:
+        conditions.append(Activity.date <= filters.date_to)
+    if filters.staff_id:
+        q = q.join(ActivityAssignment, ActivityAssignment.activity_id == Activity.id)
+        conditions.append(and_(ActivityAssignment.staff_id == filters.staff_id, ActivityAssignment.is_current.is_(True)))
+    if conditions:
+        q = q.filter(*conditions)
+    return q
+
+
+ACTIVITY_LIST_ORDER = (case((Activity.status == "pending", 0), else_=1), desc(Activity.priority), desc(Activity.created_at))
+
+
+def activity_to_dict(a: Activity) -> dict:
+    current_assignments = [x for x in a.assignments if x.is_current]
+    return {
+        "id": a.id,
+        "created_at": a.created_at.isoformat(),
+        "updated_at": a.updated_at.isoformat() if a.updated_at else None,
+        "created_by_user_id": a.created_by_user_id,
+        "created_by_username": None,
+        "done_by_user_id": a.done_by_user_id,
+        "done_by_username": None,
+        "done_at": a.done_at.isoformat() if a.done_at else None,
+        "date": a.date.isoformat(),
+        "activity_type": a.activity_type,
+        "customer_name": a.customer_name,
+        "location": (a.address or a.location or "-"),
+        "address": (a.address or a.location or None),
+        "status": a.status,
+        "priority": a.priority,
+        "report_text": a.report_text,
+        "device_info": a.device_info,
+        "extra_fields": loads_json(a.extra_fields_json),
+        "assigned_staff": [
+            {"id": item.staff.id, "name": item.staff.name, "phone": item.staff.phone, "active": item.staff.active}
+            for item in current_assignments
+            if item.staff
+        ],
+    }
+
+
+def attach_usernames(items: list[dict], db: Session) -> list[dict]:
+    user_ids: set[int] = set()
+    for item in items:
+        if item.get("created_by_user_id"):
+            user_ids.add(int(item["created_by_user_id"]))
+        if item.get("done_by_user_id"):
+            user_ids.add(int(item["done_by_user_id"]))
+
+    if user_ids:
+        user_map = {u.id: u.username for u in db.query(User).filter(User.id.in_(list(user_ids))).all()}
+        for item in items:
+            created_id = item.get("created_by_user_id")
+            done_id = item.get("done_by_user_id")
+            item["created_by_username"] = user_map.get(created_id)
+            item["done_by_username"] = user_map.get(done_id)
+    return items
@@ -0,0 +1,272 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import Date, and_, case, delete, event, func, insert, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..models import Activity, ActivityAssignment, ActivityDailyStats
+
+_IDS_KEY = "activity_stats_ids"
+_NEW_KEY = "activity_stats_new"
+_BEFORE_KEY = "activity_stats_before"
+_TRACKED = ("date", "activity_type", "status", "done_at")
+_COUNTERS = ("created", "status_pending", "status_done", "done")
+_CHUNK = 500
+_UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Counters keyed by (day, activity_type, staff_id): [created, status_pending, status_done, done]
+Buckets = dict[tuple[date, str, int | None], list[int]]
+
+
+class week_start(FunctionElement):
+    """Monday on or before a date column, compiled per dialect."""
+
+    type = Date()
+    inherit_cache = True
+    name = "week_start"
+
+
+class month_start(FunctionElement):
+    """First day of the month of a date column, compiled per dialect."""
+
+    type = Date()
+    inherit_cache = True
+    name = "month_start"
+
+
+@compiles(week_start)
+def _compile_week_start(element, compiler, **kw):
+    (column,) = element.clauses
+    return compiler.process(func.date(column, "-6 days", "weekday 1"), **kw)
+
+
+@compiles(week_start, "postgresql")
+def _compile_week_start_pg(element, compiler, **kw):
+    (column,) = element.clauses
+    return f"CAST(date_trunc('week', {compiler.process(column, **kw)}) AS DATE)"
+
+
+@compiles(month_start)
+def _compile_month_start(element, compiler, **kw):
+    (column,) = element.clauses
+    return compiler.process(func.date(column, "start of month"), **kw)
+
+
+@compiles(month_start, "postgresql")
+def _compile_month_start_pg(element, compiler, **kw):
+    (column,) = element.clauses
+    return f"CAST(date_trunc('month', {compiler.process(column, **kw)}) AS DATE)"
+
+
+def bucket_start(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value + timedelta(days=7)
+    if granularity == "month":
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def _as_date(value) -> date | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _before(db: Session) -> Buckets:
+    return db.info.setdefault(_BEFORE_KEY, defaultdict(lambda: [0, 0, 0, 0]))
+
+
+def mark_activity_ids(db: Session, activity_ids: Iterable[int]) -> None:
+    """Snapshot the stored counters of activities about to change; call before bulk UPDATE/DELETE/INSERT statements.
+
+    The first snapshot in a transaction wins, so the commit applies ``after - before`` for every touched activity.
+    """
+    tracked = db.info.setdefault(_IDS_KEY, set())
+    fresh = set(activity_ids) - tracked
+    if not fresh:
+        return
+    tracked.update(fresh)
+    before = _before(db)
+    with db.no_autoflush:
+        for key, counts in _snapshot(db, fresh).items():
+            before[key] = [a + b for a, b in zip(before[key], counts)]
+
+
+def mark_activities(db: Session, activities: Iterable[Activity]) -> None:
+    ids: list[int] = []
+    for row in activities:
+        if row.id is None:
+            db.info.setdefault(_NEW_KEY, []).append(row)
+        else:
+            ids.append(row.id)
+    mark_activity_ids(db, ids)
+
+
+def _collect_from_flush(session: Session, flush_context, instances) -> None:
+    touched: list[Activity] = []
+    ids: set[int] = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Activity):
+            touched.append(obj)
+        elif isinstance(obj, ActivityAssignment):
+            _collect_assignment(obj, touched, ids)
+    for obj in session.dirty:
+        if isinstance(obj, Activity):
+            if any(attributes.get_history(obj, key).has_changes() for key in _TRACKED):
+                touched.append(obj)
+        elif isinstance(obj, ActivityAssignment) and session.is_modified(obj):
+            _collect_assignment(obj, touched, ids)
+            ids.update(x for x in attributes.get_history(obj, "activity_id").deleted or () if x is not None)
+    mark_activities(session, touched)
+    mark_activity_ids(session, ids)
+
+
+def _collect_assignment(obj: ActivityAssignment, touched: list[Activity], ids: set[int]) -> None:
+    if obj.activity_id is not None:
+        ids.add(obj.activity_id)
+    elif obj.activity is not None:
+        touched.append(obj.activity)
+
+
+def _track_inserted(session: Session, flush_context) -> None:
+    """New activities start from nothing; track their ids as soon as they exist so no later snapshot counts them."""
+    pending = session.info.get(_NEW_KEY)
+    if pending:
+        session.info.setdefault(_IDS_KEY, set()).update(x.id for x in pending if x.id is not None)
+        pending[:] = [x for x in pending if x.id is None]
+
+
+def _apply_before_commit(session: Session) -> None:
+    session.flush()
+    ids = session.info.pop(_IDS_KEY, None) or set()
+    session.info.pop(_NEW_KEY, None)
+    before = session.info.pop(_BEFORE_KEY, None) or {}
+    if not ids:
+        return
+    deltas = _snapshot(session, ids)
+    for key, counts in before.items():
+        deltas[key] = [a - b for a, b in zip(deltas[key], counts)]
+    _apply_deltas(session, {key: counts for key, counts in deltas.items() if any(counts)})
+
+
+def _discard(session: Session, *args) -> None:
+    session.info.pop(_IDS_KEY, None)
+    session.info.pop(_NEW_KEY, None)
+    session.info.pop(_BEFORE_KEY, None)
+
+
+def install(session_factory) -> None:
+    """Keep activity_daily_stats in step with every commit made through ``session_factory``.
+
+    The upserts and the week/month buckets are written for SQLite and PostgreSQL only; anything else is refused
+    here rather than failing inside every activity commit.
+    """
+    dialect = session_factory.kw["bind"].dialect.name
+    if dialect not in _UPSERTS:
+        raise RuntimeError(f"activity_daily_stats supports SQLite and PostgreSQL only, not {dialect!r}")
+    if event.contains(session_factory, "before_commit", _apply_before_commit):
+        return
+    event.listen(session_factory, "before_flush", _collect_from_flush)
+    event.listen(session_factory, "after_flush", _track_inserted)
+    event.listen(session_factory, "before_commit", _apply_before_commit)
+    event.listen(session_factory, "after_rollback", _discard)
+
+
+def _aggregate(db: Session, activity_ids: list[int] | None = None) -> Buckets:
+    buckets: Buckets = defaultdict(lambda: [0, 0, 0, 0])
+
+    created_q = db.query(
+        Activity.date,
+        Activity.activity_type,
+        func.count(Activity.id),
+        func.sum(case((Activity.status == "pending", 1), else_=0)),
+        func.sum(case((Activity.status == "done", 1), else_=0)),
+    )
+    staff_q = db.query(Activity.date, Activity.activity_type, ActivityAssignment.staff_id, func.count(ActivityAssignment.id)).join(
+        ActivityAssignment, and_(ActivityAssignment.activity_id == Activity.id, ActivityAssignment.is_current.is_(True))
+    )
+    done_day = func.date(Activity.done_at)
+    done_q = db.query(done_day, Activity.activity_type, func.count(Activity.id)).filter(Activity.done_at.is_not(None))
+    if activity_ids is not None:
+        created_q = created_q.filter(Activity.id.in_(activity_ids))
+        staff_q = staff_q.filter(Activity.id.in_(activity_ids))
+        done_q = done_q.filter(Activity.id.in_(activity_ids))
+
+    for day, activity_type, created, pending, done in created_q.group_by(Activity.date, Activity.activity_type):
+        bucket = buckets[(_as_date(day), activity_type, None)]
+        bucket[0] += int(created)
+        bucket[1] += int(pending or 0)
+        bucket[2] += int(done or 0)
+    for day, activity_type, staff_id, count in staff_q.group_by(Activity.date, Activity.activity_type, ActivityAssignment.staff_id):
+        buckets[(_as_date(day), activity_type, staff_id)][0] += int(count)
+    for day, activity_type, count in done_q.group_by(done_day, Activity.activity_type):
+        buckets[(_as_date(day), activity_type, None)][3] += int(count)
+    return buckets
+
+
+def _snapshot(db: Session, activity_ids: Iterable[int]) -> Buckets:
+    """What the given activities currently contribute to the counters, read by primary key rather than by day."""
+    ids = sorted(activity_ids)
+    buckets: Buckets = defaultdict(lambda: [0, 0, 0, 0])
+    for offset in range(0, len(ids), _CHUNK):
+        for key, counts in _aggregate(db, ids[offset:offset + _CHUNK]).items():
+            buckets[key] = [a + b for a, b in zip(buckets[key], counts)]
+    return buckets
+
+
+def _rows(buckets: Buckets) -> list[dict]:
+    return [
+        {
+            "day": day,
+            "activity_type": activity_type,
+            "staff_id": staff_id,
+            "created": created,
+            "status_pending": pending,
+            "status_done": done_status,
+            "done": done,
+        }
+        for (day, activity_type, staff_id), (created, pending, done_status, done) in buckets.items()
+    ]
+
+
+def _apply_deltas(db: Session, deltas: Buckets) -> None:
+    """Add ``deltas`` to the stored counters in place: INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n."""
+    if not deltas:
+        return
+    table = ActivityDailyStats.__table__
+    stmt = _UPSERTS[db.get_bind().dialect.name](table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.activity_type, func.coalesce(table.c.staff_id, literal_column("0"))],
+        set_={name: table.c[name] + stmt.excluded[name] for name in _COUNTERS},
+    )
+    db.execute(stmt, _rows(deltas))
+
+
+def rebuild_daily_stats(db: Session) -> int:
+    """Backfill/repair: recompute every counter from the activity tables."""
+    db.execute(delete(ActivityDailyStats))
+    buckets = _aggregate(db)
+    if buckets:
+        db.execute(insert(ActivityDailyStats), _rows(buckets))
+    db.commit()
+    return len(buckets)
+
+
+def stats_table_empty(db: Session) -> bool:
+    return db.query(ActivityDailyStats.id).first() is None
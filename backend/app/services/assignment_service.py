@@ -0,0 +1,95 @@
+from collections.abc import Iterable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models import Activity, ActivityAssignment, Staff
+from .activity_change_service import mark_activities_changed
+from .activity_stats_service import mark_activity_ids
+
+
+def valid_staff_ids(db: Session, staff_ids: Iterable[int], *, include_inactive: bool = False) -> set[int]:
+    requested = set(staff_ids)
+    if not requested:
+        return set()
+    q = db.query(Staff.id).filter(Staff.id.in_(requested))
+    if not include_inactive:
+        q = q.filter(Staff.active.is_(True))
+    return {x[0] for x in q.all()}
+
+
+def replace_assignments(
+    db: Session,
+    targets: dict[int, list[int]],
+    by_user_id: int,
+    *,
+    include_inactive: bool = False,
+) -> dict[int, list[int]]:
+    """Make ``targets[activity_id]`` the current staff set of each activity.
+
+    Staff ids are validated with one query, activities whose current set is
+    already correct are left untouched, retired rows are closed with one
+    UPDATE and new rows are written with one executemany INSERT. Returns the
+    staff ids actually applied per activity.
+    """
+    if not targets:
+        return {}
+    valid = valid_staff_ids(db, (sid for ids in targets.values() for sid in ids), include_inactive=include_inactive)
+
+    current: dict[int, dict[int, int]] = {}
+    retire_ids: list[int] = []
+    changed: set[int] = set()
+    rows = (
+        db.query(ActivityAssignment.id, ActivityAssignment.activity_id, ActivityAssignment.staff_id)
+        .filter(ActivityAssignment.activity_id.in_(list(targets)), ActivityAssignment.is_current.is_(True))
+        .all()
+    )
+    for assignment_id, activity_id, staff_id in rows:
+        by_staff = current.setdefault(activity_id, {})
+        if staff_id in by_staff:
+            retire_ids.append(assignment_id)
+            changed.add(activity_id)
+        else:
+            by_staff[staff_id] = assignment_id
+
+    applied: dict[int, list[int]] = {}
+    inserts: list[dict] = []
+    for activity_id, staff_ids in targets.items():
+        wanted = [sid for sid in dict.fromkeys(staff_ids) if sid in valid]
+        applied[activity_id] = wanted
+        existing = current.get(activity_id, {})
+        removed = [assignment_id for sid, assignment_id in existing.items() if sid not in wanted]
+        added = [sid for sid in wanted if sid not in existing]
+        if not removed and not added:
+            continue
+        changed.add(activity_id)
+        retire_ids.extend(removed)
+        inserts.extend(
+            {"activity_id": activity_id, "staff_id": sid, "assigned_by_user_id": by_user_id, "is_current": True}
+            for sid in added
+        )
+
+    # Snapshot the counters before the bulk statements below; they bypass the ORM flush hooks.
+    mark_activity_ids(db, changed)
+    if retire_ids:
+        db.query(ActivityAssignment).filter(ActivityAssignment.id.in_(retire_ids)).update({"is_current": False})
+    if inserts:
+        db.execute(insert(ActivityAssignment), inserts)
+    mark_activities_changed(db, changed)
+    for activity_id in changed:
+        activity = db.identity_map.get(identity_key(Activity, activity_id))
+        if activity is not None:
+            db.expire(activity, ["assignments"])
+    return applied
+
+
+def set_assignments(
+    db: Session,
+    activity: Activity,
+    staff_ids: list[int],
+    by_user_id: int,
+    *,
+    include_inactive: bool = False,
+) -> list[int]:
+    return replace_assignments(db, {activity.id: staff_ids}, by_user_id, include_inactive=include_inactive)[activity.id]
@@ -1,6 +1,7 @@
 import json
 from typing import Any
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from ..models import AuditLog, User
@@ -23,3 +24,28 @@ def add_audit_log(
         detail_json=json.dumps(details or {}, ensure_ascii=False),
     )
     db.add(record)
+
+
+def add_audit_logs(
+    db: Session,
+    *,
+    user: User | None,
+    action: str,
+    entity: str,
+    entries: list[tuple[str, dict[str, Any] | None]],
+) -> None:
+    if not entries:
+        return
+    db.execute(
+        insert(AuditLog),
+        [
+            {
+                "user_id": user.id if user else None,
+                "action": action,
+                "entity": entity,
+                "entity_id": entity_id,
+                "detail_json": json.dumps(details or {}, ensure_ascii=False),
+            }
+            for entity_id, details in entries
+        ],
+    )
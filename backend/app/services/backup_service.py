@@ -1,11 +1,16 @@
 import asyncio
-import shutil
+import sqlite3
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from sqlalchemy.engine import make_url
+
 from ..config import settings
+from . import metrics_service
 from .monitoring_service import log_event, log_exception
+from .offload_service import run_blocking
 
 
 @dataclass
@@ -15,9 +20,35 @@ class BackupItem:
     created_at: str
 
 
+class BackupNotSupportedError(RuntimeError):
+    pass
+
+
+def backups_supported() -> bool:
+    url = make_url(settings.database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
 def _db_path() -> Path:
-    raw = settings.database_url.replace("sqlite:///", "").strip()
-    return Path(raw)
+    if not backups_supported():
+        raise BackupNotSupportedError(
+            f"file backups are only available for SQLite databases, not {make_url(settings.database_url).get_backend_name()}"
+        )
+    return Path(make_url(settings.database_url).database)
+
+
+def _sqlite_copy(src: Path, dst: Path) -> None:
+    # The online backup API copies a consistent snapshot that includes pages
+    # still in the WAL file, which a plain file copy would miss.
+    source = sqlite3.connect(str(src))
+    try:
+        target = sqlite3.connect(str(dst))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
 
 
 def ensure_backup_dir() -> Path:
@@ -32,7 +63,8 @@ def create_backup() -> Path:
     dst_dir = ensure_backup_dir()
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     dst = dst_dir / f"tt_altyn_aay_{ts}.db"
-    shutil.copy2(src, dst)
+    _sqlite_copy(src, dst)
+    metrics_service.backup_size_bytes.set(dst.stat().st_size)
     return dst
 
 
@@ -74,17 +106,22 @@ def restore_backup(file_name: str) -> None:
     target = ensure_backup_dir() / file_name
     if not target.exists():
         raise FileNotFoundError("backup file not found")
-    shutil.copy2(target, _db_path())
+    _sqlite_copy(target, _db_path())
 
 
 async def run_backup_scheduler() -> None:
+    if not backups_supported():
+        log_event("backup_scheduler_disabled", reason="database is not a SQLite file; use the server's own backup tooling")
+        return
     while True:
+        started = time.perf_counter()
         try:
-            path = create_backup()
-            deleted = apply_retention()
+            path = await run_blocking(create_backup)
+            deleted = await run_blocking(apply_retention)
             log_event("backup_tick", backup_file=path.name, retention_deleted=deleted)
         except asyncio.CancelledError:
             raise
         except Exception as exc:
             log_exception("backup_tick_failed", exc)
+        metrics_service.scheduler_tick_duration.observe(time.perf_counter() - started, job="backup")
         await asyncio.sleep(max(settings.backup_interval_seconds, 300))
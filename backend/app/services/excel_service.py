@@ -1,12 +1,15 @@
 ﻿import json
+import threading
+import time
 from pathlib import Path
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from ..config import settings
-from ..models import Activity
+from ..models import Activity, ActivityAssignment
+from . import metrics_service
 
 HEADERS = [
     "ID",
@@ -23,6 +26,9 @@ HEADERS = [
     "تکمیل شده",
 ]
 
+# Writers run on the worker pool; one load-modify-save at a time or concurrent saves drop rows or truncate the file.
+_lock = threading.Lock()
+
 
 def _get_sheet(path: Path) -> tuple[Workbook, Worksheet]:
     if path.exists():
@@ -39,7 +45,8 @@ def _get_sheet(path: Path) -> tuple[Workbook, Worksheet]:
 
 
 def ensure_excel_exists() -> None:
-    _get_sheet(settings.excel_file)[0].save(settings.excel_file)
+    with _lock:
+        _get_sheet(settings.excel_file)[0].save(settings.excel_file)
 
 
 def _activity_row(activity: Activity) -> list[str]:
@@ -61,21 +68,38 @@ def _activity_row(activity: Activity) -> list[str]:
 
 
 def sync_activity(db: Session, activity_id: int) -> None:
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
-    if not activity:
+    sync_activities(db, [activity_id])
+
+
+def sync_activities(db: Session, activity_ids: list[int]) -> None:
+    if not activity_ids:
         return
-    _ = json.loads(activity.extra_fields_json or "{}")
+    activities = (
+        db.query(Activity)
+        .options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff))
+        .filter(Activity.id.in_(set(activity_ids)))
+        .all()
+    )
+    if not activities:
+        return
+    rows = []
+    for activity in activities:
+        _ = json.loads(activity.extra_fields_json or "{}")
+        rows.append(_activity_row(activity))
     path = settings.excel_file
-    wb, ws = _get_sheet(path)
-    target_row = None
-    for row in range(2, ws.max_row + 1):
-        if str(ws.cell(row=row, column=1).value) == str(activity.id):
-            target_row = row
-            break
-    values = _activity_row(activity)
-    if target_row is None:
-        ws.append(values)
-    else:
-        for col, value in enumerate(values, start=1):
-            ws.cell(row=target_row, column=col, value=value)
-    wb.save(path)
+    with _lock:
+        wb, ws = _get_sheet(path)
+        row_index: dict[str, int] = {}
+        for row in range(2, ws.max_row + 1):
+            row_index.setdefault(str(ws.cell(row=row, column=1).value), row)
+        for values in rows:
+            target_row = row_index.get(values[0])
+            if target_row is None:
+                ws.append(values)
+                row_index[values[0]] = ws.max_row
+            else:
+                for col, value in enumerate(values, start=1):
+                    ws.cell(row=target_row, column=col, value=value)
+        started = time.perf_counter()
+        wb.save(path)
+        metrics_service.excel_save_duration.observe(time.perf_counter() - started)
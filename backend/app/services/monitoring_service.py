@@ -21,6 +21,11 @@ def log_event(event: str, **fields: Any) -> None:
     logger.info(json.dumps(payload, ensure_ascii=False, default=str))
 
 
+def log_warning(event: str, **fields: Any) -> None:
+    payload = {"event": event, "ts": time.time(), **fields}
+    logger.warning(json.dumps(payload, ensure_ascii=False, default=str))
+
+
 def log_exception(event: str, exc: Exception, **fields: Any) -> None:
     payload = {"event": event, "error": str(exc), **fields}
     logger.exception(json.dumps(payload, ensure_ascii=False, default=str))
@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from .monitoring_service import log_exception
+from .offload_service import run_blocking
+
+# Called with the raw body of every message on the channel, including this worker's own.
+Deliver = Callable[[str], Awaitable[None]]
+
+
+class InProcessBroker:
+    """Single-worker default: there are no other processes to reach."""
+
+    async def start(self, deliver: Deliver) -> None:
+        pass
+
+    async def publish(self, body: str) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class SQLiteBroker:
+    """Workers on one host share a small SQLite log table; each polls for rows newer than the last it saw."""
+
+    def __init__(self, path: str, poll_seconds: float = 0.2, retention_seconds: float = 60.0) -> None:
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.last_id = 0
+        self._task: asyncio.Task | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextlib.contextmanager
+    def _session(self):
+        """A connection for one call, committed on success and always closed (``with conn`` alone never closes it)."""
+        with contextlib.closing(self._connect()) as conn, conn:
+            yield conn
+
+    def _setup(self) -> int:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._session() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS broker_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM broker_messages").fetchone()[0]
+
+    def _insert(self, body: str) -> None:
+        with self._session() as conn:
+            conn.execute("INSERT INTO broker_messages (body, created_at) VALUES (?, ?)", (body, time.time()))
+            conn.execute("DELETE FROM broker_messages WHERE created_at < ?", (time.time() - self.retention_seconds,))
+
+    def _read_after(self, last_id: int) -> list[tuple[int, str]]:
+        with self._session() as conn:
+            return conn.execute("SELECT id, body FROM broker_messages WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+
+    async def start(self, deliver: Deliver) -> None:
+        self.last_id = await run_blocking(self._setup)
+        self._task = asyncio.create_task(self._poll(deliver))
+
+    async def _poll(self, deliver: Deliver) -> None:
+        while True:
+            try:
+                for row_id, body in await run_blocking(self._read_after, self.last_id):
+                    self.last_id = row_id
+                    await deliver(body)
+            except Exception as exc:
+                log_exception("notification_broker_poll_failed", exc, backend="sqlite")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def publish(self, body: str) -> None:
+        await run_blocking(self._insert, body)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def encode_command(*args: str) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RuntimeError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2].decode("utf-8")
+    if kind == b"*":
+        size = int(rest)
+        return None if size < 0 else [await read_reply(reader) for _ in range(size)]
+    raise RuntimeError(f"unexpected reply {line!r}")
+
+
+class RedisBroker:
+    """Redis PUBLISH/SUBSCRIBE over a minimal RESP client; any server speaking the protocol will do."""
+
+    def __init__(self, url: str, channel: str, reconnect_seconds: float = 1.0, start_timeout: float = 5.0) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.start_timeout = start_timeout
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._publish_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def start(self, deliver: Deliver) -> None:
+        subscribed = asyncio.Event()
+        self._task = asyncio.create_task(self._subscribe(deliver, subscribed))
+        try:
+            await asyncio.wait_for(subscribed.wait(), timeout=self.start_timeout)
+        except asyncio.TimeoutError:
+            # Don't leave the reconnect loop running behind a failed startup.
+            await self.stop()
+            raise ConnectionError(
+                f"notification broker: no SUBSCRIBE reply from redis at {self.host}:{self.port} "
+                f"within {self.start_timeout:g}s"
+            ) from None
+
+    async def _subscribe(self, deliver: Deliver, subscribed: asyncio.Event) -> None:
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(encode_command("SUBSCRIBE", self.channel))
+                await writer.drain()
+                await read_reply(reader)
+                subscribed.set()
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == "message":
+                        await deliver(reply[2])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                log_exception("notification_broker_subscribe_failed", exc, backend="redis")
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def publish(self, body: str) -> None:
+        async with self._publish_lock:
+            try:
+                if self._writer is None:
+                    self._reader, self._writer = await self._open()
+                self._writer.write(encode_command("PUBLISH", self.channel, body))
+                await self._writer.drain()
+                await read_reply(self._reader)
+            except Exception:
+                if self._writer is not None:
+                    self._writer.close()
+                self._reader = self._writer = None
+                raise
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+def create_broker(url: str, channel: str, poll_seconds: float = 0.2):
+    """``memory://`` (default), ``sqlite:///path/to/broker.db`` or ``redis://[:password@]host:port``."""
+    scheme = url.split("://", 1)[0].lower()
+    if scheme in ("", "memory"):
+        return InProcessBroker()
+    if scheme == "sqlite":
+        return SQLiteBroker(url[len("sqlite:///"):], poll_seconds)
+    if scheme == "redis":
+        return RedisBroker(url, channel)
+    raise ValueError(f"unsupported notification broker: {url}")
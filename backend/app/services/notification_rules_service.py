@@ -1,13 +1,20 @@
 import asyncio
+from collections.abc import Collection
 from datetime import date, datetime, time, timedelta
+from time import perf_counter
 
+from sqlalchemy import Row, and_, exists, func, literal, select, true, union_all
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..deps import normalize_role
 from ..models import Activity, ActivityAssignment, Notification, SystemSetting, User
+from . import metrics_service
+from .activity_change_service import drain_dirty_activity_ids, requeue_dirty_activity_ids
 from .monitoring_service import log_event, log_exception
-from .notification_service import notification_hub
+from .notification_service import notification_hub, notification_payload
+from .offload_service import run_blocking
 
 
 def _to_int(value: str | None, default: int) -> int:
@@ -17,27 +24,53 @@ def _to_int(value: str | None, default: int) -> int:
         return default
 
 
+def overdue_limit(db: Session, today: date) -> date:
+    """Pending activities dated before this day count as overdue."""
+    row = db.query(SystemSetting.value).filter(SystemSetting.key == "notification_overdue_days").first()
+    overdue_days = _to_int(row[0] if row else None, settings.notification_overdue_days)
+    return today - timedelta(days=max(overdue_days, 0))
+
+
 def _rule_recipients(db: Session) -> list[User]:
     rows = db.query(User).all()
     preferred = [x for x in rows if normalize_role(x.role) in {"admin", "manager"}]
     return preferred or [x for x in rows if normalize_role(x.role) == "admin"]
 
 
-def _exists_today(db: Session, user_id: int, activity_id: int, note_type: str, today_start: datetime) -> bool:
-    count = (
-        db.query(Notification.id)
-        .filter(
-            Notification.user_id == user_id,
-            Notification.activity_id == activity_id,
-            Notification.type == note_type,
-            Notification.created_at >= today_start,
-        )
-        .count()
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+RULE_TEXTS = {
+    "rule_overdue": "فعالیت #{id} معطل است",
+    "rule_unassigned": "فعالیت #{id} کارمند تعیین نشده دارد",
+    "rule_high_priority": "فعالیت #{id} اولویت بالا دارد",
+}
+
+
+def _rule_candidates(note_type: str, condition, recipient_ids: list[int], today_start: datetime):
+    """(user_id, activity_id, type) for pending activities matching ``condition`` not yet notified today."""
+    already_sent = exists().where(
+        Notification.activity_id == Activity.id,
+        Notification.type == note_type,
+        Notification.created_at >= today_start,
+        Notification.user_id == User.id,
+    )
+    return (
+        select(User.id, Activity.id, literal(note_type))
+        .select_from(Activity)
+        .join(User, true())
+        .where(Activity.status == "pending", condition, User.id.in_(recipient_ids), ~already_sent)
     )
-    return count > 0
 
 
-async def run_notification_rules(db: Session, push_live: bool = True) -> dict[str, int]:
+def evaluate_notification_rules(
+    db: Session, activity_ids: Collection[int] | None = None, only_rules: Collection[str] | None = None
+) -> list[Row]:
+    """Create today's rule notifications and return the inserted rows.
+
+    ``activity_ids``/``only_rules`` narrow the pass (None means all).
+    """
+    if activity_ids is not None and not activity_ids:
+        return []
     raw_settings = {
         row.key: row.value
         for row in db.query(SystemSetting)
@@ -48,7 +81,6 @@ async def run_notification_rules(db: Session, push_live: bool = True) -> dict[st
                     "notification_rule_unassigned_enabled",
                     "notification_rule_high_priority_enabled",
                     "notification_high_priority_threshold",
-                    "notification_overdue_days",
                 ]
             )
         )
@@ -57,74 +89,134 @@ async def run_notification_rules(db: Session, push_live: bool = True) -> dict[st
     overdue_enabled = raw_settings.get("notification_rule_overdue_enabled", "true").lower() == "true"
     unassigned_enabled = raw_settings.get("notification_rule_unassigned_enabled", "true").lower() == "true"
     high_priority_enabled = raw_settings.get("notification_rule_high_priority_enabled", "true").lower() == "true"
-    overdue_days = _to_int(raw_settings.get("notification_overdue_days"), settings.notification_overdue_days)
     high_priority_threshold = _to_int(
         raw_settings.get("notification_high_priority_threshold"), settings.notification_high_priority_threshold
     )
 
     today = date.today()
-    today_start = datetime.combine(today, time.min)
-    overdue_limit = today - timedelta(days=max(overdue_days, 0))
+    # created_at is stored in UTC and uq_notifications_rule_daily keys on its date, so "already sent today" does too.
+    today_start = datetime.combine(datetime.utcnow().date(), time.min)
+    overdue_before = overdue_limit(db, today)
     priority_limit = max(high_priority_threshold, 0)
 
     recipients = _rule_recipients(db)
     if not recipients:
-        return {"created": 0}
-
-    pending = db.query(Activity).filter(Activity.status == "pending").all()
-    created_items: list[tuple[int, int, str, str]] = []
-
-    for activity in pending:
-        has_assignment = (
-            db.query(ActivityAssignment.id)
-            .filter(ActivityAssignment.activity_id == activity.id, ActivityAssignment.is_current.is_(True))
-            .first()
-            is not None
+        return []
+
+    has_assignment = exists().where(ActivityAssignment.activity_id == Activity.id, ActivityAssignment.is_current.is_(True))
+    rules = [
+        ("rule_overdue", overdue_enabled, Activity.date < overdue_before),
+        ("rule_unassigned", unassigned_enabled, ~has_assignment),
+        ("rule_high_priority", high_priority_enabled, Activity.priority >= priority_limit),
+    ]
+    if only_rules is not None:
+        rules = [x for x in rules if x[0] in only_rules]
+    recipient_ids = [x.id for x in recipients]
+    selects = [
+        _rule_candidates(
+            note_type,
+            condition if activity_ids is None else and_(condition, Activity.id.in_(list(activity_ids))),
+            recipient_ids,
+            today_start,
         )
-        checks: list[tuple[str, bool, str]] = [
-            ("rule_overdue", overdue_enabled and activity.date < overdue_limit, f"فعالیت #{activity.id} معطل است"),
-            ("rule_unassigned", unassigned_enabled and not has_assignment, f"فعالیت #{activity.id} کارمند تعیین نشده دارد"),
-            (
-                "rule_high_priority",
-                high_priority_enabled and activity.priority >= priority_limit,
-                f"فعالیت #{activity.id} اولویت بالا دارد",
-            ),
-        ]
-
-        for note_type, is_match, text in checks:
-            if not is_match:
-                continue
-            for recipient in recipients:
-                if _exists_today(db, recipient.id, activity.id, note_type, today_start):
-                    continue
-                db.add(Notification(user_id=recipient.id, activity_id=activity.id, type=note_type, text=text))
-                created_items.append((recipient.id, activity.id, note_type, text))
-
+        for note_type, enabled, condition in rules
+        if enabled
+    ]
+    if not selects:
+        return []
+
+    created_items = [
+        (user_id, activity_id, note_type, RULE_TEXTS[note_type].format(id=activity_id))
+        for user_id, activity_id, note_type in db.execute(union_all(*selects)).all()
+    ]
     if not created_items:
-        return {"created": 0}
-
+        return []
+    # Another worker's scheduler may have sent the same rule since the anti-join ran; the unique index settles it.
+    rows = db.execute(
+        _INSERTS[db.get_bind().dialect.name](Notification).on_conflict_do_nothing().returning(
+            Notification.id,
+            Notification.user_id,
+            Notification.activity_id,
+            Notification.type,
+            Notification.text,
+            Notification.created_at,
+        ),
+        [
+            {"user_id": user_id, "activity_id": activity_id, "type": note_type, "text": text}
+            for user_id, activity_id, note_type, text in created_items
+        ],
+    ).all()
     db.commit()
+    return rows
+
 
+async def run_notification_rules(
+    db: Session,
+    push_live: bool = True,
+    activity_ids: Collection[int] | None = None,
+    only_rules: Collection[str] | None = None,
+) -> dict[str, int]:
+    created_items = await run_blocking(evaluate_notification_rules, db, activity_ids, only_rules)
     if push_live:
-        for user_id, activity_id, note_type, text in created_items:
-            await notification_hub.push(
-                user_id,
-                {
-                    "type": note_type,
-                    "text": text,
-                    "activity_id": activity_id,
-                    "created_at": datetime.utcnow().isoformat(),
-                },
-            )
+        for x in created_items:
+            await notification_hub.push(x.user_id, notification_payload(x.id, x.type, x.text, x.activity_id, x.created_at))
 
     return {"created": len(created_items)}
 
 
+def _pending_count(db: Session) -> int:
+    return db.query(func.count(Activity.id)).filter(Activity.status == "pending").scalar() or 0
+
+
+class RuleTicker:
+    """Scheduler state: a full pass at start-up, then dirty ids only, plus one overdue pass per day."""
+
+    def __init__(self) -> None:
+        self.last_full_day: date | None = None
+        self.last_utc_day: date | None = None
+
+    async def tick(self, db: Session) -> dict:
+        started = perf_counter()
+        today = date.today()
+        utc_day = datetime.utcnow().date()
+        dirty = drain_dirty_activity_ids()
+        try:
+            if self.last_full_day is None:
+                mode = "full"
+                evaluated = await run_blocking(_pending_count, db)
+                created = (await run_notification_rules(db))["created"]
+            else:
+                mode = "incremental"
+                evaluated = len(dirty)
+                created = (await run_notification_rules(db, activity_ids=dirty))["created"] if dirty else 0
+                if self.last_full_day != today or self.last_utc_day != utc_day:
+                    # Nothing is written when a pending activity crosses the overdue threshold, so sweep once a day;
+                    # reminders repeat per UTC day (see evaluate_notification_rules), so that boundary sweeps too.
+                    mode = "incremental+rollover"
+                    evaluated += await run_blocking(_pending_count, db)
+                    created += (await run_notification_rules(db, only_rules={"rule_overdue"}))["created"]
+        except BaseException:
+            requeue_dirty_activity_ids(dirty)
+            raise
+        self.last_full_day = today
+        self.last_utc_day = utc_day
+        metrics_service.notification_rules_evaluated.inc(evaluated, mode=mode)
+        metrics_service.notification_rules_created.inc(created, mode=mode)
+        return {
+            "mode": mode,
+            "evaluated": evaluated,
+            "created": created,
+            "duration_ms": round((perf_counter() - started) * 1000, 2),
+        }
+
+
 async def run_rule_scheduler(session_factory) -> None:
+    ticker = RuleTicker()
     while True:
+        started = perf_counter()
         db = session_factory()
         try:
-            summary = await run_notification_rules(db, push_live=True)
+            summary = await ticker.tick(db)
             log_event("notification_rules_tick", **summary)
         except asyncio.CancelledError:
             db.close()
@@ -133,4 +225,5 @@ async def run_rule_scheduler(session_factory) -> None:
             log_exception("notification_rules_tick_failed", exc)
         finally:
             db.close()
+        metrics_service.scheduler_tick_duration.observe(perf_counter() - started, job="notification_rules")
         await asyncio.sleep(max(settings.notification_rules_interval_seconds, 60))
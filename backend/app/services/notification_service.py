@@ -1,40 +1,456 @@
 import asyncio
+import bisect
+import hashlib
 import json
 from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Any
+from uuid import uuid4
 
 from fastapi import WebSocket
+from sqlalchemy import DateTime, and_, case, exists, func, insert, literal, null, or_, select, tuple_, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models import Notification, NotificationRead, User
+from . import metrics_service
+from .monitoring_service import log_exception
+from .notification_broker_service import InProcessBroker
+
+
+class _Connection:
+    def __init__(self, user_id: int, websocket: WebSocket, queue_size: int) -> None:
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(queue_size, 1))
+        self.sender: asyncio.Task | None = None
+
+
+def _event_id(entry: tuple[int, int | None, str]) -> int:
+    return entry[0]
 
 
 class NotificationHub:
+    """Each connection gets a bounded outbound queue drained by its own sender task.
+
+    ``push``/``broadcast`` only serialize and enqueue, so a slow client never delays other clients or the
+    request that produced the event; a client whose queue overflows or whose send stalls is disconnected.
+    Events are delivered to this worker's sockets directly and handed to the broker for the other workers,
+    which deliver them to theirs. Every event carries its notification id, and the most recent ones are kept
+    in a ring buffer so a reconnecting client can ask for everything after the last id it saw.
+    """
+
     def __init__(self) -> None:
-        self.connections: dict[int, set[WebSocket]] = defaultdict(set)
-        self.lock = asyncio.Lock()
+        self.connections: dict[int, dict[WebSocket, _Connection]] = defaultdict(dict)
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        self._closing: set[asyncio.Task] = set()
+        self.origin = uuid4().hex
+        self.broker = InProcessBroker()
+        self._outbox: asyncio.Queue[str] | None = None
+        self._publisher: asyncio.Task | None = None
+        # Kept sorted by id: events relayed by the broker from other workers can arrive out of order.
+        self.recent: list[tuple[int, int | None, str]] = []
+        self.replay_size = max(settings.ws_replay_buffer_size, 1)
+        # Every event with an id above this that reached the hub is in ``recent``; None until the first event is seen.
+        self.replay_floor: int | None = None
+
+    async def start(self, broker) -> None:
+        if isinstance(broker, InProcessBroker):
+            self.broker = broker
+            return
+        await broker.start(self._on_message)
+        self.broker = broker
+        self._outbox = asyncio.Queue()
+        self._publisher = asyncio.create_task(self._publish_outbox())
+
+    async def stop(self) -> None:
+        if self._publisher is not None:
+            self._publisher.cancel()
+            try:
+                await self._publisher
+            except asyncio.CancelledError:
+                pass
+        await self.broker.stop()
+        self.broker, self._outbox, self._publisher = InProcessBroker(), None, None
+
+    async def _publish_outbox(self) -> None:
+        # A single publisher keeps events in order and keeps broker latency off the request path.
+        while True:
+            body = await self._outbox.get()
+            try:
+                await self.broker.publish(body)
+            except Exception as exc:
+                log_exception("notification_broker_publish_failed", exc)
+
+    async def _on_message(self, body: str) -> None:
+        message = json.loads(body)
+        if message.get("origin") == self.origin:
+            return
+        self._deliver_local(message.get("user_id"), message["text"], message.get("id"))
+
+    def _deliver_local(self, user_id: int | None, text: str, event_id: int | None = None) -> None:
+        if event_id is not None:
+            self._remember(event_id, user_id, text)
+        if user_id is None:
+            targets = [c for sockets in self.connections.values() for c in sockets.values()]
+        else:
+            targets = list(self.connections.get(user_id, {}).values())
+        self._enqueue(targets, text)
+
+    def _remember(self, event_id: int, user_id: int | None, text: str) -> None:
+        if self.replay_floor is None:
+            self.replay_floor = event_id - 1
+        if event_id <= self.replay_floor:
+            # Arrived after newer events were already evicted past it; reconnects below the floor go to the database.
+            return
+        bisect.insort(self.recent, (event_id, user_id, text), key=_event_id)
+        if len(self.recent) > self.replay_size:
+            self.replay_floor = self.recent.pop(0)[0]
+
+    def buffer_covers(self, since: int) -> bool:
+        return self.replay_floor is not None and since >= self.replay_floor
 
-    async def connect(self, user_id: int, websocket: WebSocket) -> None:
+    async def connect(
+        self,
+        user_id: int,
+        websocket: WebSocket,
+        since: int | None = None,
+        load_missed: Callable[[int, int], Awaitable[list[tuple[int, str]]]] | None = None,
+    ) -> None:
+        """Register a socket; with ``since``, first queue the events after that id it missed.
+
+        Events the ring buffer no longer holds come from ``load_missed(since, limit)``. A gap larger than the
+        send queue is replaced by a single ``resync`` event telling the client to reload its list.
+        """
         await websocket.accept()
-        async with self.lock:
-            self.connections[user_id].add(websocket)
+        capacity = max(settings.ws_send_queue_size, 1)
+        backlog: list[tuple[int, str]] = []
+        if since is not None and not self.buffer_covers(since) and load_missed is not None:
+            # One row past capacity is enough to tell "exactly full" from "overflowed".
+            backlog = await load_missed(since, capacity + 1)
+        conn = _Connection(user_id, websocket, capacity)
+        if since is not None:
+            # No awaits from here until the socket is registered, so nothing can slip between replay and live.
+            after = max([since] + [x[0] for x in backlog])
+            backlog += [(i, t) for i, uid, t in self.recent if i > after and uid in (None, user_id)]
+            if len(backlog) > capacity:
+                backlog = [(0, json.dumps({"type": "resync"}))]
+            for _, text in backlog:
+                conn.queue.put_nowait(text)
+        conn.sender = asyncio.create_task(self._drain(conn))
+        self.connections[user_id][websocket] = conn
 
     async def disconnect(self, user_id: int, websocket: WebSocket) -> None:
-        async with self.lock:
-            if user_id in self.connections and websocket in self.connections[user_id]:
-                self.connections[user_id].remove(websocket)
-                if not self.connections[user_id]:
-                    del self.connections[user_id]
+        conn = self._remove(user_id, websocket)
+        if conn is not None and conn.sender is not None and conn.sender is not asyncio.current_task():
+            conn.sender.cancel()
+
+    def _remove(self, user_id: int, websocket: WebSocket) -> _Connection | None:
+        sockets = self.connections.get(user_id)
+        if not sockets:
+            return None
+        conn = sockets.pop(websocket, None)
+        if not sockets:
+            del self.connections[user_id]
+        return conn
+
+    def connection_count(self) -> int:
+        return sum(len(x) for x in self.connections.values())
+
+    def stats(self) -> dict[str, int]:
+        depths = [c.queue.qsize() for sockets in self.connections.values() for c in sockets.values()]
+        return {
+            "connections": len(depths),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped_messages,
+            "slow_consumer_disconnects": self.slow_disconnects,
+        }
 
     async def push(self, user_id: int, payload: dict[str, Any]) -> None:
-        async with self.lock:
-            websockets = list(self.connections.get(user_id, set()))
-        dead = []
-        text = json.dumps(payload, ensure_ascii=False)
-        for ws in websockets:
+        self._publish(user_id, json.dumps(payload, ensure_ascii=False), payload.get("id"))
+
+    async def broadcast(self, payload: dict[str, Any]) -> None:
+        self._publish(None, json.dumps(payload, ensure_ascii=False), payload.get("id"))
+
+    def _publish(self, user_id: int | None, text: str, event_id: int | None) -> None:
+        self._deliver_local(user_id, text, event_id)
+        if self._outbox is not None:
+            self._outbox.put_nowait(
+                json.dumps({"origin": self.origin, "user_id": user_id, "id": event_id, "text": text})
+            )
+
+    def _enqueue(self, targets: list[_Connection], text: str) -> None:
+        for conn in targets:
+            try:
+                conn.queue.put_nowait(text)
+            except asyncio.QueueFull:
+                self.dropped_messages += 1
+                metrics_service.websocket_dropped_messages.inc()
+                self._drop_slow(conn)
+
+    def _drop_slow(self, conn: _Connection) -> None:
+        if self._remove(conn.user_id, conn.websocket) is None:
+            return
+        self.slow_disconnects += 1
+        metrics_service.websocket_slow_consumer_disconnects.inc()
+        if conn.sender is not None and conn.sender is not asyncio.current_task():
+            conn.sender.cancel()
+        task = asyncio.create_task(self._close(conn.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(websocket: WebSocket) -> None:
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _drain(self, conn: _Connection) -> None:
+        while True:
+            text = await conn.queue.get()
             try:
-                await ws.send_text(text)
+                await asyncio.wait_for(conn.websocket.send_text(text), timeout=settings.ws_send_timeout_seconds)
+            except asyncio.TimeoutError:
+                self._drop_slow(conn)
+                return
             except Exception:
-                dead.append(ws)
-        for ws in dead:
-            await self.disconnect(user_id, ws)
+                self._remove(conn.user_id, conn.websocket)
+                return
 
 
 notification_hub = NotificationHub()
+
+
+@dataclass
+class PendingPush:
+    """Live payloads to send once the rows backing them are committed; ``user_ids=None`` means every connection."""
+
+    user_ids: list[int] | None = None
+    payload: dict[str, Any] = field(default_factory=dict)
+
+
+def notification_payload(note_id: int, note_type: str, text: str, activity_id: int | None, created_at: datetime) -> dict[str, Any]:
+    """Live event body; ``id`` is the notification id, which clients echo back as ``since`` on reconnect."""
+    return {"id": note_id, "type": note_type, "text": text, "activity_id": activity_id, "created_at": created_at.isoformat()}
+
+
+def store_for_all_users(db: Session, text: str, activity_id: int | None, event_type: str) -> PendingPush:
+    note = Notification(user_id=None, activity_id=activity_id, type=event_type, text=text)
+    db.add(note)
+    db.commit()
+    return PendingPush(payload=notification_payload(note.id, event_type, text, activity_id, note.created_at))
+
+
+def missed_notifications(db: Session, user: User, since: int, limit: int) -> list[tuple[int, str]]:
+    rows = (
+        visible_notifications(db, user)
+        .filter(Notification.id > since)
+        .order_by(Notification.id)
+        .limit(limit)
+        .all()
+    )
+    return [
+        (x.id, json.dumps(notification_payload(x.id, x.type, x.text, x.activity_id, x.created_at), ensure_ascii=False))
+        for x, _ in rows
+    ]
+
+
+def visible_notifications(db: Session, user: User, branch: str | None = None):
+    """The user's own rows plus broadcasts sent since the account existed, with ``effective_read_at``.
+
+    ``branch`` ("own" or "broadcast") keeps only one side, for index-ordered scans.
+    """
+    watermark_read_at = case(
+        (
+            and_(Notification.user_id.is_(None), Notification.id <= user.notifications_read_through),
+            literal(user.notifications_read_at, DateTime),
+        ),
+        else_=null(),
+    )
+    read_at = func.coalesce(Notification.read_at, NotificationRead.read_at, watermark_read_at).label("effective_read_at")
+    own = Notification.user_id == user.id
+    broadcast = and_(Notification.user_id.is_(None), Notification.created_at >= user.created_at)
+    return (
+        db.query(Notification, read_at)
+        .outerjoin(
+            NotificationRead,
+            and_(NotificationRead.notification_id == Notification.id, NotificationRead.user_id == user.id),
+        )
+        .filter(
+            {
+                "own": own,
+                "broadcast": broadcast,
+                None: or_(own, broadcast),
+            }[branch]
+        )
+    )
+
+
+def notification_etag(db: Session, user: User, *variant: Any) -> str:
+    """Validator for the user's list: newest own and broadcast notification ids plus the user's latest read time.
+
+    Other users' rows never change it. Each part is a MAX over an index prefix, so checking it costs the same
+    however long the history is; the OR of the two branches would walk every broadcast instead.
+    """
+    latest_own = select(func.max(Notification.id)).where(Notification.user_id == user.id).scalar_subquery()
+    latest_broadcast = select(func.max(Notification.id)).where(Notification.user_id.is_(None)).scalar_subquery()
+    own_read = select(func.max(Notification.read_at)).where(Notification.user_id == user.id).scalar_subquery()
+    marker_read = select(func.max(NotificationRead.read_at)).where(NotificationRead.user_id == user.id).scalar_subquery()
+    row = db.execute(select(latest_own, latest_broadcast, own_read, marker_read)).one()
+    raw = "|".join(str(x) for x in (user.id, user.notifications_read_through, *row, *variant))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+
+def unread_filter(user: User):
+    return and_(
+        Notification.read_at.is_(None),
+        NotificationRead.id.is_(None),
+        or_(Notification.user_id.is_not(None), Notification.id > user.notifications_read_through),
+    )
+
+
+def notification_page(db: Session, user: User, limit: int, *criteria) -> list:
+    """Newest-first page of visible notifications matching ``criteria``.
+
+    Each branch is read in index order and cut at ``limit`` before merging, so a page never sorts the history.
+    """
+    branches = [
+        visible_notifications(db, user, branch)
+        .filter(*criteria)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(limit)
+        .subquery()
+        for branch in ("own", "broadcast")
+    ]
+    merged = union_all(*(select(x) for x in branches)).subquery()
+    note = aliased(Notification, merged)
+    return (
+        db.query(note, merged.c.effective_read_at)
+        .order_by(merged.c.created_at.desc(), merged.c.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def keyset_before(created_at: datetime, note_id: int):
+    """Rows after the cursor in ``created_at DESC, id DESC`` order; a row-value seek on the composite indexes."""
+    return tuple_(Notification.created_at, Notification.id) < tuple_(literal(created_at, DateTime), literal(note_id))
+
+
+def mark_notification_read(db: Session, user: User, notification_id: int) -> None:
+    row = visible_notifications(db, user).filter(Notification.id == notification_id).first()
+    if row is None or row.effective_read_at is not None:
+        return
+    note = row[0]
+    if note.user_id is None:
+        db.add(NotificationRead(user_id=user.id, notification_id=note.id))
+    else:
+        note.read_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request already stored the marker.
+        db.rollback()
+
+
+def mark_notifications_read(db: Session, user: User, notification_ids: list[int]) -> int:
+    """Mark several notifications read: one UPDATE for the user's own rows, one INSERT ... SELECT of broadcast markers."""
+    now = datetime.utcnow()
+    own = db.execute(
+        update(Notification)
+        .where(Notification.id.in_(notification_ids), Notification.user_id == user.id, Notification.read_at.is_(None))
+        .values(read_at=now)
+    ).rowcount
+    marker = select(NotificationRead.id).where(
+        NotificationRead.notification_id == Notification.id, NotificationRead.user_id == user.id
+    )
+    broadcasts = db.execute(
+        insert(NotificationRead).from_select(
+            ["user_id", "notification_id", "read_at"],
+            select(literal(user.id), Notification.id, literal(now, DateTime)).where(
+                Notification.id.in_(notification_ids),
+                Notification.user_id.is_(None),
+                Notification.created_at >= user.created_at,
+                Notification.id > user.notifications_read_through,
+                ~exists(marker),
+            ),
+        )
+    ).rowcount
+    db.commit()
+    return own + broadcasts
+
+
+def unread_broadcasts(user: User):
+    """COUNT of broadcasts above the user's watermark with no read marker: a range seek, bounded by the last read-all."""
+    marker = select(NotificationRead.id).where(
+        NotificationRead.notification_id == Notification.id, NotificationRead.user_id == user.id
+    )
+    # Broadcast ids grow with created_at, so "sent since the account existed" becomes an id bound and the whole
+    # count stays one rowid range on the user_id index instead of a walk over every broadcast since sign-up.
+    first_visible = (
+        select(Notification.id)
+        .where(Notification.user_id.is_(None), Notification.created_at >= user.created_at)
+        .order_by(Notification.created_at, Notification.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    after_watermark = user.notifications_read_through + 1
+    return select(func.count(Notification.id)).where(
+        Notification.user_id.is_(None),
+        first_visible.is_not(None),
+        Notification.id >= case((first_visible > after_watermark, first_visible), else_=after_watermark),
+        ~exists(marker),
+    )
+
+
+def unread_count(db: Session, user: User) -> int:
+    """Own unread rows (a seek on ``(user_id, read_at)``) plus unread broadcasts above the watermark, in one query."""
+    own = (
+        select(func.count(Notification.id))
+        .where(Notification.user_id == user.id, Notification.read_at.is_(None))
+        .scalar_subquery()
+    )
+    return db.execute(select(own + unread_broadcasts(user).scalar_subquery())).scalar() or 0
+
+
+def latest_broadcast_id(db: Session) -> int:
+    """Starting watermark for a new account: older broadcasts are not visible to it anyway."""
+    return db.execute(select(func.max(Notification.id)).where(Notification.user_id.is_(None))).scalar() or 0
+
+
+def mark_all_notifications_read(db: Session, user: User) -> int:
+    """Mark everything read: one UPDATE for the user's own rows and one moving the broadcast watermark.
+
+    Broadcasts read earlier through a marker keep that time; the watermark's read time is only the fallback.
+    """
+    now = datetime.utcnow()
+    own = db.execute(
+        update(Notification).where(Notification.user_id == user.id, Notification.read_at.is_(None)).values(read_at=now)
+    ).rowcount
+    latest = select(func.max(Notification.id)).where(Notification.user_id.is_(None)).scalar_subquery()
+    # One snapshot for both, so the count covers exactly the broadcasts the watermark moves over.
+    latest, broadcasts = db.execute(select(latest, unread_broadcasts(user).scalar_subquery())).one()
+    if latest is not None and latest > user.notifications_read_through:
+        db.execute(
+            update(User)
+            .where(User.id == user.id, User.notifications_read_through < latest)
+            .values(notifications_read_through=latest, notifications_read_at=now)
+        )
+    db.commit()
+    return own + broadcasts
+
+
+async def deliver(push: PendingPush | None) -> None:
+    if push is None:
+        return
+    if push.user_ids is None:
+        await notification_hub.broadcast(push.payload)
+        return
+    for user_id in push.user_ids:
+        await notification_hub.push(user_id, push.payload)
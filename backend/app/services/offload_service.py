@@ -0,0 +1,31 @@
+import asyncio
+import functools
+import weakref
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+import anyio
+
+from ..config import settings
+from . import profiling_service
+
+T = TypeVar("T")
+
+# One limiter per event loop; anyio limiters cannot be shared across loops.
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, anyio.CapacityLimiter]" = weakref.WeakKeyDictionary()
+
+
+def _limiter() -> anyio.CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = anyio.CapacityLimiter(max(settings.blocking_pool_size, 1))
+        _limiters[loop] = limiter
+    return limiter
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run synchronous DB/openpyxl work on the bounded worker pool instead of the event loop."""
+    return await anyio.to_thread.run_sync(
+        profiling_service.bind(functools.partial(func, *args, **kwargs)), limiter=_limiter()
+    )
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from ..config import settings
+from ..models import Activity, ActivityAssignment, ReportPreset, Staff
+from .activity_change_service import data_version
+from .activity_query_service import ACTIVITY_LIST_ORDER, ActivityFilters, activity_to_dict, apply_activity_filters, attach_usernames
+
+_lock = threading.Lock()
+_cache: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+
+
+def _summary(db: Session, filters: ActivityFilters) -> dict[str, Any]:
+    grouped = apply_activity_filters(db.query(Activity.status, Activity.activity_type, func.count(Activity.id)), filters)
+    by_status: dict[str, int] = {}
+    by_type: dict[str, int] = {}
+    total = 0
+    for status, activity_type, count in grouped.group_by(Activity.status, Activity.activity_type):
+        total += count
+        by_status[status] = by_status.get(status, 0) + count
+        by_type[activity_type] = by_type.get(activity_type, 0) + count
+
+    matched = apply_activity_filters(db.query(Activity.id), filters).subquery()
+    staff_rows = (
+        db.query(Staff.id, Staff.name, func.count(ActivityAssignment.id))
+        .join(ActivityAssignment, ActivityAssignment.staff_id == Staff.id)
+        .filter(ActivityAssignment.is_current.is_(True), ActivityAssignment.activity_id.in_(db.query(matched.c.id)))
+        .group_by(Staff.id, Staff.name)
+        .order_by(func.count(ActivityAssignment.id).desc())
+        .all()
+    )
+    return {
+        "total": total,
+        "by_status": by_status,
+        "by_type": [{"name": k, "count": v} for k, v in sorted(by_type.items(), key=lambda x: -x[1])],
+        "by_staff": [{"id": x[0], "name": x[1], "count": x[2]} for x in staff_rows],
+    }
+
+
+def _execute(db: Session, filters: ActivityFilters, page: int, page_size: int, include_summary: bool) -> dict[str, Any]:
+    summary = _summary(db, filters) if include_summary else None
+    q = apply_activity_filters(
+        db.query(Activity).options(joinedload(Activity.assignments).joinedload(ActivityAssignment.staff)), filters
+    )
+    total = summary["total"] if summary else q.with_entities(func.count(Activity.id)).scalar()
+    rows = q.order_by(*ACTIVITY_LIST_ORDER).offset((page - 1) * page_size).limit(page_size).all()
+    items = attach_usernames([activity_to_dict(r) for r in rows], db)
+    result = {"items": items, "page": page, "page_size": page_size, "total": total}
+    if summary:
+        result["summary"] = summary
+    return result
+
+
+def preset_results(
+    db: Session, preset: ReportPreset, filters: ActivityFilters, page: int, page_size: int, include_summary: bool
+) -> dict[str, Any]:
+    """Run a preset's filters, cached per (preset revision, activity data version, page)."""
+    version = data_version(db)
+    key = (preset.id, preset.updated_at.isoformat(), version, page, page_size, include_summary)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return {**cached, "data_version": version, "cached": True}
+
+    result = _execute(db, filters, page, page_size, include_summary)
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > max(settings.preset_cache_size, 0):
+            _cache.popitem(last=False)
+    return {**result, "data_version": version, "cached": False}
+
+
+def clear_preset_cache() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,188 @@
+import functools
+import inspect
+import sys
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any
+from uuid import uuid4
+
+from ..auth import decode_token
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..deps import ROLE_ADMIN, normalize_role
+from ..models import User
+
+APP_DIR = str(Path(__file__).resolve().parents[1])
+_THIS_FILE = str(Path(__file__).resolve())
+_TOP_LIMIT = 30
+_STACK_LIMIT = 200
+
+_lock = threading.Lock()
+_store: OrderedDict[str, dict[str, Any]] = OrderedDict()
+# Labels need f_globals, which a bare code object lacks; filled while sampling and shared by every profiler.
+_labels: dict[CodeType, str] = {}
+# Set by the request middleware; anyio copies it into worker threads along with the rest of the context.
+_active: ContextVar["Profiler | None"] = ContextVar("active_profiler", default=None)
+
+
+def is_admin_token(authorization: str | None) -> bool:
+    """Profiling is admin-only; the role is checked against the database, not just the token claims."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        payload = decode_token(authorization[7:].strip())
+    except Exception:
+        return False
+    if payload.get("type") != "access":
+        return False
+    db = ReadSessionLocal()
+    try:
+        user = db.query(User).filter(User.username == payload.get("sub")).first()
+        return bool(user) and normalize_role(user.role) == ROLE_ADMIN
+    finally:
+        db.close()
+
+
+def _frame_label(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _collapse(frame: FrameType | None) -> tuple[CodeType, ...] | None:
+    codes: list[CodeType] = []
+    in_app = False
+    while frame is not None:
+        code = frame.f_code
+        # The claim wrapper from bind() sits in every claimed stack; leave it out.
+        if code.co_filename != _THIS_FILE:
+            in_app = in_app or code.co_filename.startswith(APP_DIR)
+            codes.append(code)
+            _labels.setdefault(code, _frame_label(frame))
+        frame = frame.f_back
+    # Threads parked in the event loop or a pool queue never touch app code; drop them as idle.
+    if not in_app:
+        return None
+    return tuple(reversed(codes))
+
+
+class Profiler(threading.Thread):
+    """Samples every thread's stack while one request runs, keeping those that pass through app code.
+
+    Threads claimed through ``bind`` (``run_blocking`` calls made for the request) always count; any other stack only
+    counts if it runs the endpoint the request was routed to, which is known once the response is back.
+    """
+
+    def __init__(self, interval_ms: int) -> None:
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = max(interval_ms, 1) / 1000
+        self.claimed: Counter[tuple[CodeType, ...]] = Counter()
+        self.unclaimed: Counter[tuple[CodeType, ...]] = Counter()
+        self.ticks = 0
+        self.idents: set[int] = set()
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._halt.wait(self.interval):
+            self.ticks += 1
+            idents = set(self.idents)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    (self.claimed if ident in idents else self.unclaimed)[stack] += 1
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join(timeout=1)
+
+    def stacks_for(self, endpoint: Callable[..., Any] | None) -> Counter[tuple[str, ...]]:
+        code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint is not None else None
+        kept = Counter(self.claimed)
+        if code is not None:
+            kept.update({stack: n for stack, n in self.unclaimed.items() if code in stack})
+        labelled: Counter[tuple[str, ...]] = Counter()
+        for stack, n in kept.items():
+            labelled[tuple(_labels[x] for x in stack)] += n
+        return labelled
+
+
+def start_profiler() -> Profiler:
+    """Called from the request middleware; the profiler stays active for the rest of the request."""
+    profiler = Profiler(settings.profile_sample_interval_ms)
+    _active.set(profiler)
+    profiler.start()
+    return profiler
+
+
+def bind(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an offloaded callable so the worker thread running it is claimed by the active profiler."""
+
+    @functools.wraps(func)
+    def claim_thread(*args: Any, **kwargs: Any) -> Any:
+        profiler = _active.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        ident = threading.get_ident()
+        profiler.idents.add(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.idents.discard(ident)
+
+    return claim_thread
+
+
+def _summarize(stacks: Counter[tuple[str, ...]]) -> tuple[list[dict[str, Any]], list[str]]:
+    own: Counter[str] = Counter()
+    total: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for label in set(stack):
+            total[label] += count
+    top = [
+        {"function": label, "cumulative": count, "self": own.get(label, 0)}
+        for label, count in total.most_common(_TOP_LIMIT)
+    ]
+    collapsed = [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common(_STACK_LIMIT)]
+    return top, collapsed
+
+
+def finish_profiler(profiler: Profiler, endpoint: Callable[..., Any] | None = None, **request_fields: Any) -> str:
+    """``endpoint`` is the routed endpoint (``request.scope["route"].endpoint``); None keeps only claimed work."""
+    profiler.stop()
+    stacks = profiler.stacks_for(endpoint)
+    top, collapsed = _summarize(stacks)
+    profile_id = uuid4().hex
+    entry = {
+        "id": profile_id,
+        "created_at": datetime.utcnow().isoformat(),
+        **request_fields,
+        "interval_ms": round(profiler.interval * 1000, 3),
+        "ticks": profiler.ticks,
+        "samples": sum(stacks.values()),
+        "top": top,
+        "collapsed": collapsed,
+    }
+    with _lock:
+        _store[profile_id] = entry
+        while len(_store) > max(settings.profile_store_size, 1):
+            _store.popitem(last=False)
+    return profile_id
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    with _lock:
+        entries = list(reversed(_store.values()))
+    return [{k: v for k, v in entry.items() if k not in {"top", "collapsed"}} for entry in entries]
+
+
+def get_profile(profile_id: str) -> dict[str, Any] | None:
+    with _lock:
+        return _store.get(profile_id)
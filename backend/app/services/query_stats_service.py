@@ -0,0 +1,96 @@
+import re
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from . import metrics_service
+from .monitoring_service import log_warning
+
+# pyformat ("%s") and named pyformat ("%(id_1_1)s") placeholders used by the PostgreSQL/MySQL drivers.
+_PYFORMAT = re.compile(r"%\([^)]+\)s|%s")
+_IN_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    by_fingerprint: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.by_fingerprint[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        if threshold <= 0:
+            return []
+        return [(fp, n) for fp, n in self.by_fingerprint.most_common() if n > threshold]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def fingerprint(statement: str) -> str:
+    """Statement template with placeholders normalised to ``?`` and IN lists / multi-row VALUES collapsed.
+
+    N+1 loops share one key whatever the driver's paramstyle or the list length.
+    """
+    text = _SPACES.sub(" ", statement).strip()
+    text = _PYFORMAT.sub("?", text)
+    text = _IN_LIST.sub("?", text)
+    return _VALUES_LIST.sub("(?)", text)
+
+
+# Start times are keyed by execution context: a statement that raises never reaches after_cursor_execute, and
+# handle_error drops its entry so it cannot pair with a later statement on the same pooled connection.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", {})[id(context)] = time.perf_counter()
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None:
+        conn.info.get("query_started", {}).pop(id(exception_context.execution_context), None)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop(id(context))
+    metrics_service.db_queries_total.inc()
+    metrics_service.db_query_seconds_total.inc(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed * 1000)
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect query count and SQL time for everything executed in this context (threads included)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def warn_repeated_statements(stats: QueryStats, **fields) -> None:
+    for statement, count in stats.repeated(settings.sql_repeat_warning_threshold):
+        log_warning("sql_repeated_statement", count=count, fingerprint=statement[:500], **fields)
@@ -1,4 +1,6 @@
-from sqlalchemy import func
+from sqlalchemy import String, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 
 
 def normalize_text(value: str | None) -> str:
@@ -20,19 +22,47 @@ def normalize_text(value: str | None) -> str:
     return text
 
 
-def normalize_sql_expr(column):
+_SQL_REPLACEMENTS = [
+    ("ي", "ی"),
+    ("ك", "ک"),
+    ("ة", "ه"),
+    ("ۀ", "ه"),
+    ("ؤ", "و"),
+    ("أ", "ا"),
+    ("إ", "ا"),
+    ("آ", "ا"),
+    ("‌", ""),
+    (" ", ""),
+]
+
+
+class normalized_text(FunctionElement):
+    """lower(coalesce(col, '')) with Persian/Arabic letter folding, compiled per dialect."""
+
+    type = String()
+    inherit_cache = True
+    name = "normalized_text"
+
+
+@compiles(normalized_text)
+def _compile_normalized_text(element, compiler, **kw):
+    (column,) = element.clauses
     expr = func.lower(func.coalesce(column, ""))
-    for src, dst in [
-        ("ي", "ی"),
-        ("ك", "ک"),
-        ("ة", "ه"),
-        ("ۀ", "ه"),
-        ("ؤ", "و"),
-        ("أ", "ا"),
-        ("إ", "ا"),
-        ("آ", "ا"),
-        ("‌", ""),
-        (" ", ""),
-    ]:
+    for src, dst in _SQL_REPLACEMENTS:
         expr = func.replace(expr, src, dst)
-    return expr
+    return compiler.process(expr, **kw)
+
+
+@compiles(normalized_text, "postgresql")
+def _compile_normalized_text_pg(element, compiler, **kw):
+    # translate() folds every character in one pass; characters without a
+    # counterpart in the target string (ZWNJ, space) are removed.
+    (column,) = element.clauses
+    src = "".join(x[0] for x in _SQL_REPLACEMENTS)
+    dst = "".join(x[1] for x in _SQL_REPLACEMENTS)
+    expr = func.translate(func.lower(func.coalesce(column, "")), src, dst)
+    return compiler.process(expr, **kw)
+
+
+def normalize_sql_expr(column):
+    return normalized_text(column)
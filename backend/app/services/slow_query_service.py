@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from .monitoring_service import log_event
+from .query_stats_service import fingerprint
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_PLAN_CACHE_SIZE = 256
+_SAVEPOINT = "slow_query_explain"
+
+_lock = threading.Lock()
+_buffer: deque[dict[str, Any]] = deque(maxlen=max(settings.slow_query_buffer_size, 1))
+_plans: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Keep the shape and types of bound parameters, never their values."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return {"rows": len(parameters), "first": redact_parameters(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _run_explain(conn, statement: str, parameters: Any) -> list[str]:
+    """EXPLAIN on the statement's own connection without disturbing the caller's transaction.
+
+    On server databases a failed statement aborts the whole transaction, so the EXPLAIN runs inside a
+    savepoint that is rolled back to on error. SQLite's EXPLAIN QUERY PLAN cannot poison a transaction.
+    """
+    dialect = conn.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    guarded = dialect != "sqlite"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if guarded:
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            if guarded:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+            raise
+        finally:
+            if guarded:
+                cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+    finally:
+        cursor.close()
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+    return [str(row[0]) for row in rows]
+
+
+def _query_plan(conn, key: str, statement: str, parameters: Any, executemany: bool) -> list[str] | None:
+    now = time.monotonic()
+    with _lock:
+        cached = _plans.get(key)
+        if cached and now - cached[0] < settings.slow_query_explain_interval_seconds:
+            _plans.move_to_end(key)
+            return cached[1]
+    if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        plan = _run_explain(conn, statement, parameters)
+    except Exception as exc:
+        plan = [f"explain failed: {exc}"]
+    with _lock:
+        _plans[key] = (now, plan)
+        _plans.move_to_end(key)
+        while len(_plans) > _PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+# Keyed by execution context like query_stats_service: the EXPLAIN below nests on the same connection, and a
+# statement that raises is dropped in handle_error instead of pairing with the next one.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("slow_query_started", {})[id(context)] = time.perf_counter()
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None:
+        conn.info.get("slow_query_started", {}).pop(id(exception_context.execution_context), None)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"].pop(id(context))) * 1000
+    threshold = settings.slow_query_threshold_ms
+    if threshold <= 0 or elapsed_ms < threshold:
+        return
+    key = fingerprint(statement)
+    entry = {
+        "ts": datetime.utcnow().isoformat(),
+        "duration_ms": round(elapsed_ms, 2),
+        "fingerprint": key[:2000],
+        "statement": statement[:2000],
+        "parameters": redact_parameters(parameters),
+        "executemany": bool(executemany),
+        "plan": _query_plan(conn, key, statement, parameters, executemany),
+    }
+    with _lock:
+        _buffer.append(entry)
+    log_event("slow_query", **entry)
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def recent_slow_queries() -> list[dict[str, Any]]:
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def clear_slow_queries() -> None:
+    with _lock:
+        _buffer.clear()
+        _plans.clear()
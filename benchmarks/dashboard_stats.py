@@ -0,0 +1,141 @@
+"""Dashboard stats latency on a large table: per-counter COUNTs vs one SUM(CASE) pass vs daily aggregates.
+
+Run from the project root (seeding 500k rows takes a little while):
+
+    python -m benchmarks.dashboard_stats --rows 500000 --repeat 5
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import case, create_engine, event, func, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.app.database import Base, apply_sqlite_pragmas, sqlite_pragmas
+from backend.app.models import Activity, ActivityAssignment, Staff, User
+from backend.app.routers.dashboard import _stats_by_staff, _stats_by_type, _stats_counters, _stats_recent
+from backend.app.services.activity_stats_service import rebuild_daily_stats
+
+TYPES = [f"type-{idx}" for idx in range(8)]
+CHUNK = 50000
+
+
+def _seed(engine, rows: int, today: date) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"username": "bench", "password_hash": "-", "role": "admin"}])
+        conn.execute(insert(Staff), [{"name": f"staff-{idx}", "active": True} for idx in range(20)])
+        for offset in range(0, rows, CHUNK):
+            batch = range(offset, min(offset + CHUNK, rows))
+            conn.execute(
+                insert(Activity),
+                [
+                    {
+                        "created_by_user_id": 1,
+                        "date": today - timedelta(days=idx % 1500),
+                        "activity_type": TYPES[idx % len(TYPES)],
+                        "customer_name": f"customer-{idx}",
+                        "location": "-",
+                        "status": "done" if idx % 3 == 0 else "pending",
+                        "priority": idx % 10,
+                    }
+                    for idx in batch
+                ],
+            )
+            conn.execute(
+                insert(ActivityAssignment),
+                [{"activity_id": idx + 1, "staff_id": 1 + idx % 20, "assigned_by_user_id": 1, "is_current": True} for idx in batch],
+            )
+
+
+def legacy_stats(db: Session, today: date) -> None:
+    week_start = today - timedelta(days=today.weekday())
+    db.query(func.count(Activity.id)).filter(Activity.date == today).scalar()
+    db.query(func.count(Activity.id)).filter(Activity.date >= week_start).scalar()
+    db.query(func.count(Activity.id)).filter(Activity.status == "pending").scalar()
+    db.query(func.count(Activity.id)).filter(Activity.status == "done").scalar()
+    _live_breakdowns(db)
+
+
+def single_pass_stats(db: Session, today: date) -> None:
+    week_start = today - timedelta(days=today.weekday())
+    db.query(
+        func.sum(case((Activity.date == today, 1), else_=0)),
+        func.sum(case((Activity.date >= week_start, 1), else_=0)),
+        func.sum(case((Activity.status == "pending", 1), else_=0)),
+        func.sum(case((Activity.status == "done", 1), else_=0)),
+    ).one()
+    _live_breakdowns(db)
+
+
+def _live_breakdowns(db: Session) -> None:
+    db.query(Activity.activity_type, func.count(Activity.id)).group_by(Activity.activity_type).all()
+    (
+        db.query(Staff.name, func.count(ActivityAssignment.id))
+        .join(ActivityAssignment, ActivityAssignment.staff_id == Staff.id)
+        .filter(ActivityAssignment.is_current.is_(True))
+        .group_by(Staff.name)
+        .all()
+    )
+    db.query(Activity).order_by(Activity.created_at.desc()).limit(5).all()
+
+
+def aggregate_stats(db: Session, today: date) -> None:
+    _stats_counters(db, today)
+    _stats_by_type(db)
+    _stats_by_staff(db)
+    _stats_recent(db)
+
+
+def aggregate_counters_only(db: Session, today: date) -> None:
+    _stats_counters(db, today)
+
+
+def _time(session_factory, func_, today: date, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        db = session_factory()
+        try:
+            started = time.perf_counter()
+            func_(db, today)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            db.close()
+    return round(best * 1000, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        event.listen(engine, "connect", lambda conn, _record: apply_sqlite_pragmas(conn, sqlite_pragmas()))
+        started = time.perf_counter()
+        _seed(engine, args.rows, today)
+        session_factory = sessionmaker(bind=engine)
+        db = session_factory()
+        try:
+            rebuild_daily_stats(db)
+        finally:
+            db.close()
+        print(f"seeded rows={args.rows} in {time.perf_counter() - started:.1f}s")
+
+        for name, func_ in (
+            ("legacy_counts", legacy_stats),
+            ("single_pass", single_pass_stats),
+            ("daily_aggregates", aggregate_stats),
+            ("daily_aggregates_counters_only", aggregate_counters_only),
+        ):
+            print(f"variant={name} best_ms={_time(session_factory, func_, today, args.repeat)}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
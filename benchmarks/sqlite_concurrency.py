@@ -0,0 +1,133 @@
+"""Read throughput while a writer is committing, default journal vs the WAL profile.
+
+Run from the project root:
+
+    python -m benchmarks.sqlite_concurrency --seconds 5 --readers 4
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.database import Base, apply_sqlite_pragmas, sqlite_pragmas
+from backend.app.models import Activity, User
+
+LEGACY_PRAGMAS = {"busy_timeout": 5000, "journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def _make_engine(path: Path, pragmas: dict):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, _record: apply_sqlite_pragmas(conn, pragmas))
+    return engine
+
+
+def _seed(engine, rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        user = User(username="bench", password_hash="-", role="admin")
+        session.add(user)
+        session.flush()
+        session.add_all(
+            Activity(
+                created_by_user_id=user.id,
+                date=date(2026, 1, 1 + idx % 28),
+                activity_type=f"type-{idx % 5}",
+                customer_name=f"customer-{idx}",
+                location="-",
+                status="pending" if idx % 3 else "done",
+                priority=idx % 10,
+            )
+            for idx in range(rows)
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def run_profile(name: str, pragmas: dict, seconds: float, readers: int, rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(Path(tmp) / "bench.db", pragmas)
+        _seed(engine, rows)
+        Session = sessionmaker(bind=engine)
+        stop = threading.Event()
+        counts = {"reads": 0, "writes": 0, "busy": 0}
+        lock = threading.Lock()
+
+        def writer() -> None:
+            session = Session()
+            idx = 0
+            while not stop.is_set():
+                try:
+                    session.add(
+                        Activity(
+                            created_by_user_id=1,
+                            date=date(2026, 2, 1),
+                            activity_type="type-w",
+                            customer_name=f"writer-{idx}",
+                            location="-",
+                        )
+                    )
+                    session.commit()
+                    idx += 1
+                    with lock:
+                        counts["writes"] += 1
+                except OperationalError:
+                    session.rollback()
+                    with lock:
+                        counts["busy"] += 1
+            session.close()
+
+        def reader() -> None:
+            session = Session()
+            stmt = select(Activity.status, func.count(Activity.id)).group_by(Activity.status)
+            while not stop.is_set():
+                try:
+                    session.execute(stmt).all()
+                    session.rollback()
+                    with lock:
+                        counts["reads"] += 1
+                except OperationalError:
+                    session.rollback()
+                    with lock:
+                        counts["busy"] += 1
+            session.close()
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        "profile": name,
+        "reads_per_s": round(counts["reads"] / seconds, 1),
+        "writes_per_s": round(counts["writes"] / seconds, 1),
+        "busy_errors": counts["busy"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, pragmas in (("legacy", LEGACY_PRAGMAS), ("wal_profile", sqlite_pragmas())):
+        result = run_profile(name, pragmas, args.seconds, args.readers, args.rows)
+        print(" ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
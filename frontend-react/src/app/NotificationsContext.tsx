@@ -17,20 +17,34 @@ export function NotificationsProvider({ children }: { children: ReactNode }) {
   const { isAuthenticated } = useAuth();
   const pollTimerRef = useRef<number | null>(null);
   const pingTimerRef = useRef<number | null>(null);
+  const reconnectTimerRef = useRef<number | null>(null);
+  // Highest notification id seen; sent as `since` on reconnect so the server replays what was missed.
+  const lastEventIdRef = useRef<number | null>(null);
   const [connected, setConnected] = useState(false);
 
   const notifQuery = useQuery({
     queryKey: ["notifications"],
     queryFn: () => fetchNotifications(false),
-    enabled: isAuthenticated,
-    refetchInterval: isAuthenticated ? 30_000 : false
+    enabled: isAuthenticated
   });
 
+  const noteEventId = (id: unknown) => {
+    if (typeof id === "number" && id > (lastEventIdRef.current ?? 0)) lastEventIdRef.current = id;
+  };
+
+  useEffect(() => {
+    for (const item of notifQuery.data?.items ?? []) noteEventId(item.id);
+  }, [notifQuery.data]);
+
   useEffect(() => {
     if (!isAuthenticated) return;
     const auth = getStoredAuth();
     if (!auth?.access_token) return;
 
+    let ws: WebSocket | null = null;
+    let stopped = false;
+    let retryDelay = 1_000;
+
     const startPoll = () => {
       if (pollTimerRef.current) return;
       pollTimerRef.current = window.setInterval(() => {
@@ -52,36 +66,48 @@ export function NotificationsProvider({ children }: { children: ReactNode }) {
       }
     };
 
-    const proto = window.location.protocol === "https:" ? "wss" : "ws";
-    const wsUrl = `${proto}://${window.location.host}/api/notifications/ws?token=${encodeURIComponent(auth.access_token)}`;
-    const ws = new WebSocket(wsUrl);
-
-    ws.onopen = () => {
-      setConnected(true);
-      stopPoll();
-      pingTimerRef.current = window.setInterval(() => {
-        if (ws.readyState === WebSocket.OPEN) ws.send("ping");
-      }, 25_000);
-    };
-
-    ws.onmessage = () => {
-      void queryClient.invalidateQueries({ queryKey: ["notifications"] });
-    };
-
-    ws.onerror = () => {
-      setConnected(false);
-      startPoll();
-      stopPing();
+    const connect = () => {
+      const proto = window.location.protocol === "https:" ? "wss" : "ws";
+      const since = lastEventIdRef.current !== null ? `&since=${lastEventIdRef.current}` : "";
+      const socket = new WebSocket(
+        `${proto}://${window.location.host}/api/notifications/ws?token=${encodeURIComponent(auth.access_token)}${since}`
+      );
+      ws = socket;
+
+      socket.onopen = () => {
+        setConnected(true);
+        retryDelay = 1_000;
+        stopPoll();
+        pingTimerRef.current = window.setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) socket.send("ping");
+        }, 25_000);
+      };
+
+      socket.onmessage = (event) => {
+        try {
+          noteEventId(JSON.parse(event.data)?.id);
+        } catch {
+          // Non-JSON frames carry nothing to track; still refresh below.
+        }
+        void queryClient.invalidateQueries({ queryKey: ["notifications"] });
+      };
+
+      socket.onclose = () => {
+        setConnected(false);
+        stopPing();
+        if (stopped) return;
+        startPoll();
+        reconnectTimerRef.current = window.setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30_000);
+      };
     };
 
-    ws.onclose = () => {
-      setConnected(false);
-      startPoll();
-      stopPing();
-    };
+    connect();
 
     return () => {
-      ws.close();
+      stopped = true;
+      if (reconnectTimerRef.current) window.clearTimeout(reconnectTimerRef.current);
+      ws?.close();
       stopPoll();
       stopPing();
     };
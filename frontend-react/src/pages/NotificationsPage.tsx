@@ -1,9 +1,10 @@
-import { useMemo } from "react";
+import { useMemo, useState } from "react";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { Link } from "react-router-dom";
 import { useNotificationsChannel } from "@/app/NotificationsContext";
 import { useToast } from "@/components/ToastProvider";
-import { fetchNotifications, markNotificationRead } from "@/services/notifications";
+import { fetchNotifications, markAllNotificationsRead, markNotificationRead } from "@/services/notifications";
+import type { NotificationItem } from "@/types/notification";
 
 function formatDate(value: string) {
   const date = new Date(value);
@@ -27,9 +28,41 @@ export function NotificationsPage() {
     queryFn: () => fetchNotifications(false)
   });
 
+  // Older pages fetched with the keyset cursor; the first page stays live through the shared query.
+  const [older, setOlder] = useState<NotificationItem[]>([]);
+  const [olderCursor, setOlderCursor] = useState<string | null | undefined>(undefined);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+
+  const loadOlder = async () => {
+    const cursor = olderCursor === undefined ? notifQuery.data?.next_cursor : olderCursor;
+    if (!cursor) return;
+    setLoadingOlder(true);
+    try {
+      const page = await fetchNotifications(false, cursor);
+      setOlder((prev) => [...prev, ...page.items]);
+      setOlderCursor(page.next_cursor);
+    } catch (error) {
+      showToast(error instanceof Error ? error.message : "خطا در دریافت اعلان ها", "error");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const readAllMutation = useMutation({
+    mutationFn: () => markAllNotificationsRead(),
+    onSuccess: () => {
+      setOlder((prev) => prev.map((item) => (item.read_at ? item : { ...item, read_at: new Date().toISOString() })));
+      void queryClient.invalidateQueries({ queryKey: ["notifications"] });
+    },
+    onError: (error) => {
+      showToast(error instanceof Error ? error.message : "علامت‌گذاری اعلان ناکام شد", "error");
+    }
+  });
+
   const readMutation = useMutation({
     mutationFn: (id: number) => markNotificationRead(id),
-    onSuccess: () => {
+    onSuccess: (_data, id) => {
+      setOlder((prev) => prev.map((item) => (item.id === id ? { ...item, read_at: new Date().toISOString() } : item)));
       void queryClient.invalidateQueries({ queryKey: ["notifications"] });
     },
     onError: (error) => {
@@ -37,8 +70,13 @@ export function NotificationsPage() {
     }
   });
 
-  const items = notifQuery.data?.items ?? [];
+  const items = useMemo(() => {
+    const first = notifQuery.data?.items ?? [];
+    const seen = new Set(first.map((item) => item.id));
+    return [...first, ...older.filter((item) => !seen.has(item.id))];
+  }, [notifQuery.data?.items, older]);
   const hasUnread = useMemo(() => items.some((item) => !item.read_at), [items]);
+  const nextCursor = olderCursor === undefined ? notifQuery.data?.next_cursor : olderCursor;
 
   return (
     <section className="card p-4 space-y-3">
@@ -47,7 +85,12 @@ export function NotificationsPage() {
           <h3 className="text-lg font-semibold">اعلان ها</h3>
           <p className="text-sm text-slate-500">خوانده نشده: {unread}</p>
         </div>
-        <div className="text-xs text-slate-500">
+        <div className="flex items-center gap-3 text-xs text-slate-500">
+          {unread > 0 && (
+            <button className="btn-secondary" disabled={readAllMutation.isPending} onClick={() => readAllMutation.mutate()}>
+              {readAllMutation.isPending ? "در حال ثبت..." : "همه خوانده شد"}
+            </button>
+          )}
           <span className="ml-1">وضعیت اتصال:</span>
           <span className={connected ? "text-emerald-700" : "text-amber-700"}>
             {connected ? "WebSocket" : "Polling"}
@@ -108,6 +151,12 @@ export function NotificationsPage() {
         </ul>
       )}
 
+      {nextCursor && !notifQuery.isLoading && !notifQuery.isError && (
+        <button className="btn-secondary w-full" disabled={loadingOlder} onClick={() => void loadOlder()}>
+          {loadingOlder ? "در حال دریافت..." : "اعلان های قدیمی تر"}
+        </button>
+      )}
+
       {!hasUnread && !notifQuery.isLoading && !notifQuery.isError && (
         <div className="text-xs text-slate-500">همه اعلان ها خوانده شده اند.</div>
       )}
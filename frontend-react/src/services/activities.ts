@@ -57,6 +57,14 @@ export function createActivity(payload: ActivityCreatePayload) {
   return apiRequest<Activity>("/api/activities", "POST", payload);
 }
 
+export function createActivitiesBatch(items: ActivityCreatePayload[]) {
+  return apiRequest<{ created: number; items: Activity[] }>("/api/activities/batch", "POST", { items });
+}
+
+export function reorderActivities(ids: number[]) {
+  return apiRequest<{ items: { id: number; priority: number }[]; changed: number }>("/api/activities/reorder", "POST", { ids });
+}
+
 export function bulkActivityAction(payload: Record<string, unknown>) {
   return apiRequest<{
     action: string;
@@ -17,15 +17,30 @@ export interface DashboardTrendItem {
   pending_delta: number;
 }
 
+export type TrendGranularity = "day" | "week" | "month";
+
 export interface DashboardTrends {
   days: number;
+  granularity: TrendGranularity;
+  from: string;
+  to: string;
   items: DashboardTrendItem[];
 }
 
+export interface DashboardTrendRange {
+  granularity?: TrendGranularity;
+  from?: string;
+  to?: string;
+}
+
 export function fetchDashboardStats() {
   return apiRequest<DashboardStats>("/api/dashboard/stats");
 }
 
-export function fetchDashboardTrends(days = 30) {
-  return apiRequest<DashboardTrends>(`/api/dashboard/trends?days=${days}`);
+export function fetchDashboardTrends(days = 30, range: DashboardTrendRange = {}) {
+  const params = new URLSearchParams({ days: String(days) });
+  if (range.granularity) params.set("granularity", range.granularity);
+  if (range.from) params.set("from", range.from);
+  if (range.to) params.set("to", range.to);
+  return apiRequest<DashboardTrends>(`/api/dashboard/trends?${params.toString()}`);
 }
@@ -1,15 +1,26 @@
 import { apiRequest } from "@/services/http";
 import type { NotificationPayload } from "@/types/notification";
 
-export function fetchNotifications(unreadOnly = false) {
-  const q = unreadOnly ? "?unread_only=true" : "";
-  return apiRequest<NotificationPayload>(`/api/notifications${q}`);
+export function fetchNotifications(unreadOnly = false, cursor?: string | null) {
+  const params = new URLSearchParams();
+  if (unreadOnly) params.set("unread_only", "true");
+  if (cursor) params.set("cursor", cursor);
+  const q = params.toString();
+  return apiRequest<NotificationPayload>(`/api/notifications${q ? `?${q}` : ""}`);
 }
 
 export function markNotificationRead(id: number) {
   return apiRequest<{ id: number }>(`/api/notifications/${id}/read`, "POST", {});
 }
 
+export function markNotificationsRead(ids: number[]) {
+  return apiRequest<{ marked: number }>("/api/notifications/read", "POST", { ids });
+}
+
+export function markAllNotificationsRead() {
+  return apiRequest<{ marked: number }>("/api/notifications/read-all", "POST", {});
+}
+
 export interface NotificationRules {
   overdue_enabled: boolean;
   unassigned_enabled: boolean;
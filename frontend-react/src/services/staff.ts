@@ -22,3 +22,27 @@ export function updateStaff(id: number, payload: StaffPayload) {
 export function deleteStaff(id: number) {
   return apiRequest<{ deleted_id: number }>(`/api/staff/${id}`, "DELETE");
 }
+
+export interface StaffWorkloadItem {
+  staff_id: number;
+  name: string;
+  active: boolean;
+  pending: number;
+  overdue: number;
+  done: number;
+  avg_time_to_done_seconds: number | null;
+}
+
+export interface StaffWorkload {
+  from: string;
+  to: string;
+  items: StaffWorkloadItem[];
+}
+
+export function fetchStaffWorkload(range: { from?: string; to?: string } = {}) {
+  const params = new URLSearchParams();
+  if (range.from) params.set("from", range.from);
+  if (range.to) params.set("to", range.to);
+  const query = params.toString();
+  return apiRequest<StaffWorkload>(`/api/staff/workload${query ? `?${query}` : ""}`);
+}
@@ -10,4 +10,5 @@ export interface NotificationItem {
 export interface NotificationPayload {
   items: NotificationItem[];
   unread_count: number;
+  next_cursor: string | null;
 }
@@ -1,4 +1,6 @@
-﻿import uuid
+﻿import json
+import logging
+import uuid
 
 import pytest
 from fastapi.testclient import TestClient
@@ -41,6 +43,17 @@ def ensure_user(username: str, password: str, role: str) -> None:
         db.close()
 
 
+def assert_query_budget(caplog, client: TestClient, method: str, url: str, budget: int, **kwargs):
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="tt_altyn_aay"):
+        res = client.request(method, url, **kwargs)
+    events = [json.loads(r.getMessage()) for r in caplog.records if '"http_request' in r.getMessage()]
+    assert events, "http_request event was not logged"
+    queries = events[-1]["db_queries"]
+    assert queries <= budget, f"{method} {url} ran {queries} queries (budget {budget})"
+    return res
+
+
 def test_login_me_returns_normalized_role(client: TestClient):
     headers = auth_headers(client, "user1", "User@12345")
     res = client.get("/api/auth/me", headers=headers)
@@ -227,3 +240,1221 @@ def test_backup_endpoints(client: TestClient):
     rows = list_res.json()["data"]
     assert isinstance(rows, list)
     assert len(rows) >= 1
+
+
+def test_batch_create_activities(client: TestClient):
+    from backend.app.models import Notification
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    tag = uuid.uuid4().hex[:6]
+    items = [
+        {
+            "date": "2026-02-24",
+            "activity_type": "نصب",
+            "customer_name": f"Batch Customer {tag} {idx}",
+            "address": "Batch Address",
+            "assigned_staff_ids": [1],
+            "priority": idx,
+        }
+        for idx in range(3)
+    ]
+    res = client.post("/api/activities/batch", json={"items": items}, headers=headers)
+    assert res.status_code == 200, res.text
+    data = res.json()["data"]
+    assert data["created"] == 3
+    assert [x["customer_name"] for x in data["items"]] == [x["customer_name"] for x in items]
+    assert all(len(x["assigned_staff"]) == 1 for x in data["items"])
+
+    db = SessionLocal()
+    try:
+        notes = (
+            db.query(Notification)
+            .filter(Notification.user_id.is_(None), Notification.type == "activity_batch_created", Notification.text.like(f"%#{data['items'][0]['id']}..%"))
+            .count()
+        )
+        assert notes == 1
+    finally:
+        db.close()
+
+
+def test_bulk_set_status_and_delete(client: TestClient):
+    headers = auth_headers(client, "admin", "Admin@12345")
+    items = [
+        {"date": "2026-02-24", "activity_type": "نصب", "customer_name": f"Bulk Set {uuid.uuid4().hex[:6]}", "address": "Bulk", "assigned_staff_ids": [1]}
+        for _ in range(2)
+    ]
+    res = client.post("/api/activities/batch", json={"items": items}, headers=headers)
+    assert res.status_code == 200, res.text
+    ids = [x["id"] for x in res.json()["data"]["items"]]
+
+    done_res = client.post("/api/activities/bulk", json={"action": "set_status", "ids": ids, "status": "done"}, headers=headers)
+    assert done_res.status_code == 200, done_res.text
+    assert done_res.json()["data"]["updated"] == 2
+    for act_id in ids:
+        row = client.get(f"/api/activities/{act_id}", headers=headers).json()["data"]
+        assert row["status"] == "done"
+        assert row["done_at"] is not None
+
+    del_res = client.post("/api/activities/bulk", json={"action": "delete", "ids": ids}, headers=headers)
+    assert del_res.status_code == 200, del_res.text
+    assert del_res.json()["data"]["deleted"] == 2
+    assert client.get(f"/api/activities/{ids[0]}", headers=headers).status_code == 404
+
+
+def test_batch_reorder(client: TestClient):
+    headers = auth_headers(client, "admin", "Admin@12345")
+    items = [
+        {"date": "2026-02-24", "activity_type": "نصب", "customer_name": f"Reorder {uuid.uuid4().hex[:6]}", "address": "Board", "priority": 0}
+        for _ in range(3)
+    ]
+    res = client.post("/api/activities/batch", json={"items": items}, headers=headers)
+    assert res.status_code == 200, res.text
+    ids = [x["id"] for x in res.json()["data"]["items"]]
+
+    ordered = list(reversed(ids))
+    reorder_res = client.post("/api/activities/reorder", json={"ids": ordered}, headers=headers)
+    assert reorder_res.status_code == 200, reorder_res.text
+    assert reorder_res.json()["data"]["changed"] == 2
+    priorities = [client.get(f"/api/activities/{x}", headers=headers).json()["data"]["priority"] for x in ordered]
+    assert priorities == [2, 1, 0]
+
+    pairs_res = client.post("/api/activities/reorder", json={"items": [{"id": ids[0], "priority": 50}]}, headers=headers)
+    assert pairs_res.status_code == 200, pairs_res.text
+    assert client.get(f"/api/activities/{ids[0]}", headers=headers).json()["data"]["priority"] == 50
+
+    missing_res = client.post("/api/activities/reorder", json={"ids": [ids[0], 10**9]}, headers=headers)
+    assert missing_res.status_code == 404
+
+
+def test_assignment_replacement_skips_unchanged_sets(client: TestClient):
+    from backend.app.models import ActivityAssignment
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    res = client.post(
+        "/api/activities",
+        json={"date": "2026-02-24", "activity_type": "نصب", "customer_name": f"Assign {uuid.uuid4().hex[:6]}", "address": "Assign", "assigned_staff_ids": [1, 2]},
+        headers=headers,
+    )
+    assert res.status_code == 200, res.text
+    activity_id = res.json()["data"]["id"]
+
+    def assignment_rows() -> list[tuple[int, bool]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(ActivityAssignment).filter(ActivityAssignment.activity_id == activity_id).order_by(ActivityAssignment.id).all()
+            return [(x.staff_id, x.is_current) for x in rows]
+        finally:
+            db.close()
+
+    assert assignment_rows() == [(1, True), (2, True)]
+
+    same = client.put(f"/api/activities/{activity_id}", json={"assigned_staff_ids": [2, 1]}, headers=headers)
+    assert same.status_code == 200, same.text
+    assert assignment_rows() == [(1, True), (2, True)]
+
+    changed = client.put(f"/api/activities/{activity_id}", json={"assigned_staff_ids": [2, 3, 10**9]}, headers=headers)
+    assert changed.status_code == 200, changed.text
+    assert assignment_rows() == [(1, False), (2, True), (3, True)]
+    assert sorted(x["id"] for x in changed.json()["data"]["assigned_staff"]) == [2, 3]
+
+
+def test_sqlite_pragma_profile_applied(client: TestClient):
+    from backend.app.config import settings
+    from backend.app.database import sqlite_pragma_report
+
+    report = sqlite_pragma_report()
+    assert str(report["journal_mode"]).upper() == settings.sqlite_journal_mode
+    assert report["busy_timeout"] == settings.sqlite_busy_timeout_ms
+    assert report["temp_store"] == 2  # MEMORY
+    assert report["synchronous"] == 1  # NORMAL
+
+
+def test_engine_options_follow_dialect():
+    from sqlalchemy.dialects import postgresql
+
+    from backend.app.database import engine_options
+    from backend.app.services.search_service import normalize_sql_expr
+
+    sqlite_opts = engine_options("sqlite:///./x.db")
+    assert sqlite_opts["connect_args"] == {"check_same_thread": False}
+    server_opts = engine_options("postgresql://app:secret@db/app")
+    assert "connect_args" not in server_opts
+    assert {"pool_size", "max_overflow", "pool_recycle", "pool_pre_ping"} <= set(server_opts)
+
+    compiled = str(normalize_sql_expr(Activity.customer_name).compile(dialect=postgresql.dialect()))
+    assert compiled.startswith("translate(")
+
+
+def test_slow_import_does_not_block_other_requests(client: TestClient, monkeypatch):
+    import threading
+    from io import BytesIO
+
+    from openpyxl import Workbook
+
+    from backend.app.routers import exports
+
+    original_parse = exports._parse_excel_rows
+    parsing = threading.Event()
+    release = threading.Event()
+
+    def blocked_parse(file_bytes, db):
+        parsing.set()
+        assert release.wait(timeout=30), "import was never released"
+        return original_parse(file_bytes, db)
+
+    monkeypatch.setattr(exports, "_parse_excel_rows", blocked_parse)
+    headers = auth_headers(client, "admin", "Admin@12345")
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["ID", "تاریخ", "نوع فعالیت", "نام مشتری", "آدرس", "شخص موظف", "وضعیت", "دستگاه", "گزارش", "سایر"])
+    ws.append(["", "2026-02-24", "نصب", f"Slow Import {uuid.uuid4().hex[:6]}", "کابل", "", "pending", "", "", "{}"])
+    bio = BytesIO()
+    wb.save(bio)
+
+    result: dict = {}
+
+    def run_import() -> None:
+        result["res"] = client.post(
+            "/api/exports/excel/import?mode=insert",
+            files={"file": ("import.xlsx", bio.getvalue(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            headers=headers,
+        )
+
+    worker = threading.Thread(target=run_import)
+    worker.start()
+    try:
+        assert parsing.wait(timeout=30), "import never reached the parser"
+        # The parse is parked on the event; if it held the event loop these requests could not complete.
+        for _ in range(5):
+            assert client.get("/api/health").status_code == 200
+        assert "res" not in result
+    finally:
+        release.set()
+        worker.join(timeout=30)
+
+    assert result["res"].status_code == 200, result["res"].text
+
+
+def test_excel_mirror_writers_do_not_overlap(client: TestClient, monkeypatch, tmp_path):
+    import threading
+    import time
+
+    from openpyxl import load_workbook
+
+    from backend.app.services import excel_service
+
+    monkeypatch.setattr(excel_service.settings, "excel_file", tmp_path / "activities.xlsx")
+    excel_service.ensure_excel_exists()
+    db = SessionLocal()
+    try:
+        first_id, second_id = [x[0] for x in db.query(Activity.id).order_by(Activity.id).limit(2).all()]
+    finally:
+        db.close()
+
+    loaded = threading.Event()
+    release = threading.Event()
+    real_load = excel_service.load_workbook
+
+    def parked_load(path):
+        wb = real_load(path)
+        if not loaded.is_set():
+            loaded.set()
+            assert release.wait(timeout=30)
+        return wb
+
+    monkeypatch.setattr(excel_service, "load_workbook", parked_load)
+
+    def sync(activity_id: int) -> None:
+        session = SessionLocal()
+        try:
+            excel_service.sync_activities(session, [activity_id])
+        finally:
+            session.close()
+
+    writers = [threading.Thread(target=sync, args=(first_id,)), threading.Thread(target=sync, args=(second_id,))]
+    writers[0].start()
+    try:
+        assert loaded.wait(timeout=30)
+        writers[1].start()
+        # Without the lock the second writer would load the same header-only workbook now and overwrite the first.
+        time.sleep(0.2)
+    finally:
+        release.set()
+        for writer in writers:
+            writer.join(timeout=30)
+
+    ids = [str(row[0]) for row in load_workbook(tmp_path / "activities.xlsx").active.iter_rows(min_row=2, values_only=True)]
+    assert sorted(ids) == sorted([str(first_id), str(second_id)])
+
+
+def test_read_sessions_reject_writes(client: TestClient):
+    from sqlalchemy.exc import OperationalError
+
+    from backend.app.database import ReadSessionLocal
+
+    db = ReadSessionLocal()
+    try:
+        assert db.query(User).filter(User.username == "admin").first() is not None
+        db.add(User(username=f"ro_{uuid.uuid4().hex[:8]}", password_hash="-", role="viewer"))
+        with pytest.raises(OperationalError):
+            db.commit()
+        db.rollback()
+    finally:
+        db.close()
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    assert client.get("/api/dashboard/stats", headers=headers).status_code == 200
+    assert client.get("/api/notifications", headers=headers).status_code == 200
+
+
+def test_request_query_budgets_and_repeat_warning(client: TestClient, caplog, monkeypatch):
+    from backend.app.services import query_stats_service
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    assert assert_query_budget(caplog, client, "GET", "/api/activities?page_size=50", 6, headers=headers).status_code == 200
+    assert assert_query_budget(caplog, client, "GET", "/api/dashboard/stats", 12, headers=headers).status_code == 200
+    assert assert_query_budget(caplog, client, "GET", "/api/notifications", 4, headers=headers).status_code == 200
+
+    assert query_stats_service.fingerprint("SELECT * FROM t WHERE id IN (?, ?,\n ?)") == "SELECT * FROM t WHERE id IN (?)"
+    assert query_stats_service.fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?)"
+    # pyformat (psycopg2 / PyMySQL) and named pyformat (SQLAlchemy expanding IN on those drivers)
+    assert query_stats_service.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)") == "SELECT * FROM t WHERE id IN (?)"
+    assert query_stats_service.fingerprint("SELECT * FROM t WHERE id IN (%s)") == "SELECT * FROM t WHERE id IN (?)"
+    assert (
+        query_stats_service.fingerprint("SELECT * FROM t WHERE a = %(a_1)s AND id IN (%(id_1_1)s, %(id_1_2)s)")
+        == query_stats_service.fingerprint("SELECT * FROM t WHERE a = %(a_1)s AND id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)")
+        == "SELECT * FROM t WHERE a = ? AND id IN (?)"
+    )
+    assert query_stats_service.fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (?)"
+
+    monkeypatch.setattr(query_stats_service.settings, "sql_repeat_warning_threshold", 1)
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="tt_altyn_aay"):
+        client.get("/api/exports/csv", headers=headers)
+    warnings = [json.loads(r.getMessage()) for r in caplog.records if r.levelno == logging.WARNING]
+    assert any(w["event"] == "sql_repeated_statement" and w["path"] == "/api/exports/csv" for w in warnings)
+
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    from backend.app.database import engine
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        with query_stats_service.track_queries() as stats:
+            conn.execute(text("SELECT 1"))
+        assert stats.count == 1
+        # The failed statement's start time must not linger on the pooled connection.
+        assert not conn.info["query_started"] and not conn.info["slow_query_started"]
+
+
+def test_metrics_endpoint_access_and_format(client: TestClient, monkeypatch):
+    from backend.app.config import settings
+
+    admin = auth_headers(client, "admin", "Admin@12345")
+    ensure_user("ops_viewer", "Viewer@12345", "viewer")
+    viewer = auth_headers(client, "ops_viewer", "Viewer@12345")
+
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers=viewer).status_code == 403
+    client.get("/api/activities/999999", headers=admin)
+    res = client.get("/api/metrics", headers=admin)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    body = res.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/activities/{activity_id}",le="+Inf"}' in body
+    assert 'http_requests_total{method="GET",route="/api/activities/{activity_id}",status="404"}' in body
+    assert "db_queries_total " in body
+    assert "websocket_connections 0" in body
+
+    monkeypatch.setattr(settings, "metrics_access", "off")
+    assert client.get("/api/metrics", headers=admin).status_code == 404
+    monkeypatch.setattr(settings, "metrics_access", "public")
+    assert client.get("/api/metrics").status_code == 200
+
+
+def test_slow_query_log_captures_plan(client: TestClient, monkeypatch):
+    from backend.app.config import settings
+    from backend.app.services import slow_query_service
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    slow_query_service.clear_slow_queries()
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 0.000001)
+    assert client.get("/api/activities?search=secret-needle", headers=headers).status_code == 200
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 200)
+
+    res = client.get("/api/system/slow-queries", headers=headers)
+    assert res.status_code == 200, res.text
+    items = res.json()["data"]["items"]
+    selects = [x for x in items if x["statement"].lstrip().upper().startswith("SELECT") and "activities" in x["statement"]]
+    assert selects
+    assert all(x["plan"] for x in selects)
+    # The search term reached SQL as a bound LIKE parameter, and only the placeholder was logged.
+    assert any(" LIKE " in x["statement"].upper() for x in selects)
+    assert "secret-needle" not in json.dumps(items)
+
+    ensure_user("ops_viewer", "Viewer@12345", "viewer")
+    assert client.get("/api/system/slow-queries", headers=auth_headers(client, "ops_viewer", "Viewer@12345")).status_code == 403
+
+
+def test_slow_query_explain_failure_rolls_back_to_savepoint():
+    from types import SimpleNamespace
+
+    from backend.app.services import slow_query_service
+
+    executed: list[str] = []
+
+    class FakeCursor:
+        def execute(self, sql, parameters=None):
+            executed.append(sql.split(" ", 1)[0] if sql.startswith("EXPLAIN") else sql)
+            if sql.startswith("EXPLAIN"):
+                raise RuntimeError("syntax error")
+
+        def fetchall(self):
+            return []
+
+        def close(self):
+            executed.append("close")
+
+    conn = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        connection=SimpleNamespace(dbapi_connection=SimpleNamespace(cursor=FakeCursor)),
+    )
+    with pytest.raises(RuntimeError):
+        slow_query_service._run_explain(conn, "SELECT broken", {})
+    assert executed == [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN",
+        "ROLLBACK TO SAVEPOINT slow_query_explain",
+        "RELEASE SAVEPOINT slow_query_explain",
+        "close",
+    ]
+
+
+def test_request_profiling_is_admin_only(client: TestClient):
+    admin = auth_headers(client, "admin", "Admin@12345")
+    ensure_user("ops_viewer", "Viewer@12345", "viewer")
+    viewer = auth_headers(client, "ops_viewer", "Viewer@12345")
+
+    res = client.get("/api/dashboard/stats", headers={**viewer, "X-Profile": "1"})
+    assert res.status_code == 200
+    assert "x-profile-id" not in res.headers
+
+    res = client.get("/api/dashboard/stats", headers={**admin, "X-Profile": "1"})
+    assert res.status_code == 200
+    profile_id = res.headers["x-profile-id"]
+
+    listed = client.get("/api/system/profiles", headers=admin).json()["data"]
+    assert any(x["id"] == profile_id and x["path"] == "/api/dashboard/stats" for x in listed)
+    detail = client.get(f"/api/system/profiles/{profile_id}", headers=admin).json()["data"]
+    assert {"top", "collapsed", "samples", "ticks"} <= set(detail)
+    collapsed = client.get(f"/api/system/profiles/{profile_id}?format=collapsed", headers=admin)
+    assert collapsed.status_code == 200 and collapsed.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/system/profiles", headers=viewer).status_code == 403
+
+
+def test_profile_ignores_concurrent_requests(client: TestClient, monkeypatch):
+    import threading
+    import time
+
+    from backend.app import main
+    from backend.app.routers import dashboard
+
+    admin = auth_headers(client, "admin", "Admin@12345")
+    held = threading.Event()
+    release = threading.Event()
+    real_ok = main.ok
+    real_counters = dashboard._stats_counters
+
+    def other_request_work(data):
+        held.set()
+        release.wait(10)
+        return real_ok(data)
+
+    def profiled_request_work(*args, **kwargs):
+        time.sleep(0.05)
+        return real_counters(*args, **kwargs)
+
+    monkeypatch.setattr(main, "ok", other_request_work)
+    monkeypatch.setattr(dashboard, "_stats_counters", profiled_request_work)
+    other = threading.Thread(target=lambda: client.get("/api/health"))
+    other.start()
+    try:
+        assert held.wait(10)
+        res = client.get("/api/dashboard/stats", headers={**admin, "X-Profile": "1"})
+    finally:
+        release.set()
+        other.join(10)
+    assert res.status_code == 200
+
+    detail = client.get(f"/api/system/profiles/{res.headers['x-profile-id']}", headers=admin).json()["data"]
+    assert any("profiled_request_work" in line for line in detail["collapsed"])
+    assert not any("other_request_work" in line for line in detail["collapsed"])
+
+
+def _legacy_dashboard_counts() -> dict:
+    from datetime import date, timedelta
+
+    from sqlalchemy import func
+
+    from backend.app.models import ActivityAssignment, Staff
+
+    today = date.today()
+    db = SessionLocal()
+    try:
+        q = db.query(func.count(Activity.id))
+        done_day = func.date(Activity.done_at)
+        start = today - timedelta(days=29)
+        return {
+            "total_today": q.filter(Activity.date == today).scalar(),
+            "total_week": q.filter(Activity.date >= today - timedelta(days=today.weekday())).scalar(),
+            "pending": q.filter(Activity.status == "pending").scalar(),
+            "done": q.filter(Activity.status == "done").scalar(),
+            "by_type": dict(db.query(Activity.activity_type, func.count(Activity.id)).group_by(Activity.activity_type).all()),
+            "by_staff": dict(
+                db.query(Staff.name, func.count(ActivityAssignment.id))
+                .join(ActivityAssignment, ActivityAssignment.staff_id == Staff.id)
+                .filter(ActivityAssignment.is_current.is_(True))
+                .group_by(Staff.name)
+                .all()
+            ),
+            "created": {d.isoformat(): n for d, n in q.filter(Activity.date >= start).group_by(Activity.date).with_entities(Activity.date, func.count(Activity.id))},
+            "completed": {
+                str(d): n
+                for d, n in db.query(done_day, func.count(Activity.id))
+                .filter(Activity.done_at.is_not(None), done_day >= start.isoformat())
+                .group_by(done_day)
+            },
+        }
+    finally:
+        db.close()
+
+
+def _served_dashboard_counts(client: TestClient, headers: dict) -> dict:
+    stats = client.get("/api/dashboard/stats", headers=headers).json()["data"]
+    trends = client.get("/api/dashboard/trends?days=30", headers=headers).json()["data"]["items"]
+    return {
+        **{k: stats[k] for k in ("total_today", "total_week", "pending", "done")},
+        "by_type": {x["name"]: x["count"] for x in stats["by_type"]},
+        "by_staff": {x["name"]: x["count"] for x in stats["by_staff"]},
+        "created": {x["date"]: x["created"] for x in trends if x["created"]},
+        "completed": {x["date"]: x["done"] for x in trends if x["done"]},
+    }
+
+
+def test_daily_stats_match_live_aggregates(client: TestClient):
+    from datetime import date, timedelta
+
+    from backend.app.models import ActivityDailyStats
+    from backend.app.services.activity_stats_service import rebuild_daily_stats
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    today = date.today()
+    kind = f"Stats {uuid.uuid4().hex[:6]}"
+    items = [
+        {"date": (today - timedelta(days=n)).isoformat(), "activity_type": kind, "customer_name": f"Stats {n}",
+         "address": "Stats Street", "assigned_staff_ids": [1, 2] if n % 2 else [3]}
+        for n in range(4)
+    ]
+    created = client.post("/api/activities/batch", json={"items": items}, headers=headers).json()["data"]["items"]
+    ids = [x["id"] for x in created]
+
+    def today_row():
+        db = SessionLocal()
+        try:
+            return db.query(ActivityDailyStats.id, ActivityDailyStats.created, ActivityDailyStats.status_done).filter(
+                ActivityDailyStats.day == today, ActivityDailyStats.activity_type == kind, ActivityDailyStats.staff_id.is_(None)
+            ).one()
+        finally:
+            db.close()
+
+    row_id, created_today, _ = today_row()
+    assert client.post(f"/api/activities/{ids[0]}/mark-done", headers=headers).status_code == 200
+    # Updated in place by delta, not deleted and re-aggregated with the rest of the day.
+    assert today_row() == (row_id, created_today, 1)
+    moved = {**items[1], "date": (today - timedelta(days=10)).isoformat(), "activity_type": "نصب", "assigned_staff_ids": [4]}
+    assert client.put(f"/api/activities/{ids[1]}", json=moved, headers=headers).status_code == 200
+    assert client.post("/api/activities/bulk", json={"action": "set_status", "ids": ids[2:], "status": "done"}, headers=headers).status_code == 200
+    assert client.post("/api/activities/bulk", json={"action": "assign_staff", "ids": ids[2:], "staff_ids": [1]}, headers=headers).status_code == 200
+    assert client.delete(f"/api/activities/{ids[3]}", headers=headers).status_code == 200
+
+    assert _served_dashboard_counts(client, headers) == _legacy_dashboard_counts()
+
+    db = SessionLocal()
+    try:
+        rebuild_daily_stats(db)
+    finally:
+        db.close()
+    assert _served_dashboard_counts(client, headers) == _legacy_dashboard_counts()
+
+
+def test_daily_stats_refuse_unsupported_dialects():
+    from types import SimpleNamespace
+
+    from backend.app.services import activity_stats_service
+
+    factory = SimpleNamespace(kw={"bind": SimpleNamespace(dialect=SimpleNamespace(name="mysql"))})
+    with pytest.raises(RuntimeError, match="SQLite and PostgreSQL only"):
+        activity_stats_service.install(factory)
+
+
+def test_dashboard_stats_include_sections(client: TestClient):
+    headers = auth_headers(client, "admin", "Admin@12345")
+    full = client.get("/api/dashboard/stats", headers=headers).json()["data"]
+    counters = client.get("/api/dashboard/stats?include=counters", headers=headers).json()["data"]
+    assert set(counters) == {"total_today", "total_week", "pending", "done"}
+    assert counters == {k: full[k] for k in counters}
+
+    partial = client.get("/api/dashboard/stats?include=by_type,recent", headers=headers).json()["data"]
+    assert set(partial) == {"by_type", "recent"}
+    assert client.get("/api/dashboard/stats?include=everything", headers=headers).status_code == 400
+
+
+def test_dashboard_trends_buckets(client: TestClient):
+    from datetime import date
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    params = {"from": "2025-11-01", "to": date.today().isoformat()}
+    daily = client.get("/api/dashboard/trends", params={**params, "granularity": "day"}, headers=headers).json()["data"]
+    for granularity in ("week", "month"):
+        res = client.get("/api/dashboard/trends", params={**params, "granularity": granularity}, headers=headers)
+        assert res.status_code == 200, res.text
+        items = res.json()["data"]["items"]
+        assert sum(x["created"] for x in items) == sum(x["created"] for x in daily["items"])
+        assert sum(x["done"] for x in items) == sum(x["done"] for x in daily["items"])
+        starts = [date.fromisoformat(x["date"]) for x in items]
+        assert starts == sorted(starts)
+        if granularity == "week":
+            assert all(d.weekday() == 0 for d in starts)
+        else:
+            assert all(d.day == 1 for d in starts) and starts[0] == date(2025, 11, 1)
+
+    assert client.get("/api/dashboard/trends?from=2026-02-01&to=2026-01-01", headers=headers).status_code == 400
+    assert client.get("/api/dashboard/trends?from=2000-01-01&granularity=day", headers=headers).status_code == 400
+    assert client.get("/api/dashboard/trends?from=2000-01-01&granularity=month", headers=headers).status_code == 200
+
+
+def test_preset_results_cached_until_activities_change(client: TestClient):
+    headers = auth_headers(client, "admin", "Admin@12345")
+    tag = f"Preset {uuid.uuid4().hex[:6]}"
+    items = [
+        {"date": "2026-03-01", "activity_type": "نصب", "customer_name": f"{tag} {n}", "address": "Preset Street", "assigned_staff_ids": [1]}
+        for n in range(3)
+    ]
+    ids = [x["id"] for x in client.post("/api/activities/batch", json={"items": items}, headers=headers).json()["data"]["items"]]
+    preset = client.post(
+        "/api/dashboard/presets",
+        json={"name": "Pending preset", "filters": {"customer": tag, "status": "pending"}},
+        headers=headers,
+    ).json()["data"]
+    url = f"/api/dashboard/presets/{preset['id']}/results?summary=true"
+
+    first = client.get(url, headers=headers).json()["data"]
+    assert first["total"] == 3 and not first["cached"]
+    assert first["summary"]["by_status"] == {"pending": 3}
+    assert first["summary"]["by_staff"][0]["count"] == 3
+    listed = client.get("/api/activities", params={"customer": tag, "status": "pending"}, headers=headers).json()["data"]
+    assert [x["id"] for x in first["items"]] == [x["id"] for x in listed["items"]]
+
+    second = client.get(url, headers=headers).json()["data"]
+    assert second["cached"] and second["data_version"] == first["data_version"]
+
+    assert client.post(f"/api/activities/{ids[0]}/mark-done", headers=headers).status_code == 200
+    third = client.get(url, headers=headers).json()["data"]
+    assert not third["cached"] and third["data_version"] != first["data_version"]
+    assert third["total"] == 2
+
+    assert client.post("/api/activities/bulk", json={"action": "set_priority", "ids": ids[1:], "priority": 7}, headers=headers).status_code == 200
+    fourth = client.get(url, headers=headers).json()["data"]
+    assert not fourth["cached"] and all(x["priority"] == 7 for x in fourth["items"])
+
+
+def test_preset_results_follow_staff_and_user_renames(client: TestClient):
+    admin_headers = auth_headers(client, "admin", "Admin@12345")
+    tag = uuid.uuid4().hex[:6]
+    ensure_user(f"author_{tag}", "Author@12345", "admin")
+    headers = auth_headers(client, f"author_{tag}", "Author@12345")
+    author_id = client.get("/api/auth/me", headers=headers).json()["data"]["id"]
+    staff = client.post("/api/staff", json={"name": f"Staff {tag}", "phone": "1", "active": True}, headers=admin_headers).json()["data"]
+    items = [{"date": "2026-03-02", "activity_type": "نصب", "customer_name": f"Rename {tag}", "address": "Rename Street",
+              "assigned_staff_ids": [staff["id"]]}]
+    assert client.post("/api/activities/batch", json={"items": items}, headers=headers).status_code == 200
+    preset = client.post("/api/dashboard/presets", json={"name": "Rename preset", "filters": {"customer": f"Rename {tag}"}},
+                         headers=admin_headers).json()["data"]
+    url = f"/api/dashboard/presets/{preset['id']}/results?summary=true"
+    assert not client.get(url, headers=admin_headers).json()["data"]["cached"]
+
+    unchanged = {"name": f"Staff {tag}", "phone": "1", "active": True}
+    assert client.put(f"/api/staff/{staff['id']}", json=unchanged, headers=admin_headers).status_code == 200
+    assert client.get(url, headers=admin_headers).json()["data"]["cached"]
+
+    renamed = {**unchanged, "name": f"Renamed {tag}"}
+    assert client.put(f"/api/staff/{staff['id']}", json=renamed, headers=admin_headers).status_code == 200
+    data = client.get(url, headers=admin_headers).json()["data"]
+    assert not data["cached"]
+    assert data["summary"]["by_staff"] == [{"id": staff["id"], "name": f"Renamed {tag}", "count": 1}]
+    assert data["items"][0]["assigned_staff"][0]["name"] == f"Renamed {tag}"
+
+    res = client.put(f"/api/users/{author_id}", json={"username": f"writer_{tag}"}, headers=admin_headers)
+    assert res.status_code == 200, res.text
+    data = client.get(url, headers=admin_headers).json()["data"]
+    assert not data["cached"] and data["items"][0]["created_by_username"] == f"writer_{tag}"
+
+
+def test_staff_workload_matches_python_aggregation(client: TestClient):
+    from datetime import date, datetime, time, timedelta
+
+    from backend.app.models import ActivityAssignment, Staff
+    from backend.app.services.notification_rules_service import overdue_limit
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    today = date.today()
+    items = [
+        {"date": (today - timedelta(days=n * 5)).isoformat(), "activity_type": "نصب", "customer_name": f"Workload {n}",
+         "address": "Workload Street", "assigned_staff_ids": [2, 3] if n % 2 else [2]}
+        for n in range(4)
+    ]
+    ids = [x["id"] for x in client.post("/api/activities/batch", json={"items": items}, headers=headers).json()["data"]["items"]]
+    assert client.post(f"/api/activities/{ids[1]}/mark-done", headers=headers).status_code == 200
+
+    start = today - timedelta(days=29)
+    res = client.get("/api/staff/workload", headers=headers)
+    assert res.status_code == 200, res.text
+    served = {x["staff_id"]: x for x in res.json()["data"]["items"]}
+
+    db = SessionLocal()
+    try:
+        limit = overdue_limit(db, today)
+        lo, hi = datetime.combine(start, time.min), datetime.combine(today + timedelta(days=1), time.min)
+        for staff in db.query(Staff).all():
+            acts = [
+                a.activity
+                for a in db.query(ActivityAssignment).filter(ActivityAssignment.staff_id == staff.id, ActivityAssignment.is_current.is_(True))
+            ]
+            done = [a for a in acts if a.status == "done" and a.done_at and lo <= a.done_at < hi]
+            row = served[staff.id]
+            assert row["pending"] == sum(a.status == "pending" for a in acts)
+            assert row["overdue"] == sum(a.status == "pending" and a.date < limit for a in acts)
+            assert row["done"] == len(done)
+            if done:
+                expected = sum((a.done_at - a.created_at).total_seconds() for a in done) / len(done)
+                assert abs(row["avg_time_to_done_seconds"] - expected) < 1
+            else:
+                assert row["avg_time_to_done_seconds"] is None
+    finally:
+        db.close()
+    assert client.get("/api/staff/workload?from=2026-02-01&to=2026-01-01", headers=headers).status_code == 400
+
+
+def test_notification_rules_are_set_based_and_deduplicated(client: TestClient, monkeypatch):
+    from datetime import date, datetime, timedelta
+
+    from backend.app.models import Notification
+    from backend.app.services import notification_rules_service
+    from backend.app.services.notification_rules_service import _rule_recipients, evaluate_notification_rules
+    from backend.app.services.query_stats_service import track_queries
+
+    db = SessionLocal()
+    try:
+        evaluate_notification_rules(db)
+        admin = db.query(User).filter(User.username == "admin").first()
+        rows = [
+            Activity(created_by_user_id=admin.id, date=date.today() - timedelta(days=30), activity_type="ترمیم",
+                     customer_name=f"Set Rule {n}", location="-", status="pending", priority=99 if n % 2 else 0)
+            for n in range(6)
+        ]
+        db.add_all(rows)
+        db.commit()
+        ids = {x.id for x in rows}
+        recipients = len(_rule_recipients(db))
+
+        with track_queries() as stats:
+            created = evaluate_notification_rules(db)
+        assert stats.count <= 8
+        mine = [x for x in created if x.activity_id in ids]
+        by_type = {t: sum(1 for x in mine if x.type == t) for t in ("rule_overdue", "rule_unassigned", "rule_high_priority")}
+        assert by_type == {"rule_overdue": 6 * recipients, "rule_unassigned": 6 * recipients, "rule_high_priority": 3 * recipients}
+        stored = db.query(Notification).filter(Notification.activity_id.in_(ids)).count()
+        assert stored == len(mine)
+        assert all(x.text.startswith(f"فعالیت #{x.activity_id} ") for x in mine)
+        assert len({x.id for x in mine}) == len(mine)
+
+        assert evaluate_notification_rules(db) == []
+
+        # A second worker whose anti-join ran before the first worker's insert committed.
+        candidates = notification_rules_service._rule_candidates
+        monkeypatch.setattr(
+            notification_rules_service,
+            "_rule_candidates",
+            lambda note_type, condition, recipient_ids, today_start: candidates(note_type, condition, recipient_ids, datetime.max),
+        )
+        assert evaluate_notification_rules(db) == []
+        assert db.query(Notification).filter(Notification.activity_id.in_(ids)).count() == stored
+    finally:
+        db.close()
+
+
+def test_rule_ticker_evaluates_only_dirty_activities(client: TestClient):
+    import asyncio
+    from datetime import date, timedelta
+
+    from backend.app.models import Notification
+    from backend.app.services.activity_change_service import drain_dirty_activity_ids
+    from backend.app.services.notification_rules_service import RuleTicker
+
+    ticker = RuleTicker()
+    db = SessionLocal()
+    try:
+        first = asyncio.run(ticker.tick(db))
+        assert first["mode"] == "full"
+
+        admin = db.query(User).filter(User.username == "admin").first()
+        quiet = Activity(created_by_user_id=admin.id, date=date.today() - timedelta(days=40), activity_type="ترمیم",
+                         customer_name="Quiet Rule", location="-", status="pending")
+        db.add(quiet)
+        db.commit()
+        drain_dirty_activity_ids()
+
+        headers = auth_headers(client, "admin", "Admin@12345")
+        res = client.post("/api/activities", headers=headers, json={
+            "date": (date.today() - timedelta(days=40)).isoformat(), "activity_type": "ترمیم",
+            "customer_name": "Dirty Rule", "location": "-", "assigned_staff_ids": [1],
+        })
+        assert res.status_code == 200
+        dirty_id = res.json()["data"]["id"]
+
+        tick = asyncio.run(ticker.tick(db))
+        assert tick["mode"] == "incremental"
+        assert tick["evaluated"] == 1
+        assert tick["created"] > 0
+        assert db.query(Notification).filter(Notification.activity_id == dirty_id, Notification.type == "rule_overdue").count() > 0
+        assert db.query(Notification).filter(Notification.activity_id == quiet.id).count() == 0
+
+        idle = asyncio.run(ticker.tick(db))
+        assert idle["evaluated"] == 0 and idle["created"] == 0
+
+        ticker.last_full_day = date.today() - timedelta(days=1)
+        rollover = asyncio.run(ticker.tick(db))
+        assert rollover["mode"] == "incremental+rollover"
+        assert db.query(Notification).filter(Notification.activity_id == quiet.id, Notification.type == "rule_overdue").count() > 0
+        assert db.query(Notification).filter(Notification.activity_id == quiet.id, Notification.type == "rule_unassigned").count() == 0
+
+        res = client.post("/api/notifications/rules/run", headers=headers)
+        assert res.status_code == 200
+        assert db.query(Notification).filter(Notification.activity_id == quiet.id, Notification.type == "rule_unassigned").count() > 0
+    finally:
+        db.close()
+
+
+def test_broadcast_notifications_store_one_row_with_read_markers(client: TestClient):
+    from datetime import date
+
+    from backend.app.models import Notification, NotificationRead
+    from backend.app.services.notification_service import unread_filter, visible_notifications
+
+    admin_headers = auth_headers(client, "admin", "Admin@12345")
+    viewer_headers = auth_headers(client, "ops_viewer", "Viewer@12345")
+    db = SessionLocal()
+    try:
+        before = db.query(Notification).count()
+        res = client.post("/api/activities", headers=admin_headers, json={
+            "date": date.today().isoformat(), "activity_type": "ترمیم",
+            "customer_name": "Broadcast Once", "location": "-", "assigned_staff_ids": [1],
+        })
+        assert res.status_code == 200
+        activity_id = res.json()["data"]["id"]
+        rows = db.query(Notification).filter(Notification.activity_id == activity_id, Notification.type == "activity_created").all()
+        assert len(rows) == 1 and rows[0].user_id is None
+        assert db.query(Notification).count() == before + 1
+        note_id = rows[0].id
+
+        late = User(username=f"late_{uuid.uuid4().hex[:8]}", password_hash="-", role="viewer")
+        db.add(late)
+        db.commit()
+        assert visible_notifications(db, late).filter(Notification.id == note_id).count() == 0
+    finally:
+        db.close()
+
+    def unread(headers):
+        data = client.get("/api/notifications", headers=headers).json()["data"]
+        item = next(x for x in data["items"] if x["id"] == note_id)
+        return item["read_at"] is None, data["unread_count"]
+
+    viewer_unread, viewer_count = unread(viewer_headers)
+    admin_unread, admin_count = unread(admin_headers)
+    assert viewer_unread and admin_unread
+
+    assert client.post(f"/api/notifications/{note_id}/read", headers=viewer_headers).status_code == 200
+    assert client.post(f"/api/notifications/{note_id}/read", headers=viewer_headers).status_code == 200
+    assert unread(viewer_headers) == (False, viewer_count - 1)
+    assert unread(admin_headers) == (True, admin_count)
+
+    db = SessionLocal()
+    try:
+        assert db.query(NotificationRead).filter(NotificationRead.notification_id == note_id).count() == 1
+        viewer = db.query(User).filter(User.username == "ops_viewer").first()
+        assert visible_notifications(db, viewer).filter(unread_filter(viewer), Notification.id == note_id).count() == 0
+    finally:
+        db.close()
+
+
+def test_notification_hub_queues_per_connection_and_drops_slow_consumers(monkeypatch):
+    import asyncio
+
+    from backend.app.services import notification_service
+
+    class FakeSocket:
+        def __init__(self, stall: bool = False):
+            self.stall = stall
+            self.sent: list[str] = []
+            self.closed_with: int | None = None
+
+        async def accept(self):
+            pass
+
+        async def send_text(self, text: str):
+            if self.stall:
+                await asyncio.Event().wait()
+            self.sent.append(text)
+
+        async def close(self, code: int = 1000):
+            self.closed_with = code
+
+    monkeypatch.setattr(notification_service.settings, "ws_send_queue_size", 2)
+
+    async def scenario():
+        hub = notification_service.NotificationHub()
+        fast, other, slow = FakeSocket(), FakeSocket(), FakeSocket(stall=True)
+        await hub.connect(1, fast)
+        await hub.connect(2, other)
+        await hub.connect(2, slow)
+        await asyncio.sleep(0)
+
+        await hub.broadcast({"n": 0})
+        await asyncio.sleep(0.01)
+        for n in range(1, 5):
+            await hub.broadcast({"n": n})
+            await asyncio.sleep(0.001)
+        await hub.push(1, {"n": "direct"})
+        stats = hub.stats()
+        await asyncio.sleep(0.01)
+        return hub, fast, other, slow, stats
+
+    hub, fast, other, slow, queued = asyncio.run(scenario())
+    assert queued["dropped_messages"] == 1 and queued["slow_consumer_disconnects"] == 1
+    assert slow.closed_with == 1013 and slow.sent == []
+    assert [json.loads(x)["n"] for x in fast.sent] == [0, 1, 2, 3, 4, "direct"]
+    assert [json.loads(x)["n"] for x in other.sent] == [0, 1, 2, 3, 4]
+    assert hub.stats() == {
+        "connections": 2, "queued": 0, "max_queue_depth": 0, "dropped_messages": 1, "slow_consumer_disconnects": 1,
+    }
+
+
+def test_notification_websocket_receives_broadcast(client: TestClient):
+    from datetime import date
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    token = headers["Authorization"].split(" ", 1)[1]
+    with client.websocket_connect(f"/api/notifications/ws?token={token}") as ws:
+        res = client.post("/api/activities", headers=headers, json={
+            "date": date.today().isoformat(), "activity_type": "ترمیم",
+            "customer_name": "Live Push", "location": "-", "assigned_staff_ids": [1],
+        })
+        assert res.status_code == 200
+        assert [x["id"] for x in res.json()["data"]["assigned_staff"]] == [1]
+        message = ws.receive_json()
+        assert message["type"] == "activity_created"
+        assert message["activity_id"] == res.json()["data"]["id"]
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def _fake_resp_server():
+    """A stand-in speaking just enough of the Redis protocol: SUBSCRIBE and PUBLISH."""
+    import asyncio
+
+    from backend.app.services.notification_broker_service import encode_command, read_reply
+
+    subscribers: dict[str, list[asyncio.StreamWriter]] = {}
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].upper()
+                if name == "SUBSCRIBE":
+                    subscribers.setdefault(command[1], []).append(writer)
+                    # ["subscribe", channel, 1]: re-head a two-item command array as three items.
+                    writer.write(b"*3\r\n" + encode_command("subscribe", command[1])[4:] + b":1\r\n")
+                elif name == "PUBLISH":
+                    targets = subscribers.get(command[1], [])
+                    for target in targets:
+                        target.write(encode_command("message", command[1], command[2]))
+                    writer.write(b":%d\r\n" % len(targets))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_notification_broker_backends_reach_other_workers(tmp_path):
+    import asyncio
+    import sqlite3
+
+    from backend.app.services.notification_broker_service import RedisBroker, SQLiteBroker, create_broker
+    from backend.app.services.notification_service import NotificationHub
+
+    async def exchange(make_broker):
+        worker_a, worker_b = NotificationHub(), NotificationHub()
+        await worker_a.start(make_broker())
+        await worker_b.start(make_broker())
+        on_a, on_b, user_on_b = _FakeSocket(), _FakeSocket(), _FakeSocket()
+        await worker_a.connect(1, on_a)
+        await worker_b.connect(2, on_b)
+        await worker_b.connect(3, user_on_b)
+        try:
+            await worker_a.broadcast({"n": 1})
+            await worker_a.push(3, {"n": 2})
+            for _ in range(100):
+                if len(user_on_b.sent) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.05)
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+        return [[json.loads(x)["n"] for x in ws.sent] for ws in (on_a, on_b, user_on_b)]
+
+    async def redis_scenario():
+        server = await _fake_resp_server()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await exchange(lambda: RedisBroker(f"redis://127.0.0.1:{port}", "test:notifications"))
+        finally:
+            server.close()
+
+    expected = [[1], [1], [1, 2]]
+    assert asyncio.run(redis_scenario()) == expected
+    db_path = tmp_path / "broker.db"
+    assert asyncio.run(exchange(lambda: SQLiteBroker(str(db_path), poll_seconds=0.01))) == expected
+
+    assert create_broker(f"sqlite:///{db_path}", "c").path == str(db_path)
+    assert type(create_broker("memory://", "c")).__name__ == "InProcessBroker"
+
+    # Every poll/publish connection is closed again, not just committed.
+    opened = []
+    sqlite_broker = SQLiteBroker(str(db_path))
+    real_connect = sqlite_broker._connect
+    sqlite_broker._connect = lambda: opened.append(real_connect()) or opened[-1]
+    sqlite_broker._setup()
+    sqlite_broker._insert("{}")
+    assert sqlite_broker._read_after(0)
+    assert len(opened) == 3
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    async def silent_redis():
+        # Accepts connections but never answers SUBSCRIBE.
+        server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        broker = RedisBroker(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}", "c", start_timeout=0.1)
+        hub = NotificationHub()
+        try:
+            with pytest.raises(ConnectionError, match="no SUBSCRIBE reply"):
+                await hub.start(broker)
+            return broker._task, type(hub.broker).__name__
+        finally:
+            server.close()
+
+    assert asyncio.run(silent_redis()) == (None, "InProcessBroker")
+    with pytest.raises(ValueError):
+        create_broker("amqp://localhost", "c")
+
+
+def test_notification_websocket_replays_missed_events(client: TestClient, monkeypatch):
+    from datetime import date
+
+    from backend.app.services import notification_service
+    from backend.app.services.notification_service import notification_hub
+
+    headers = auth_headers(client, "admin", "Admin@12345")
+    token = headers["Authorization"].split(" ", 1)[1]
+
+    def create(name: str) -> int:
+        res = client.post("/api/activities", headers=headers, json={
+            "date": date.today().isoformat(), "activity_type": "ترمیم",
+            "customer_name": name, "location": "-", "assigned_staff_ids": [1],
+        })
+        assert res.status_code == 200
+        return res.json()["data"]["id"]
+
+    with client.websocket_connect(f"/api/notifications/ws?token={token}") as ws:
+        create("Replay Seen")
+        seen = ws.receive_json()["id"]
+    missed = [create("Replay Missed 1"), create("Replay Missed 2")]
+
+    def replay() -> list[dict]:
+        with client.websocket_connect(f"/api/notifications/ws?token={token}&since={seen}") as ws:
+            first = ws.receive_json()
+            if first["type"] == "resync":
+                return [first]
+            return [first, ws.receive_json()]
+
+    from_buffer = replay()
+    assert [x["activity_id"] for x in from_buffer] == missed
+    assert from_buffer[0]["id"] > seen and from_buffer[1]["id"] > from_buffer[0]["id"]
+
+    monkeypatch.setattr(notification_hub, "recent", [])
+    monkeypatch.setattr(notification_hub, "replay_floor", None)
+    assert replay() == from_buffer
+
+    # Exactly as many missed events as the send queue holds still replay; one fewer slot forces a resync.
+    monkeypatch.setattr(notification_service.settings, "ws_send_queue_size", 2)
+    assert replay() == from_buffer
+    monkeypatch.setattr(notification_service.settings, "ws_send_queue_size", 1)
+    assert replay() == [{"type": "resync"}]
+
+
+def test_notification_replay_buffer_orders_relayed_events():
+    from backend.app.services.notification_service import NotificationHub
+
+    hub = NotificationHub()
+    hub.replay_size = 3
+    # Relayed events from other workers can arrive out of id order.
+    for event_id in (10, 12, 11, 14, 13):
+        hub._remember(event_id, None, str(event_id))
+    assert [x[0] for x in hub.recent] == [12, 13, 14]
+    assert hub.replay_floor == 11
+    assert hub.buffer_covers(11) and not hub.buffer_covers(10)
+
+    hub._remember(9, None, "9")
+    assert [x[0] for x in hub.recent] == [12, 13, 14]
+
+
+def test_notification_list_etag_and_since(client: TestClient, caplog):
+    from datetime import date
+
+    admin_headers = auth_headers(client, "admin", "Admin@12345")
+    headers = auth_headers(client, "ops_viewer", "Viewer@12345")
+
+    first = client.get("/api/notifications", headers=headers)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    unchanged = assert_query_budget(caplog, client, "GET", "/api/notifications", 2, headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert client.get("/api/notifications?unread_only=true", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    from backend.app.models import Notification
+
+    db = SessionLocal()
+    try:
+        admin_id = db.query(User.id).filter(User.username == "admin").scalar()
+        db.add(Notification(user_id=admin_id, type="rule_overdue", text="someone else's"))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/api/notifications", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    res = client.post("/api/activities", headers=admin_headers, json={
+        "date": date.today().isoformat(), "activity_type": "ترمیم",
+        "customer_name": "Etag Change", "location": "-", "assigned_staff_ids": [1],
+    })
+    assert res.status_code == 200
+    # A full poll: user, ETag, one page and the watermark-bounded unread count.
+    changed = assert_query_budget(caplog, client, "GET", "/api/notifications", 4, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    newest = changed.json()["data"]["items"][0]
+    assert newest["activity_id"] == res.json()["data"]["id"]
+
+    client.post(f"/api/notifications/{newest['id']}/read", headers=headers)
+    after_read = client.get("/api/notifications", headers={**headers, "If-None-Match": changed.headers["etag"]})
+    assert after_read.status_code == 200
+    assert after_read.json()["data"]["unread_count"] == changed.json()["data"]["unread_count"] - 1
+
+    since = client.get(f"/api/notifications?since={newest['id'] - 1}", headers=headers).json()["data"]
+    assert [x["id"] for x in since["items"]] == [newest["id"]]
+    assert client.get("/api/notifications?since=-1", headers=headers).status_code == 422
+
+
+def test_notification_bulk_read_and_keyset_history(client: TestClient, caplog):
+    from datetime import datetime, timedelta
+
+    from backend.app.auth import create_access_token
+    from backend.app.models import Notification
+    from backend.app.services.notification_service import store_for_all_users
+
+    username = f"history_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        reader = User(username=username, password_hash="-", role="viewer", created_at=datetime.utcnow() - timedelta(seconds=1))
+        db.add(reader)
+        db.commit()
+        same_time = datetime.utcnow()
+        own = [Notification(user_id=reader.id, type="rule_overdue", text=f"own {n}", created_at=same_time) for n in range(3)]
+        db.add_all(own)
+        db.commit()
+        own_ids = [x.id for x in own]
+        broadcast_ids = [store_for_all_users(db, f"history broadcast {n}", None, "activity_bulk").payload["id"] for n in range(2)]
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {create_access_token(username, 'viewer')}"}
+
+    def page(url: str) -> dict:
+        res = client.get(url, headers=headers)
+        assert res.status_code == 200
+        return res.json()["data"]
+
+    full = page("/api/notifications?limit=100")
+    assert full["next_cursor"] is None
+    walked, url = [], "/api/notifications?limit=2"
+    while True:
+        data = page(url)
+        walked += data["items"]
+        if not data["next_cursor"]:
+            break
+        url = f"/api/notifications?limit=2&cursor={data['next_cursor']}"
+    assert [x["id"] for x in walked] == [x["id"] for x in full["items"]]
+    assert set(own_ids + broadcast_ids) <= {x["id"] for x in walked}
+    assert client.get("/api/notifications?cursor=not-a-cursor", headers=headers).status_code == 400
+    unread = full["unread_count"]
+
+    res = assert_query_budget(caplog, client, "POST", "/api/notifications/read", 5, headers=headers,
+                              json={"ids": [own_ids[0], broadcast_ids[0], broadcast_ids[0]]})
+    assert res.json()["data"]["marked"] == 2
+    assert client.post("/api/notifications/read", headers=headers, json={"ids": [own_ids[0], broadcast_ids[0]]}).json()["data"]["marked"] == 0
+    assert page("/api/notifications")["unread_count"] == unread - 2
+    first_read_at = {x["id"]: x["read_at"] for x in page("/api/notifications?limit=100")["items"]}
+
+    res = assert_query_budget(caplog, client, "POST", "/api/notifications/read-all", 5, headers=headers)
+    # The remaining own rows plus every unread broadcast the watermark now covers.
+    assert res.json()["data"]["marked"] == unread - 2
+    data = page("/api/notifications?limit=100")
+    assert data["unread_count"] == 0 and all(x["read_at"] for x in data["items"])
+    read_at = {x["id"]: x["read_at"] for x in data["items"]}
+    assert read_at[own_ids[0]] == first_read_at[own_ids[0]]
+    assert read_at[broadcast_ids[0]] == first_read_at[broadcast_ids[0]]
+    assert client.post("/api/notifications/read-all", headers=headers).json()["data"]["marked"] == 0
+    assert {x["id"]: x["read_at"] for x in page("/api/notifications?limit=100")["items"]} == read_at
+
+    db = SessionLocal()
+    try:
+        later = store_for_all_users(db, "after read-all", None, "activity_bulk").payload["id"]
+    finally:
+        db.close()
+    data = page("/api/notifications?unread_only=true")
+    assert data["unread_count"] == 1 and [x["id"] for x in data["items"]] == [later]